@@ -0,0 +1,357 @@
+# etl/benchmarks/run_benchmarks.py
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from etl.benchmarks.synthetic import (
+    synthetic_benchmark,
+    synthetic_intraday_bars,
+    synthetic_prices,
+    synthetic_raw_frame,
+    synthetic_sectors,
+    synthetic_wide_frame,
+)
+from etl.create_duckdb_warehouse import FEATURES_TABLE, KPIS_PERIODS_TABLE, KPIS_TABLE, build_warehouse
+from etl.extract.extract_intraday import aggregate_intraday
+from etl.extract.extract_prices import standardize_price_df, standardize_wide_prices
+from etl.quality.engine import evaluate_price_quality
+from etl.transform.build_gold_features_labels import (
+    add_asset_features,
+    add_benchmark_features,
+    add_cross_sectional_features,
+    compute_asset_kpis,
+    define_label,
+)
+from etl.transform.build_silver_prices import load_all_bronze_prices
+from etl.transform.feature_registry import load_feature_registry
+from etl.transform.kpi_engine import compute_kpis_by_period, summary_from_periods
+from etl.utils.calendar import build_trading_calendar
+from etl.utils.config import get_paths, load_etl_settings
+from etl.utils.io import save_layer, save_parquet
+from etl.utils.metrics import peak_rss_mb, reset_peak_rss
+
+# Escalas padrão: <tickers>x<anos>
+DEFAULT_SCALES = ["20x5", "100x10"]
+# Baseline versionada junto com a suíte (gerada com --save-baseline). Os
+# tempos ficam em unidades de calibração (ver calibrate), não em segundos,
+# para a baseline valer em outras máquinas
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+# Tamanho da carga fixa de calibrate
+CALIBRATION_SIZE = 2_000_000
+# Tempos abaixo disto são ruído de medição e não entram no gate
+MIN_GATED_SECONDS = 0.02
+# Benchmarks sintéticos da matriz larga (add_benchmark_features roda o
+# conjunto 'research', com as features de todos eles)
+BENCHMARK_PREFIXES = ("ibov", "ifix", "smll", "cdi", "usd_brl")
+# Features transversais medidas (ret_21d fora do conjunto padrão: calculada
+# no painel a partir de close)
+CROSS_SECTIONAL_FEATURES = ["ret_1d_cs_rank", "ret_1d_cs_zscore", "ret_21d_sector_rel"]
+
+
+def parse_scale(scale: str) -> tuple[int, int]:
+    """
+    '100x10' -> (100 tickers, 10 anos).
+    """
+    try:
+        n_tickers, n_years = (int(v) for v in scale.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Escala inválida: {scale!r} (use <tickers>x<anos>, ex.: 100x10)")
+    return n_tickers, n_years
+
+
+# ===============================================================
+# 1. Medição
+# ===============================================================
+
+def measure(func: Callable[[], object], repeat: int = 3) -> Dict:
+    """
+    Melhor tempo de parede em `repeat` execuções e, em uma execução extra,
+    o pico de memória alocada pelo Python/NumPy (tracemalloc) e o pico de
+    RSS do processo (inclui o DuckDB).
+    """
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+
+    reset_peak_rss()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": min(times),
+        "py_peak_mb": py_peak / 1e6,
+        "rss_peak_mb": peak_rss_mb(),
+    }
+
+
+def calibrate(repeat: int = 5) -> float:
+    """
+    Melhor tempo de parede de uma carga fixa (ordenação, soma acumulada por
+    grupo e janela móvel em NumPy/pandas, como nas etapas), medida na mesma
+    execução da suíte. Dividir o tempo de cada etapa por ele desconta a
+    velocidade da máquina.
+    """
+    rng = np.random.default_rng(0)
+    values = pd.Series(rng.standard_normal(CALIBRATION_SIZE))
+    keys = rng.integers(0, 1_000, CALIBRATION_SIZE)
+
+    def work():
+        np.sort(values.to_numpy())
+        values.groupby(keys).cumsum()
+        values.rolling(21).std()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        work()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _stage_functions(n_tickers: int,
+                     n_years: int,
+                     workdir: Path) -> tuple[int, Dict[str, Callable], Dict[str, int]]:
+    """
+    Prepara os dados sintéticos da escala e devolve (linhas, {etapa: função},
+    {etapa: linhas}), o último só para etapas cuja entrada não é o painel
+    diário (ex.: barras intraday). Cada função roda a etapa sobre entradas
+    prontas (sem as etapas anteriores).
+    """
+    registry = load_feature_registry()
+    settings = load_etl_settings()
+    df_prices = synthetic_prices(n_tickers, n_years)
+    df_bench = synthetic_benchmark(n_years, prefixes=BENCHMARK_PREFIXES)
+    tickers = df_prices["ticker"].unique().tolist()
+    by_ticker = {t: g for t, g in df_prices.groupby("ticker", sort=False)}
+    raws = {t: synthetic_raw_frame(g) for t, g in by_ticker.items()}
+    wide = synthetic_wide_frame(df_prices)
+    bars = synthetic_intraday_bars(df_prices)
+    bars_path = workdir / "raw" / "intraday_bars.csv"
+    bars_path.parent.mkdir(parents=True, exist_ok=True)
+    bars.to_csv(bars_path, index=False)
+
+    # BRONZE sintético (um arquivo por ticker, como na extração)
+    bronze_dir = workdir / "bronze"
+    for t, g in by_ticker.items():
+        save_parquet(standardize_price_df(raws[t], ticker=t), bronze_dir / f"prices_{t}.parquet")
+    df_silver = load_all_bronze_prices(bronze_dir, tickers)
+    calendar = build_trading_calendar(df_silver)
+    sectors = synthetic_sectors(tickers)
+
+    # Entradas das etapas de GOLD
+    df_feat = add_asset_features(df_silver, registry=registry, keep_emas=True)
+    df_label = define_label(df_feat.copy(), registry)
+    df_gold = add_benchmark_features(df_label, df_bench, registry=registry, calendar=calendar)
+
+    gold_dir = workdir / "gold"
+    save_layer(df_gold, gold_dir / FEATURES_TABLE, settings["storage"])
+    kpis_periods = compute_kpis_by_period(df_gold)
+    save_parquet(kpis_periods, gold_dir / f"{KPIS_PERIODS_TABLE}.parquet")
+    save_parquet(summary_from_periods(kpis_periods), gold_dir / f"{KPIS_TABLE}.parquet")
+
+    def duckdb_build():
+        db_path = workdir / f"bench-{time.perf_counter_ns()}.duckdb"
+        con = duckdb.connect(db_path.as_posix())
+        modes = {FEATURES_TABLE: "table", KPIS_TABLE: "table", KPIS_PERIODS_TABLE: "table"}
+        build_warehouse(con, gold_dir, modes, True, settings["warehouse"])
+        con.close()
+        db_path.unlink()
+
+    stages = {
+        "standardize_price_df": lambda: [standardize_price_df(raws[t], ticker=t) for t in tickers],
+        "standardize_wide_prices": lambda: standardize_wide_prices(wide),
+        "aggregate_intraday": lambda: aggregate_intraday(bars_path, settings=settings),
+        "load_all_bronze_prices": lambda: load_all_bronze_prices(bronze_dir, tickers),
+        "evaluate_price_quality": lambda: evaluate_price_quality(df_silver, settings=settings),
+        "add_asset_features": lambda: add_asset_features(df_silver, registry=registry, keep_emas=True),
+        "define_label": lambda: define_label(df_feat.copy(), registry),
+        "add_cross_sectional_features": lambda: add_cross_sectional_features(
+            df_feat, CROSS_SECTIONAL_FEATURES, registry, calendar=calendar, sectors=sectors),
+        "add_benchmark_features": lambda: add_benchmark_features(df_label, df_bench, "research",
+                                                                 registry=registry, calendar=calendar),
+        "compute_asset_kpis": lambda: compute_asset_kpis(df_gold),
+        "duckdb_build": duckdb_build,
+    }
+    return len(df_prices), stages, {"aggregate_intraday": len(bars)}
+
+
+def run_suite(scales: List[str], repeat: int = 3, stages: List[str] | None = None) -> pd.DataFrame:
+    """
+    Roda as etapas em cada escala e devolve uma linha por (escala, etapa):
+    seconds, relative (seconds / calibrate()), rows_per_s, py_peak_mb,
+    rss_peak_mb. rows é o tamanho da entrada da etapa (linhas do painel
+    diário ou barras intraday).
+    """
+    calibration = calibrate()
+    rows = []
+    for scale in scales:
+        n_tickers, n_years = parse_scale(scale)
+        with tempfile.TemporaryDirectory(prefix="etl-bench-") as tmp:
+            with contextlib.redirect_stdout(io.StringIO()):
+                n_rows, funcs, stage_rows = _stage_functions(n_tickers, n_years, Path(tmp))
+            for stage, func in funcs.items():
+                if stages and stage not in stages:
+                    continue
+                result = measure(func, repeat)
+                stage_n = stage_rows.get(stage, n_rows)
+                rows.append({
+                    "scale": scale,
+                    "n_tickers": n_tickers,
+                    "n_years": n_years,
+                    "rows": stage_n,
+                    "stage": stage,
+                    **result,
+                    "rows_per_s": stage_n / result["seconds"] if result["seconds"] > 0 else np.nan,
+                })
+                print(f"[BENCH] {scale:>9} {stage:<28} {result['seconds']:8.4f}s "
+                      f"{rows[-1]['rows_per_s']:>12,.0f} linhas/s  "
+                      f"py {result['py_peak_mb']:7.1f} MB  rss {result['rss_peak_mb']:7.1f} MB")
+    # Calibra de novo ao final (vale a menor): desconta variações de
+    # frequência da máquina ao longo da suíte
+    calibration = min(calibration, calibrate())
+    print(f"[BENCH] Calibração: {calibration:.4f}s")
+    results = pd.DataFrame(rows)
+    if not results.empty:
+        results["relative"] = results["seconds"] / calibration
+    return results
+
+
+def scaling_exponents(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Curva de escala por etapa: expoente b de tempo ~ linhas^b (e idem para a
+    memória) entre a menor e a maior escala. b ~ 1 é linear; b > 1 indica
+    custo superlinear.
+    """
+    out = []
+    for stage, g in results.groupby("stage", sort=False):
+        g = g.sort_values("rows")
+        if len(g) < 2 or g["rows"].iloc[0] == g["rows"].iloc[-1]:
+            continue
+        lo, hi = g.iloc[0], g.iloc[-1]
+        ratio = np.log(hi["rows"] / lo["rows"])
+        out.append({
+            "stage": stage,
+            "time_exponent": np.log(hi["seconds"] / lo["seconds"]) / ratio,
+            "memory_exponent": np.log(max(hi["py_peak_mb"], 1e-6) / max(lo["py_peak_mb"], 1e-6)) / ratio,
+        })
+    return pd.DataFrame(out)
+
+
+# ===============================================================
+# 2. Baseline e gate de regressão
+# ===============================================================
+
+def _key(row) -> str:
+    return f"{row['scale']}/{row['stage']}"
+
+
+def save_baseline(results: pd.DataFrame, path: Path = BASELINE_PATH) -> None:
+    baseline = {
+        _key(row): {"relative": round(row["relative"], 4), "py_peak_mb": round(row["py_peak_mb"], 2)}
+        for _, row in results.iterrows()
+    }
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    print(f"[BENCH] Baseline salva em {path}")
+
+
+def check_regressions(results: pd.DataFrame,
+                      path: Path = BASELINE_PATH,
+                      time_tolerance: float = 0.30,
+                      memory_tolerance: float = 0.20) -> List[str]:
+    """
+    Compara os resultados com a baseline; devolve a lista de regressões
+    (tempo relativo à calibração acima de baseline * (1 + time_tolerance),
+    ou memória acima de baseline * (1 + memory_tolerance)).
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"Baseline não encontrada: {path} (gere com --save-baseline)")
+    baseline = json.loads(path.read_text(encoding="utf-8"))
+
+    regressions = []
+    for _, row in results.iterrows():
+        ref = baseline.get(_key(row))
+        if ref is None:
+            print(f"[AVISO] Sem baseline para {_key(row)}; ignorado.")
+            continue
+        if "relative" not in ref:
+            raise ValueError(f"Baseline em formato antigo (segundos): {path} (regere com --save-baseline)")
+        if row["seconds"] >= MIN_GATED_SECONDS and row["relative"] > ref["relative"] * (1 + time_tolerance):
+            regressions.append(f"{_key(row)}: tempo {row['relative']:.3f}x calibração > "
+                               f"baseline {ref['relative']:.3f}x")
+        if row["py_peak_mb"] > ref["py_peak_mb"] * (1 + memory_tolerance) + 1.0:
+            regressions.append(f"{_key(row)}: memória {row['py_peak_mb']:.1f} MB > "
+                               f"baseline {ref['py_peak_mb']:.1f} MB")
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    """
+    Suíte de benchmarks sobre painéis sintéticos. Exemplos:
+
+        python -m etl.benchmarks.run_benchmarks
+        python -m etl.benchmarks.run_benchmarks --scales 50x5 200x10 500x20
+        python -m etl.benchmarks.run_benchmarks --save-baseline
+        python -m etl.benchmarks.run_benchmarks --check   # sai com código 1 se regredir
+
+    O gate compara tempos relativos à calibração (ver calibrate), não
+    segundos: a baseline gerada em uma máquina vale nas outras.
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks das etapas do ETL em dados sintéticos.")
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES,
+                        help="escalas <tickers>x<anos> (padrão: %(default)s)")
+    parser.add_argument("--stages", nargs="+", default=None, help="roda só estas etapas")
+    parser.add_argument("--repeat", type=int, default=3, help="execuções por medida (vale a melhor)")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="JSON com os resultados (padrão: data/_benchmarks/<data>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"grava {BASELINE_PATH.name}")
+    parser.add_argument("--check", action="store_true", help="compara com a baseline e falha se regredir")
+    parser.add_argument("--time-tolerance", type=float, default=0.30)
+    parser.add_argument("--memory-tolerance", type=float, default=0.20)
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.scales, args.repeat, args.stages)
+    exponents = scaling_exponents(results)
+    if not exponents.empty:
+        print("\n[BENCH] Expoentes de escala (tempo/memória ~ linhas^b):")
+        print(exponents.to_string(index=False, float_format="%.2f"))
+
+    output = args.output or get_paths()["raw"].parent / "_benchmarks" / f"{time.strftime('%Y%m%dT%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "results": results.to_dict(orient="records"),
+        "scaling": exponents.to_dict(orient="records"),
+    }, indent=2, default=float), encoding="utf-8")
+    print(f"[BENCH] Resultados salvos em {output}")
+
+    if args.save_baseline:
+        save_baseline(results)
+    if args.check:
+        regressions = check_regressions(results, time_tolerance=args.time_tolerance,
+                                        memory_tolerance=args.memory_tolerance)
+        for msg in regressions:
+            print(f"[ERRO] Regressão: {msg}")
+        if regressions:
+            return 1
+        print("[BENCH] Nenhuma regressão em relação à baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# etl/benchmarks/synthetic.py
+
+import numpy as np
+import pandas as pd
+
+# Dias úteis por ano no gerador (pregões)
+TRADING_DAYS_PER_YEAR = 252
+
+
+def synthetic_dates(n_years: int, end: str = "2025-12-31") -> pd.DatetimeIndex:
+    """
+    Calendário de pregões sintético: os últimos n_years * 252 dias úteis até end.
+    """
+    return pd.bdate_range(end=end, periods=n_years * TRADING_DAYS_PER_YEAR)
+
+
+def synthetic_tickers(n_tickers: int) -> list[str]:
+    return [f"SYN{i:04d}" for i in range(n_tickers)]
+
+
+def synthetic_prices(n_tickers: int, n_years: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Painel OHLCV sintético no esquema de BRONZE/SILVER
+    (date, ticker, open, high, low, close, volume), ordenado por ticker e data.
+
+    Preços seguem um passeio aleatório geométrico por ticker (vol diária entre
+    1% e 3%); cada ticker começa em uma data diferente, para exercitar
+    históricos de tamanhos distintos como no universo real.
+    """
+    rng = np.random.default_rng(seed)
+    dates = synthetic_dates(n_years)
+    n_days = len(dates)
+    frames = []
+    for ticker in synthetic_tickers(n_tickers):
+        start = int(rng.integers(0, max(n_days // 4, 1)))
+        n = n_days - start
+        vol = rng.uniform(0.01, 0.03)
+        log_ret = rng.normal(0.0002, vol, n)
+        close = 10.0 * np.exp(np.cumsum(log_ret))
+        open_ = close * np.exp(rng.normal(0, vol / 4, n))
+        spread = np.abs(rng.normal(0, vol / 2, n))
+        frames.append(pd.DataFrame({
+            "date": dates[start:],
+            "ticker": ticker,
+            "open": open_,
+            "high": np.maximum(open_, close) * (1 + spread),
+            "low": np.minimum(open_, close) * (1 - spread),
+            "close": close,
+            "volume": rng.integers(1_000, 5_000_000, n),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def synthetic_sectors(tickers: list[str], n_sectors: int = 10) -> dict[str, str]:
+    """
+    Setor sintético de cada ticker ({ticker: setor}), em rodízio por n_sectors.
+    """
+    return {t: f"SETOR{i % n_sectors:02d}" for i, t in enumerate(tickers)}
+
+
+def synthetic_raw_frame(df_ticker: pd.DataFrame) -> pd.DataFrame:
+    """
+    Um ticker do painel no layout bruto do yfinance (Date, Open_<T>, ...,
+    Adj Close_<T>, Volume_<T>), entrada de standardize_price_df.
+    """
+    ticker = df_ticker["ticker"].iloc[0]
+    suffix = f"_{ticker}.SA"
+    return pd.DataFrame({
+        "Date": df_ticker["date"].to_numpy(),
+        f"Open{suffix}": df_ticker["open"].to_numpy(),
+        f"High{suffix}": df_ticker["high"].to_numpy(),
+        f"Low{suffix}": df_ticker["low"].to_numpy(),
+        f"Close{suffix}": df_ticker["close"].to_numpy(),
+        f"Adj Close{suffix}": df_ticker["close"].to_numpy(),
+        f"Volume{suffix}": df_ticker["volume"].to_numpy(),
+    })
+
+
+def synthetic_wide_frame(df_prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    O painel inteiro no layout de um yf.download com vários símbolos: índice
+    Date e colunas MultiIndex (Price x Ticker), entrada de
+    standardize_wide_prices.
+    """
+    fields = {"open": "Open", "high": "High", "low": "Low", "close": "Adj Close", "volume": "Volume"}
+    wide = df_prices.pivot(index="date", columns="ticker", values=list(fields))
+    wide.columns = pd.MultiIndex.from_tuples(
+        [(fields[f], f"{t}.SA") for f, t in wide.columns], names=["Price", "Ticker"]
+    )
+    return wide.rename_axis("Date")
+
+
+def synthetic_intraday_bars(df_prices: pd.DataFrame,
+                            n_days: int = 21,
+                            bars_per_day: int = 78,
+                            seed: int = 11) -> pd.DataFrame:
+    """
+    Barras intraday sintéticas (layout longo: Datetime, Ticker, Open, High,
+    Low, Close, Volume) dos últimos n_days pregões de cada ticker do painel,
+    com bars_per_day barras de 5 minutos a partir das 10h, em ordem de
+    horário dentro de cada ticker. Entrada de aggregate_intraday.
+    """
+    rng = np.random.default_rng(seed)
+    last = df_prices.groupby("ticker", sort=False).tail(n_days)
+    n = len(last) * bars_per_day
+    offsets = pd.to_timedelta(10, "h") + pd.to_timedelta(5 * np.arange(bars_per_day), "min")
+    stamps = (last["date"].to_numpy()[:, None] + offsets.to_numpy()[None, :]).ravel()
+    base = np.repeat(last["close"].to_numpy(), bars_per_day)
+    close = base * np.exp(rng.normal(0, 0.002, n))
+    open_ = close * np.exp(rng.normal(0, 0.001, n))
+    spread = np.abs(rng.normal(0, 0.001, n))
+    return pd.DataFrame({
+        "Datetime": stamps,
+        "Ticker": np.repeat(last["ticker"].to_numpy(), bars_per_day),
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + spread),
+        "Low": np.minimum(open_, close) * (1 - spread),
+        "Close": close,
+        "Volume": rng.integers(100, 50_000, n),
+    })
+
+
+def synthetic_benchmark(n_years: int,
+                        seed: int = 7,
+                        prefixes: tuple[str, ...] = ("ibov",)) -> pd.DataFrame:
+    """
+    Benchmarks sintéticos no esquema de SILVER (matriz larga benchmarks_daily:
+    date, <prefixo>_close, <prefixo>_ret_1d, ...). O primeiro tem cotação em
+    todos os pregões; os demais perdem ~2% das datas (feriados locais), para
+    exercitar o alinhamento por benchmark.
+    """
+    rng = np.random.default_rng(seed)
+    dates = synthetic_dates(n_years)
+    df = pd.DataFrame({"date": dates})
+    for i, prefix in enumerate(prefixes):
+        close = 100_000 * np.exp(np.cumsum(rng.normal(0.0002, 0.012, len(dates))))
+        ret = pd.Series(close).pct_change().to_numpy()
+        if i:
+            gaps = rng.random(len(dates)) < 0.02
+            close[gaps] = np.nan
+            ret = pd.Series(close).dropna().pct_change().reindex(range(len(dates))).to_numpy()
+        df[f"{prefix}_close"] = close
+        df[f"{prefix}_ret_1d"] = ret
+    return df
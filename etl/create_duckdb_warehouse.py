@@ -1,5 +1,18 @@
+import argparse
+import hashlib
+import json
+import tempfile
+import time
+from contextlib import contextmanager
 from pathlib import Path
+
 import duckdb
+import pandas as pd
+
+from etl.utils.config import load_etl_settings
+from etl.utils.io import DATASET_MARKER, ticker_bucket
+from etl.utils.metrics import enable_profiling, stage_metrics
+from etl.transform.kpi_engine import compute_kpis_by_period, summary_from_periods
 
 # Caminhos base
 PROJECT_ROOT = Path(__file__).resolve().parents[1]  # sobe 2 níveis: etl/ -> template/
@@ -7,49 +20,547 @@ DATA_DIR     = PROJECT_ROOT / "data"
 GOLD_DIR     = DATA_DIR / "gold"
 DB_PATH      = DATA_DIR / "warehouse.duckdb"
 
-def main():
+# Tabelas do warehouse
+FEATURES_TABLE     = "asset_features_daily"
+KPIS_TABLE         = "asset_kpis_summary"
+KPIS_PERIODS_TABLE = "asset_kpis_periods"
+WATERMARKS_TABLE   = "_etl_watermarks"
+PARTITIONS_TABLE   = "_etl_partitions"
+
+
+def features_source(gold_dir: Path) -> tuple[str, list] | None:
+    """
+    SELECT de leitura de asset_features_daily: o dataset particionado
+    (ticker_bucket=/year=, colunas de partição descartadas) ou, na falta
+    dele, o arquivo único .parquet. Filtros por ticker/date sobre esta
+    origem são empurrados pelo DuckDB para as partições e row groups.
+    """
+    dataset_dir = gold_dir / "asset_features_daily"
+    if (dataset_dir / DATASET_MARKER).exists():
+        return (
+            "SELECT * EXCLUDE (ticker_bucket, year) "
+            "FROM read_parquet(?, hive_partitioning = true)",
+            [(dataset_dir / "**" / "*.parquet").as_posix()],
+        )
+    features_parquet = gold_dir / "asset_features_daily.parquet"
+    if features_parquet.exists():
+        return "SELECT * FROM read_parquet(?)", [features_parquet.as_posix()]
+    return None
+
+
+def _files_fingerprint(files: list[Path]) -> str:
+    # Nome, tamanho e mtime: o GOLD grava arquivos novos a cada escrita
+    h = hashlib.sha256()
+    for f in sorted(files):
+        stat = f.stat()
+        h.update(f"{f.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def gold_partitions(gold_dir: Path) -> dict[str, tuple[str, list[Path]]]:
+    """
+    {partição: (impressão digital, arquivos)} de asset_features_daily. No
+    dataset, uma entrada por ticker_bucket=<n>/year=<aaaa> mais o marcador
+    (que guarda o número de buckets); no layout de arquivo único, uma
+    entrada para o arquivo.
+    """
+    dataset_dir = gold_dir / "asset_features_daily"
+    if (dataset_dir / DATASET_MARKER).exists():
+        parts = {DATASET_MARKER: ((dataset_dir / DATASET_MARKER).read_text(encoding="utf-8"), [])}
+        for part_dir in dataset_dir.glob("ticker_bucket=*/year=*"):
+            files = sorted(part_dir.glob("*.parquet"))
+            if files:
+                parts[part_dir.relative_to(dataset_dir).as_posix()] = (_files_fingerprint(files), files)
+        return parts
+    features_parquet = gold_dir / "asset_features_daily.parquet"
+    return {features_parquet.name: (_files_fingerprint([features_parquet]), [features_parquet])}
+
+
+def _partition_key(partition: str) -> tuple[int, int]:
+    # 'ticker_bucket=3/year=2024' -> (3, 2024)
+    bucket, year = (int(p.split("=")[1]) for p in partition.split("/"))
+    return bucket, year
+
+
+def _marker_buckets(marker: str) -> int:
+    # Conteúdo do marcador _SUCCESS: {"n_buckets": n}
+    return int(json.loads(marker)["n_buckets"])
+
+
+# ===============================================================
+# Marcas d'água (high-water mark por tabela) e partições carregadas
+# ===============================================================
+
+@contextmanager
+def _transaction(con):
+    """
+    Transação curta: COMMIT ao final do bloco, ROLLBACK se algo falhar.
+    """
+    con.execute("BEGIN TRANSACTION")
+    try:
+        yield con
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    con.execute("COMMIT")
+
+
+def _object_type(con, name: str) -> str | None:
+    """
+    'BASE TABLE', 'VIEW' ou None se o objeto não existir.
+    """
+    row = con.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_name = ?", [name]
+    ).fetchone()
+    return None if row is None else row[0]
+
+
+def _table_exists(con, name: str) -> bool:
+    return _object_type(con, name) == "BASE TABLE"
+
+
+def _drop_if(con, name: str, object_type: str) -> None:
+    """
+    Remove name se ele existir com o tipo informado (troca de modo tabela <-> view).
+    """
+    if _object_type(con, name) == object_type:
+        con.execute(f"DROP {'VIEW' if object_type == 'VIEW' else 'TABLE'} {name};")
+
+
+def _table_columns(con, name: str) -> list[str]:
+    return [row[0] for row in con.execute(f"DESCRIBE {name}").fetchall()]
+
+
+def _ensure_watermarks(con) -> None:
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARKS_TABLE} (
+            table_name  VARCHAR PRIMARY KEY,
+            high_water  TIMESTAMP,
+            rows_loaded BIGINT,
+            updated_at  TIMESTAMP
+        );
+    """)
+
+
+def _ensure_partitions(con) -> None:
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {PARTITIONS_TABLE} (
+            table_name  VARCHAR,
+            partition   VARCHAR,
+            fingerprint VARCHAR,
+            PRIMARY KEY (table_name, partition)
+        );
+    """)
+
+
+def loaded_partitions(con, table: str) -> dict[str, str]:
+    """
+    {partição: impressão digital} do GOLD na última carga de table.
+    """
+    rows = con.execute(
+        f"SELECT partition, fingerprint FROM {PARTITIONS_TABLE} WHERE table_name = ?", [table]
+    ).fetchall()
+    return dict(rows)
+
+
+def _set_partitions(con, table: str, parts: dict[str, tuple[str, list[Path]]]) -> None:
+    con.execute(f"DELETE FROM {PARTITIONS_TABLE} WHERE table_name = ?", [table])
+    if parts:
+        con.executemany(
+            f"INSERT INTO {PARTITIONS_TABLE} VALUES (?, ?, ?)",
+            [[table, name, fp] for name, (fp, _) in sorted(parts.items())],
+        )
+
+
+def get_watermark(con, table: str):
+    row = con.execute(
+        f"SELECT high_water FROM {WATERMARKS_TABLE} WHERE table_name = ?", [table]
+    ).fetchone()
+    return None if row is None else row[0]
+
+
+def _set_watermark(con, table: str, rows_loaded: int) -> None:
+    con.execute(f"""
+        INSERT OR REPLACE INTO {WATERMARKS_TABLE}
+        SELECT ?, max(date), ?, now()::TIMESTAMP FROM {table};
+    """, [table, rows_loaded])
+
+
+# ===============================================================
+# asset_features_daily: carga completa ou upsert incremental
+# ===============================================================
+
+def rebuild_features_table(con, source: tuple[str, list], parts: dict[str, tuple[str, list[Path]]]) -> int:
+    """
+    Recria asset_features_daily a partir do GOLD, ordenada por (ticker, date)
+    e com chave primária (ticker, date) para os upserts seguintes, e registra
+    as partições carregadas (parts, de gold_partitions).
+    """
+    select_sql, params = source
+    with _transaction(con):
+        con.execute(f"""
+            CREATE OR REPLACE TABLE {FEATURES_TABLE} AS
+            {select_sql}
+            ORDER BY ticker, date;
+        """, params)
+        con.execute(f"ALTER TABLE {FEATURES_TABLE} ADD PRIMARY KEY (ticker, date);")
+        n_rows = con.execute(f"SELECT count(*) FROM {FEATURES_TABLE}").fetchone()[0]
+        _set_watermark(con, FEATURES_TABLE, n_rows)
+        _set_partitions(con, FEATURES_TABLE, parts)
+    return n_rows
+
+
+def upsert_features(con, parts: dict[str, tuple[str, list[Path]]]) -> list[str] | None:
+    """
+    Sincroniza asset_features_daily com o GOLD partição a partição: compara a
+    impressão digital de cada partição (ticker_bucket x ano; ver
+    gold_partitions) com a da última carga e, para cada partição nova,
+    alterada ou removida, apaga as linhas correspondentes do warehouse e
+    insere o conteúdo atual. Cobre linhas re-finalizadas com label, correções
+    antigas, mudanças de features e remoções no GOLD.
+
+    As partições alteradas são lidas do Parquet antes de abrir a transação,
+    que fica curta (só delete, insert e registro das partições). Retorna os
+    tickers afetados, ou None se for preciso recriar a tabela (esquema,
+    número de buckets ou layout mudaram, ou todas as partições mudaram, como
+    após um mode="full").
+    """
+    loaded = loaded_partitions(con, FEATURES_TABLE)
+    if DATASET_MARKER not in parts:
+        # Arquivo único: sem partições para sincronizar
+        return [] if loaded == {p: fp for p, (fp, _) in parts.items()} else None
+    if loaded.get(DATASET_MARKER) != parts[DATASET_MARKER][0]:
+        return None
+    changed = [p for p, (fp, _) in parts.items() if p != DATASET_MARKER and loaded.get(p) != fp]
+    removed = [p for p in loaded if p not in parts]
+    if not changed and not removed:
+        return []
+    if len(changed) == len(parts) - 1:
+        return None
+
+    files = [f.as_posix() for p in changed for f in parts[p][1]]
+    staged = con.execute("SELECT * FROM read_parquet(?, hive_partitioning = false)", [files]).df() if files else None
+    columns = _table_columns(con, FEATURES_TABLE)
+    if staged is not None and set(staged.columns) != set(columns):
+        return None
+
+    # (ticker, ano) do warehouse que pertencem às partições tocadas
+    known = [row[0] for row in con.execute(f"SELECT DISTINCT ticker FROM {FEATURES_TABLE}").fetchall()]
+    buckets = ticker_bucket(known, _marker_buckets(parts[DATASET_MARKER][0])) if known else []
+    stale = pd.DataFrame(
+        [(t, year) for bucket, year in map(_partition_key, changed + removed)
+         for t, b in zip(known, buckets) if b == bucket],
+        columns=["ticker", "year"],
+    )
+
+    col_list = ", ".join(f'"{c}"' for c in columns)
+    con.register("stale_keys", stale)
+    if staged is not None:
+        con.register("staged_features", staged)
+    try:
+        with _transaction(con):
+            con.execute(f"""
+                DELETE FROM {FEATURES_TABLE} f USING stale_keys k
+                WHERE f.ticker = k.ticker AND year(f.date) = k.year;
+            """)
+            if staged is not None:
+                con.execute(f"""
+                    INSERT OR REPLACE INTO {FEATURES_TABLE} ({col_list})
+                    SELECT {col_list} FROM staged_features
+                    ORDER BY ticker, date;
+                """)
+            _set_watermark(con, FEATURES_TABLE, 0 if staged is None else len(staged))
+            _set_partitions(con, FEATURES_TABLE, parts)
+    finally:
+        con.unregister("stale_keys")
+        if staged is not None:
+            con.unregister("staged_features")
+
+    n_rows = 0 if staged is None else len(staged)
+    print(f"[INFO] Upsert de {n_rows} linhas em {FEATURES_TABLE} "
+          f"({len(changed)} partições alteradas, {len(removed)} removidas).")
+    affected = set(stale["ticker"]) | (set() if staged is None else set(staged["ticker"].astype(str)))
+    return sorted(affected)
+
+
+# ===============================================================
+# KPIs: recalculados só para os tickers afetados
+# ===============================================================
+
+def refresh_kpis(con,
+                 tickers: list[str] | None = None,
+                 tables: tuple[str, ...] = (KPIS_PERIODS_TABLE, KPIS_TABLE)) -> None:
+    """
+    Recalcula asset_kpis_periods e asset_kpis_summary (etl/transform/kpi_engine.py)
+    a partir de asset_features_daily. tickers=None recria as tabelas inteiras;
+    caso contrário, substitui só as linhas desses tickers. tables limita quais
+    das duas são materializadas (as demais podem estar em modo view).
+    """
+    if not tables:
+        return
+    if tickers is None:
+        df = con.execute(f"SELECT ticker, date, ret_1d FROM {FEATURES_TABLE}").df()
+    else:
+        df = con.execute(
+            f"SELECT ticker, date, ret_1d FROM {FEATURES_TABLE} WHERE ticker IN (SELECT UNNEST(?))",
+            [list(tickers)],
+        ).df()
+    periods = compute_kpis_by_period(df)
+    frames = {KPIS_PERIODS_TABLE: periods, KPIS_TABLE: summary_from_periods(periods)}
+
+    with _transaction(con):
+        for table in tables:
+            con.register("kpis_new", frames[table])
+            try:
+                if tickers is None or not _table_exists(con, table):
+                    _drop_if(con, table, "VIEW")
+                    con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM kpis_new ORDER BY ticker;")
+                else:
+                    con.execute(f"DELETE FROM {table} WHERE ticker IN (SELECT UNNEST(?))", [list(tickers)])
+                    con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM kpis_new;")
+            finally:
+                con.unregister("kpis_new")
+
+    scope = "todos os tickers" if tickers is None else f"{len(tickers)} tickers"
+    print(f"[INFO] KPIs recalculados ({scope}): {', '.join(tables)}.")
+
+
+# ===============================================================
+# Modo view: views externas sobre o Parquet do GOLD (sem cópia)
+# ===============================================================
+
+def _kpis_source(gold_dir: Path, table: str) -> tuple[str, list] | None:
+    path = gold_dir / f"{table}.parquet"
+    if not path.exists():
+        return None
+    return "SELECT * FROM read_parquet(?)", [path.as_posix()]
+
+
+def create_external_view(con, name: str, source: tuple[str, list]) -> None:
+    """
+    Cria (ou recria) name como view sobre os arquivos Parquet do GOLD. Não copia
+    dados: cada consulta lê o Parquet, com poda de partições/row groups.
+    """
+    select_sql, params = source
+    # Views não aceitam parâmetros preparados: o caminho entra como literal
+    literal = "'" + params[0].replace("'", "''") + "'"
+    with _transaction(con):
+        _drop_if(con, name, "BASE TABLE")
+        con.execute(f"CREATE OR REPLACE VIEW {name} AS {select_sql.replace('?', literal)};")
+    print(f"[INFO] View {name} -> {params[0]}")
+
+
+def create_indexes(con, columns: list[str]) -> None:
+    """
+    Índices ART extras em asset_features_daily para buscas pontuais (a chave
+    primária (ticker, date) já tem o seu). Ex.: ['date'] para cortes transversais.
+    """
+    for col in columns:
+        con.execute(f"CREATE INDEX IF NOT EXISTS idx_{FEATURES_TABLE}_{col} ON {FEATURES_TABLE} ({col});")
+
+
+def _table_modes(settings: dict, mode: str | None) -> dict[str, str]:
+    """
+    Modo (table | view) de cada tabela: 'warehouse.tables' de configs/etl.yml,
+    ou mode para todas (opção --mode).
+    """
+    modes = {}
+    for table in (FEATURES_TABLE, KPIS_TABLE, KPIS_PERIODS_TABLE):
+        modes[table] = mode or settings["tables"].get(table, "table")
+        if modes[table] not in ("table", "view"):
+            raise ValueError(f"Modo inválido para {table}: {modes[table]!r} (use 'table' ou 'view').")
+    return modes
+
+
+def load_features(con, source: tuple[str, list], full: bool, gold_dir: Path) -> list[str] | None:
+    """
+    asset_features_daily materializada: upsert incremental ou recriação.
+    Retorna os tickers afetados (None = recriada por completo).
+    """
+    affected = None
+    parts = gold_partitions(gold_dir)
+    incremental = (
+        not full
+        and _table_exists(con, FEATURES_TABLE)
+        and bool(loaded_partitions(con, FEATURES_TABLE))
+    )
+    if incremental:
+        affected = upsert_features(con, parts)
+        if affected is None:
+            print("[INFO] GOLD reconstruído ou com esquema/layout novo; recriando asset_features_daily.")
+    if affected is None:
+        print(f"[INFO] Criando tabela {FEATURES_TABLE} a partir de {source[1][0]}")
+        _drop_if(con, FEATURES_TABLE, "VIEW")
+        n_rows = rebuild_features_table(con, source, parts)
+        print(f"[INFO] {n_rows} linhas carregadas em {FEATURES_TABLE}.")
+    return affected
+
+
+def build_warehouse(con, gold_dir: Path, modes: dict[str, str], full: bool, settings: dict) -> None:
+    """
+    Cria/atualiza as tabelas do warehouse em con conforme o modo de cada uma.
+    """
+    _ensure_watermarks(con)
+    _ensure_partitions(con)
+
+    # === 1. asset_features_daily ===
+    source = features_source(gold_dir)
+    if source is None:
+        print(f"[WARN] asset_features_daily não encontrado em {gold_dir}. Tabela asset_features_daily não será criada.")
+        return
+
+    affected = None
+    if modes[FEATURES_TABLE] == "view":
+        create_external_view(con, FEATURES_TABLE, source)
+    else:
+        affected = load_features(con, source, full, gold_dir)
+        create_indexes(con, list(settings.get("indexes") or []))
+
+    # === 2. KPIs (asset_kpis_summary / asset_kpis_periods) ===
+    materialized = []
+    for table in (KPIS_PERIODS_TABLE, KPIS_TABLE):
+        kpis_source = _kpis_source(gold_dir, table)
+        if modes[table] == "view" and kpis_source is not None:
+            create_external_view(con, table, kpis_source)
+        else:
+            if modes[table] == "view":
+                print(f"[WARN] {table}.parquet não encontrado no GOLD; {table} será materializada.")
+            materialized.append(table)
+
+    # Sem upsert (view ou recriação), tabelas de KPI inexistentes ou recém
+    # trocadas de modo são recalculadas por completo
+    if affected is None or any(not _table_exists(con, t) for t in materialized):
+        refresh_kpis(con, None, tuple(materialized))
+    elif affected:
+        refresh_kpis(con, affected, tuple(materialized))
+    else:
+        print("[INFO] Nenhuma linha nova no GOLD; warehouse já está atualizado.")
+
+
+# ===============================================================
+# Consultas canônicas (comparação table x view)
+# ===============================================================
+
+CANONICAL_QUERIES = {
+    # Últimas features de cada ticker
+    "latest_per_ticker": f"""
+        SELECT * FROM {FEATURES_TABLE}
+        QUALIFY row_number() OVER (PARTITION BY ticker ORDER BY date DESC) = 1
+    """,
+    # Histórico completo de um ticker
+    "ticker_history": f"""
+        SELECT * FROM {FEATURES_TABLE}
+        WHERE ticker = (SELECT min(ticker) FROM {KPIS_TABLE})
+        ORDER BY date
+    """,
+    # Corte transversal em uma data
+    "cross_section": f"""
+        SELECT * FROM {FEATURES_TABLE}
+        WHERE date = (SELECT max(end_date) FROM {KPIS_PERIODS_TABLE} WHERE period_type = 'all')
+        ORDER BY ticker
+    """,
+}
+
+
+def time_queries(con, repeats: int = 5) -> dict[str, float]:
+    """
+    Mediana (em ms) de repeats execuções de cada consulta canônica.
+    """
+    timings = {}
+    for name, sql in CANONICAL_QUERIES.items():
+        con.execute(sql).fetchall()  # aquecimento
+        runs = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            con.execute(sql).fetchall()
+            runs.append(time.perf_counter() - t0)
+        timings[name] = sorted(runs)[len(runs) // 2] * 1000
+    return timings
+
+
+def run_benchmark(gold_dir: Path, settings: dict, repeats: int = 5) -> pd.DataFrame:
+    """
+    Monta o warehouse em bancos temporários nos dois modos (table e view) e
+    cronometra as consultas canônicas, para escolher o modo de cada carga de
+    trabalho em 'warehouse.tables'.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("table", "view"):
+            con = duckdb.connect((Path(tmp) / f"bench_{mode}.duckdb").as_posix())
+            t0 = time.perf_counter()
+            build_warehouse(con, gold_dir, _table_modes(settings, mode), True, settings)
+            build_ms = (time.perf_counter() - t0) * 1000
+            results[mode] = {"build": build_ms, **time_queries(con, repeats)}
+            con.close()
+            results[mode]["db_size_mb"] = (Path(tmp) / f"bench_{mode}.duckdb").stat().st_size / 2**20
+
+    report = pd.DataFrame(results)
+    report.index.name = "metrica"
+    print("\n[INFO] Benchmark table x view (mediana em ms; tamanho do banco em MB):")
+    print(report.round(2))
+    return report
+
+
+def main(full: bool = False, mode: str | None = None, benchmark: bool = False):
+    """
+    Carrega o GOLD no warehouse DuckDB.
+
+    Cada tabela (configs/etl.yml, 'warehouse.tables', ou mode para todas) é:
+    - table: cópia nativa ordenada por (ticker, date), com chave primária e
+      índices opcionais ('warehouse.indexes'). Por padrão a carga é
+      incremental: recarga só das partições do GOLD novas, alteradas ou
+      removidas desde a última carga (_etl_partitions) e recálculo dos KPIs
+      apenas dos tickers afetados.
+      full=True (ou tabela inexistente / esquema alterado) recria tudo.
+    - view: view externa sobre o Parquet do GOLD, sem cópia de dados.
+
+    benchmark=True cronometra as consultas canônicas nos dois modos.
+
+    Rodar a partir da raiz do projeto: python -m etl.create_duckdb_warehouse
+    """
     print(f"[INFO] Projeto raiz: {PROJECT_ROOT}")
     print(f"[INFO] Diretório GOLD: {GOLD_DIR}")
     print(f"[INFO] Banco DuckDB: {DB_PATH}")
 
     # Cria diretórios se necessário
     DATA_DIR.mkdir(exist_ok=True, parents=True)
+    settings = load_etl_settings()["warehouse"]
+    modes = _table_modes(settings, mode)
 
     # Conecta (cria o arquivo se não existir)
     con = duckdb.connect(DB_PATH.as_posix())
     print("[INFO] Conectado ao DuckDB.")
+    t0 = time.perf_counter()
 
-    # === 1. Criar / recriar tabela asset_features_daily ===
-    features_parquet = GOLD_DIR / "asset_features_daily.parquet"
-    if features_parquet.exists():
-        print(f"[INFO] Criando tabela asset_features_daily a partir de {features_parquet.name}")
-        con.execute("""
-            CREATE OR REPLACE TABLE asset_features_daily AS
-            SELECT *
-            FROM read_parquet(?);
-        """, [features_parquet.as_posix()])
-    else:
-        print(f"[WARN] Arquivo {features_parquet} não encontrado. Tabela asset_features_daily não será criada.")
-
-    # === 2. Criar / recriar tabela asset_kpis_summary ===
-    kpis_parquet = GOLD_DIR / "asset_kpis_summary.parquet"
-    if kpis_parquet.exists():
-        print(f"[INFO] Criando tabela asset_kpis_summary a partir de {kpis_parquet.name}")
-        con.execute("""
-            CREATE OR REPLACE TABLE asset_kpis_summary AS
-            SELECT *
-            FROM read_parquet(?);
-        """, [kpis_parquet.as_posix()])
-    else:
-        print(f"[WARN] Arquivo {kpis_parquet} não encontrado. Tabela asset_kpis_summary não será criada.")
+    with stage_metrics("warehouse", full=full) as m:
+        m.read(GOLD_DIR)
+        build_warehouse(con, GOLD_DIR, modes, full, settings)
+        m.rows_out = con.execute(f"SELECT count(*) FROM {FEATURES_TABLE}").fetchone()[0]
+        con.execute("CHECKPOINT")
+        m.wrote(DB_PATH)
 
     # (Opcional) listar tabelas criadas
-    tables = con.execute("SHOW TABLES").df()
+    tables = con.execute("SELECT table_name, table_type FROM information_schema.tables ORDER BY 1").df()
     print("\n[INFO] Tabelas no warehouse:")
     print(tables)
 
     con.close()
-    print("\n[INFO] Warehouse DuckDB construído/atualizado com sucesso.")
+    print(f"\n[INFO] Warehouse DuckDB construído/atualizado com sucesso ({time.perf_counter() - t0:.2f}s).")
+
+    if benchmark:
+        run_benchmark(GOLD_DIR, settings)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Carrega o GOLD no warehouse DuckDB.")
+    parser.add_argument("--full", action="store_true",
+                        help="recria todas as tabelas em vez da carga incremental")
+    parser.add_argument("--mode", choices=["table", "view"], default=None,
+                        help="modo de todas as tabelas (padrão: warehouse.tables de configs/etl.yml)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="cronometra as consultas canônicas nos modos table e view")
+    parser.add_argument("--profile", action="store_true",
+                        help="grava um cProfile da carga em data/_metrics/profiles/")
+    args = parser.parse_args()
+    enable_profiling(args.profile)
+    main(full=args.full, mode=args.mode, benchmark=args.benchmark)
@@ -1,17 +1,17 @@
 import yaml
-import time
 import pandas as pd
-import yfinance as yf
 
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
-from etl.utils.config import DATA_DIR, CONFIG_DIR
-from etl.utils.io import ensure_dir
+from etl.extract.fetcher import HistorySource, fetch_histories
+from etl.utils.config import DATA_DIR, CONFIG_DIR, load_assets_config, load_etl_settings, get_paths
+from etl.utils.io import RAW_FORMATS, append_raw_part, ensure_dir, raw_suffix, read_excel_or_csv, write_raw
 
 
 CARTEIRA_FILE = DATA_DIR / "raw" / "Carteira Ativos.xlsx"
 ASSETS_YML   = CONFIG_DIR / "assets.yml"
+IBOV_SYMBOL  = "^BVSP"
 
 
 # ===============================================================
@@ -48,85 +48,247 @@ def extract_tickers_from_carteira(carteira_path: Path) -> List[str]:
 # 2. Download históricos via yfinance (ações, FIIs e IBOV)
 # ===============================================================
 
-def download_price_history_yfinance(ticker: str,
-                                    out_dir: Path,
-                                    start: str = "2015-01-01") -> Path:
+def _find_date_col(df: pd.DataFrame) -> str | None:
+    for c in df.columns:
+        if str(c).strip().lower() in ("date", "data", "datetime"):
+            return c
+    return None
+
+
+def _stored_history_path(out_path: Path) -> Path | None:
     """
-    Baixa histórico diário de um ativo da B3 via yfinance e salva em XLSX.
+    Localiza o histórico já salvo para out_path. Se não existir no formato atual,
+    procura o mesmo arquivo em outro formato bruto (ex.: migração XLSX -> Parquet).
+    """
+    if out_path.exists():
+        return out_path
+    for suffix in RAW_FORMATS.values():
+        candidate = out_path.with_suffix(suffix)
+        if candidate.exists():
+            return candidate
+    return None
 
-    Para ativos da B3, usa o padrão '<TICKER>.SA', por exemplo:
-    - BBAS3 -> BBAS3.SA
-    - ALZR11 -> ALZR11.SA
 
-    A função achata colunas MultiIndex, se existirem, antes de salvar.
+def load_stored_history(out_path: Path) -> Tuple[Path | None, pd.DataFrame]:
     """
-    ensure_dir(out_dir)
+    Lê uma única vez o histórico já salvo para out_path e retorna (arquivo
+    encontrado, frame). Quando o histórico já está em Parquet no caminho de
+    out_path, o trecho novo vira uma nova parte (append_raw_part) e basta
+    a coluna de data para o watermark; nos demais casos o frame é o histórico
+    inteiro, reaproveitado no append.
+    """
+    stored = _stored_history_path(out_path)
+    if stored is None:
+        return None, pd.DataFrame()
+    if stored == out_path and out_path.suffix.lower() == ".parquet":
+        import pyarrow.dataset as ds
 
-    yf_ticker = f"{ticker}.SA"
-    print(f"[YF] Baixando histórico de {ticker} via yfinance ({yf_ticker})...")
+        names = ds.dataset(stored, format="parquet").schema.names
+        date_col = next((c for c in names if str(c).strip().lower() in ("date", "data", "datetime")), None)
+        return stored, pd.read_parquet(stored, columns=[date_col] if date_col else [])
+    return stored, read_excel_or_csv(stored)
 
-    hist = yf.download(
-        yf_ticker,
-        start=start,
-        auto_adjust=False,
-        group_by="column",
-        progress=False,
-    )
 
-    if hist.empty:
-        print(f"[AVISO] yfinance não retornou dados para {ticker}. Salvando vazio.")
-        df = pd.DataFrame()
-    else:
-        df = hist.reset_index()  # 'Date' vira coluna
-
-        # Se vier MultiIndex nas colunas, achata
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = [
-                "_".join([str(c) for c in col if c not in (None, "", " ")])
-                for col in df.columns.to_list()
-            ]
-
-    out_path = out_dir / f"{ticker}.xlsx"
-    df.to_excel(out_path, index=False)
-    time.sleep(0.3)  # pequena pausa para evitar rate limit
-    print(f"[OK] {ticker} salvo em {out_path}")
+def _last_date(df: pd.DataFrame) -> pd.Timestamp | None:
+    date_col = _find_date_col(df)
+    if df.empty or date_col is None:
+        return None
+    last = pd.to_datetime(df[date_col]).max()
+    return None if pd.isna(last) else last
+
+
+def read_last_stored_date(path: Path) -> pd.Timestamp | None:
+    """
+    Lê o histórico já salvo em disco e retorna a última data armazenada (watermark).
+    Retorna None se o arquivo não existir, estiver vazio ou não tiver coluna de data.
+    """
+    return _last_date(load_stored_history(path)[1])
+
+
+def _incremental_start(last: pd.Timestamp | None, start: str) -> str | None:
+    """
+    Calcula a data inicial do download incremental: dia seguinte ao último já
+    salvo (last, de read_last_stored_date). Retorna None quando o histórico já
+    está atualizado até hoje.
+    """
+    if last is None:
+        return start
+
+    next_day = (last + pd.Timedelta(days=1)).normalize()
+    if next_day > pd.Timestamp.today().normalize():
+        return None
+    return max(next_day, pd.Timestamp(start)).strftime("%Y-%m-%d")
+
+
+def _append_history(df_new: pd.DataFrame, df_old: pd.DataFrame) -> pd.DataFrame:
+    """
+    Concatena o trecho recém-baixado ao histórico existente (df_old, já lido
+    por load_stored_history), removendo datas repetidas (mantém a versão mais
+    recente de cada data).
+    """
+    if df_old.empty:
+        return df_new
+    if df_new.empty:
+        return df_old
+
+    date_col = _find_date_col(df_new)
+    df_old[date_col] = pd.to_datetime(df_old[date_col])
+    df_new[date_col] = pd.to_datetime(df_new[date_col])
+
+    df = pd.concat([df_old, df_new], ignore_index=True)
+    df = df.drop_duplicates(subset=[date_col], keep="last")
+    return df.sort_values(date_col).reset_index(drop=True)
+
+
+def _appends_parts(df_new: pd.DataFrame, stored: Path | None, out_path: Path) -> bool:
+    """
+    True se o trecho novo pode virar uma parte do histórico Parquet em
+    out_path: mesmo arquivo e mesmas colunas (senão o histórico é reescrito).
+    """
+    if stored != out_path or out_path.suffix.lower() != ".parquet":
+        return False
+    import pyarrow.dataset as ds
+
+    return ds.dataset(stored, format="parquet").schema.names == [str(c) for c in df_new.columns]
+
+
+def _save_history(df: pd.DataFrame,
+                  out_path: Path,
+                  label: str,
+                  incremental: bool,
+                  export_xlsx: bool = False,
+                  stored: Tuple[Path | None, pd.DataFrame] | None = None) -> Path:
+    """
+    Persiste o histórico baixado no formato bruto de out_path (Parquet, Arrow ou XLSX);
+    em modo incremental, anexa ao que já existe (stored, de load_stored_history).
+    Em Parquet, só as datas após o watermark são gravadas, como uma nova parte;
+    nos outros formatos o arquivo é reescrito. Com export_xlsx=True, grava
+    também uma cópia XLSX em data/exports para consulta manual.
+    """
+    if incremental:
+        stored_path, df_old = stored if stored is not None else load_stored_history(out_path)
+        if df.empty and out_path.exists():
+            print(f"[YF] Nenhum dado novo para {label}.")
+            return out_path
+        last = _last_date(df_old)
+        if last is not None and _appends_parts(df, stored_path, out_path):
+            date_col = _find_date_col(df)
+            df = df[pd.to_datetime(df[date_col]) > last]
+            if df.empty:
+                print(f"[YF] Nenhum dado novo para {label}.")
+                return out_path
+            append_raw_part(df, out_path)
+            if export_xlsx:
+                write_raw(read_excel_or_csv(out_path), get_paths()["exports"] / f"{out_path.stem}.xlsx")
+            print(f"[OK] {label}: {len(df)} linha(s) anexada(s) em {out_path}")
+            return out_path
+        if stored_path == out_path and out_path.suffix.lower() == ".parquet":
+            df_old = read_excel_or_csv(stored_path)  # só a coluna de data foi lida
+        df = _append_history(df, df_old)
+
+    write_raw(df, out_path)
+    if export_xlsx and out_path.suffix.lower() != ".xlsx":
+        write_raw(df, get_paths()["exports"] / f"{out_path.stem}.xlsx")
+    print(f"[OK] {label} salvo em {out_path}")
     return out_path
 
 
-def download_ibov_yfinance(out_dir: Path,
-                           start: str = "2015-01-01") -> Path:
+def download_histories_yfinance(items: List[Tuple[str, str, Path]],
+                                start: str = "2015-01-01",
+                                incremental: bool = False,
+                                source: HistorySource | None = None,
+                                export_xlsx: bool = False,
+                                **fetch_kwargs) -> Dict[str, str]:
     """
-    Baixa histórico do IBOVESPA via yfinance (ticker '^BVSP') e salva como IBOV.xlsx.
+    Baixa vários históricos de uma vez com o fetcher concorrente em lotes.
+
+    - items: lista de (rótulo, símbolo yfinance, arquivo de saída)
+    - incremental: lê a última data já salva (watermark) de cada arquivo,
+      baixa apenas o intervalo faltante e anexa ao histórico existente (cada
+      arquivo é lido uma vez; em Parquet o trecho novo vira uma parte).
+    - export_xlsx: grava também uma cópia XLSX de cada histórico em data/exports.
+    - source / fetch_kwargs: repassados para fetch_histories (fonte plugável,
+      batch_size, max_workers, rate_per_sec, max_retries, backoff).
+
+    Retorna {rótulo: mensagem} dos itens que falharam.
     """
-    ensure_dir(out_dir)
+    requests: Dict[str, str] = {}
+    targets: Dict[str, Tuple[str, Path]] = {}
+    stored: Dict[str, Tuple[Path | None, pd.DataFrame]] = {}
+
+    for label, yf_symbol, out_path in items:
+        ensure_dir(out_path.parent)
+        if incremental:
+            stored[yf_symbol] = load_stored_history(out_path)
+            fetch_start = _incremental_start(_last_date(stored[yf_symbol][1]), start)
+        else:
+            fetch_start = start
+        if fetch_start is None:
+            stored.pop(yf_symbol, None)
+            print(f"[YF] {label} já está atualizado em {out_path}. Nada a baixar.")
+            continue
+        requests[yf_symbol] = fetch_start
+        targets[yf_symbol] = (label, out_path)
+
+    if not requests:
+        return {}
+
+    print(f"[YF] Baixando {len(requests)} históricos via yfinance...")
+    histories, fetch_errors = fetch_histories(requests, source=source, **fetch_kwargs)
+
+    errors: Dict[str, str] = {}
+    for yf_symbol, (label, out_path) in targets.items():
+        if yf_symbol in fetch_errors:
+            errors[label] = fetch_errors[yf_symbol]
+            continue
+        df = histories.get(yf_symbol, pd.DataFrame())
+        if df.empty:
+            print(f"[AVISO] yfinance não retornou dados para {label}.")
+        _save_history(df, out_path, label, incremental, export_xlsx, stored.get(yf_symbol))
+
+    return errors
 
-    yf_ticker = "^BVSP"
-    print(f"[YF] Baixando histórico do IBOV via yfinance ({yf_ticker})...")
 
-    hist = yf.download(
-        yf_ticker,
-        start=start,
-        auto_adjust=False,
-        group_by="column",
-        progress=False,
-    )
+def download_price_history_yfinance(ticker: str,
+                                    out_dir: Path,
+                                    start: str = "2015-01-01",
+                                    incremental: bool = False,
+                                    source: HistorySource | None = None,
+                                    raw_format: str = "parquet") -> Path:
+    """
+    Baixa histórico diário de um ativo da B3 via yfinance e salva em data/raw
+    no formato raw_format ('parquet', 'arrow' ou 'xlsx').
+
+    Para ativos da B3, usa o padrão '<TICKER>.SA', por exemplo:
+    - BBAS3 -> BBAS3.SA
+    - ALZR11 -> ALZR11.SA
 
-    if hist.empty:
-        print("[AVISO] yfinance não retornou dados para o IBOV. Salvando vazio.")
-        df = pd.DataFrame()
-    else:
-        df = hist.reset_index()
-
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = [
-                "_".join([str(c) for c in col if c not in (None, "", " ")])
-                for col in df.columns.to_list()
-            ]
-
-    out_path = out_dir / "IBOV.xlsx"
-    df.to_excel(out_path, index=False)
-    time.sleep(0.3)
-    print(f"[OK] IBOV salvo em {out_path}")
+    As colunas são achatadas no formato '<Campo>_<SÍMBOLO>' antes de salvar.
+    Com incremental=True, baixa apenas as datas posteriores à última já salva.
+    """
+    out_path = out_dir / f"{ticker}{raw_suffix(raw_format)}"
+    errors = download_histories_yfinance([(ticker, f"{ticker}.SA", out_path)],
+                                         start=start, incremental=incremental, source=source)
+    if errors:
+        raise RuntimeError(f"Falha ao baixar {ticker}: {errors[ticker]}")
+    return out_path
+
+
+def download_ibov_yfinance(out_dir: Path,
+                           start: str = "2015-01-01",
+                           incremental: bool = False,
+                           source: HistorySource | None = None,
+                           raw_format: str = "parquet") -> Path:
+    """
+    Baixa histórico do IBOVESPA via yfinance (ticker '^BVSP') e salva como
+    IBOV.<ext> no formato raw_format ('parquet', 'arrow' ou 'xlsx').
+    Com incremental=True, baixa apenas as datas posteriores à última já salva.
+    """
+    out_path = out_dir / f"IBOV{raw_suffix(raw_format)}"
+    errors = download_histories_yfinance([("IBOV", IBOV_SYMBOL, out_path)],
+                                         start=start, incremental=incremental, source=source)
+    if errors:
+        raise RuntimeError(f"Falha ao baixar IBOV: {errors['IBOV']}")
     return out_path
 
 
@@ -134,12 +296,21 @@ def download_ibov_yfinance(out_dir: Path,
 # 3. Criar assets.yml
 # ===============================================================
 
-def build_assets_yaml(tickers: List[str]) -> Dict:
+def build_assets_yaml(tickers: List[str], raw_format: str = "parquet", previous: Dict | None = None) -> Dict:
     """
-    Gera o dicionário de configuração (assets.yml) no formato esperado pelo ETL.
+    Gera o dicionário de configuração (assets.yml) no formato esperado pelo ETL,
+    apontando para os arquivos brutos no formato raw_format.
+
+    previous (opcional): assets.yml atual; o setor de cada ticker e os
+    benchmarks além do IBOV (arquivos mantidos à parte) são preservados.
     """
-    assets = [{"ticker": t, "path": f"{t}.xlsx"} for t in tickers]
-    benchmark = [{"name": "IBOV", "path": "IBOV.xlsx"}]
+    suffix = raw_suffix(raw_format)
+    previous = previous or {}
+    sectors = {a["ticker"]: a["sector"] for a in previous.get("assets") or [] if a.get("sector")}
+    assets = [{"ticker": t, "path": f"{t}{suffix}", **({"sector": sectors[t]} if t in sectors else {})}
+              for t in tickers]
+    benchmark = [{"name": "IBOV", "path": f"IBOV{suffix}"}]
+    benchmark += [b for b in previous.get("benchmark") or [] if b.get("name") != "IBOV"]
     return {"assets": assets, "benchmark": benchmark}
 
 
@@ -154,7 +325,11 @@ def save_assets_yaml(cfg: Dict, path: Path) -> None:
 # 4. Pipeline completo
 # ===============================================================
 
-def run_build_assets_and_download(start: str = "2015-01-01") -> None:
+def run_build_assets_and_download(start: str = "2015-01-01",
+                                  incremental: bool = False,
+                                  source: HistorySource | None = None,
+                                  raw_format: str | None = None,
+                                  **fetch_kwargs) -> None:
     """
     Pipeline completo usando somente yfinance:
 
@@ -163,7 +338,23 @@ def run_build_assets_and_download(start: str = "2015-01-01") -> None:
       3) Baixa histórico de cada ticker via yfinance (TICKER.SA)
       4) Baixa histórico do IBOV (^BVSP)
       5) Gera configs/assets.yml
+
+    Com incremental=True, cada ticker baixa apenas o intervalo após a última
+    data já salva em data/raw (refresh diário em segundos).
+
+    Os downloads (ativos + IBOV) são feitos pelo fetcher concorrente em lotes,
+    com token bucket e retry; fetch_kwargs ajusta batch_size, max_workers,
+    rate_per_sec, max_retries e backoff (padrões na seção 'download' de configs/etl.yml).
+
+    Os históricos são salvos no formato raw_format (padrão: 'raw.format' de
+    configs/etl.yml, normalmente Parquet), usado de ponta a ponta pelo assets.yml
+    e pelo RAW -> BRONZE.
     """
+    settings = load_etl_settings()
+    raw_format = raw_format or settings["raw"]["format"]
+    suffix = raw_suffix(raw_format)
+    fetch_kwargs = {**settings["download"], **fetch_kwargs}
+
     if not CARTEIRA_FILE.exists():
         raise FileNotFoundError(f"Arquivo da carteira não encontrado: {CARTEIRA_FILE}")
 
@@ -173,19 +364,26 @@ def run_build_assets_and_download(start: str = "2015-01-01") -> None:
 
     raw_dir = DATA_DIR / "raw"
 
-    print("\n[ETAPA] Baixando históricos dos ativos (yfinance):")
-    for t in tickers:
-        download_price_history_yfinance(t, raw_dir, start=start)
-
-    print("\n[ETAPA] Baixando histórico do IBOV (yfinance):")
-    download_ibov_yfinance(raw_dir, start=start)
+    print("\n[ETAPA] Baixando históricos dos ativos e do IBOV (yfinance):")
+    items = [(t, f"{t}.SA", raw_dir / f"{t}{suffix}") for t in tickers]
+    items.append(("IBOV", IBOV_SYMBOL, raw_dir / f"IBOV{suffix}"))
+    errors = download_histories_yfinance(items, start=start, incremental=incremental,
+                                         source=source,
+                                         export_xlsx=settings["raw"]["export_xlsx"],
+                                         **fetch_kwargs)
+    for label, msg in errors.items():
+        print(f"[ERRO] {label}: {msg}")
 
     print("\n[ETAPA] Gerando assets.yml...")
-    cfg = build_assets_yaml(tickers)
+    previous = load_assets_config() if ASSETS_YML.exists() else None
+    cfg = build_assets_yaml(tickers, raw_format=raw_format, previous=previous)
     save_assets_yaml(cfg, ASSETS_YML)
 
     print("\n[FINALIZADO] Pipeline via yfinance concluído com sucesso!")
 
 
 if __name__ == "__main__":
-    run_build_assets_and_download(start="2015-01-01")
\ No newline at end of file
+    import sys
+
+    run_build_assets_and_download(start="2015-01-01",
+                                  incremental="--incremental" in sys.argv)
\ No newline at end of file
@@ -1,21 +1,95 @@
 # etl/extract/extract_benchmark.py
 
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import pandas as pd
 
 from etl.utils.config import load_assets_config, get_paths
 from etl.utils.io import read_excel_or_csv, save_parquet
+from etl.utils.schema import compact_frame
+from etl.utils.cache import RawChangeCache, code_fingerprint, config_fingerprint
+from etl.extract.extract_prices import _resolve_workers
 
+# Tipos de série de benchmark em assets.yml (chave 'kind'):
+# - price: índice/cotação (IBOV, IFIX, SMLL, USD/BRL); retorno = variação do fechamento
+# - rate: taxa diária em % (CDI, série 12 do SGS/BCB); o fechamento é o índice acumulado
+BENCHMARK_KINDS = ("price", "rate")
 
-def standardize_benchmark_df(df_raw: pd.DataFrame) -> pd.DataFrame:
+
+# ===============================================================
+# 1. Benchmarks de configs/assets.yml
+# ===============================================================
+
+def benchmark_prefix(entry: dict) -> str:
+    """
+    Prefixo das colunas do benchmark (<prefixo>_close, <prefixo>_ret_1d):
+    a chave 'prefix' da entrada ou o nome em minúsculas, com símbolos
+    trocados por '_' (IBOV -> ibov, USD/BRL -> usd_brl).
+    """
+    prefix = entry.get("prefix") or re.sub(r"[^0-9a-z]+", "_", str(entry["name"]).lower()).strip("_")
+    if not prefix:
+        raise ValueError(f"Prefixo inválido para o benchmark {entry.get('name')!r}.")
+    return prefix
+
+
+def benchmark_bronze_path(bronze_dir: Path, entry: dict) -> Path:
+    """
+    Parquet de BRONZE do benchmark: benchmark_<NOME>.parquet (ex.: benchmark_IBOV.parquet).
+    """
+    name = re.sub(r"[^0-9A-Za-z]+", "_", str(entry["name"])).strip("_")
+    return bronze_dir / f"benchmark_{name}.parquet"
+
+
+def benchmark_entries(cfg: dict | None = None) -> list[dict]:
     """
-    Padroniza o layout do benchmark (IBOV) vindo do Excel gerado pelo yfinance.
+    Entradas da chave 'benchmark' de configs/assets.yml, na ordem do arquivo
+    (a ordem das colunas no SILVER), com prefixos únicos.
+    """
+    cfg = cfg if cfg is not None else load_assets_config()
+    entries = cfg.get("benchmark") or []
+    prefixes = [benchmark_prefix(e) for e in entries]
+    duplicated = sorted({p for p in prefixes if prefixes.count(p) > 1})
+    if duplicated:
+        raise ValueError(f"Prefixos de benchmark repetidos em configs/assets.yml: {duplicated}")
+    for e in entries:
+        if e.get("kind", "price") not in BENCHMARK_KINDS:
+            raise ValueError(f"'kind' inválido para o benchmark {e['name']}: {e.get('kind')!r} "
+                             f"(use {' ou '.join(BENCHMARK_KINDS)}).")
+    return entries
+
+
+def rate_prefixes(cfg: dict | None = None) -> set[str]:
+    """
+    Prefixos dos benchmarks de taxa (kind: rate): sem cotação no dia, a taxa
+    não rende, então o retorno do dia é 0 (e não NaN).
+    """
+    return {benchmark_prefix(e) for e in benchmark_entries(cfg) if e.get("kind", "price") == "rate"}
+
+
+# ===============================================================
+# 2. Padronização
+# ===============================================================
+
+def standardize_benchmark_df(df_raw: pd.DataFrame,
+                             prefix: str = "ibov",
+                             kind: str = "price",
+                             date_format: str | None = None) -> pd.DataFrame:
+    """
+    Padroniza o layout de um benchmark vindo do Excel gerado pelo yfinance
+    (ou de uma série de taxa, com kind='rate').
 
     Entrada típica (IBOV.xlsx via yfinance.reset_index()):
         Date, Open_^BVSP, High_^BVSP, Low_^BVSP, Close_^BVSP, Adj Close_^BVSP, Volume_^BVSP
 
-    Saída:
+    Saída (prefix='ibov'):
         date, ibov_close, ibov_ret_1d
+
+    Com kind='rate' a entrada é uma taxa diária em % (ex.: CDI do SGS: data,
+    valor); ibov_ret_1d vira a taxa / 100 e ibov_close o índice acumulado.
+
+    date_format: formato da coluna de data (ex.: '%d/%m/%Y' no SGS); sem
+    ele, o pandas infere o formato.
     """
     df = df_raw.copy()
 
@@ -27,6 +101,10 @@ def standardize_benchmark_df(df_raw: pd.DataFrame) -> pd.DataFrame:
     df.rename(columns=col_lower, inplace=True)
     # Ex.: 'Adj Close_^BVSP' -> 'adj close_^bvsp'
 
+    if len(df.columns) == 1:
+        raise ValueError(f"Benchmark com uma única coluna ({df.columns[0]!r}); ajuste 'read_options' "
+                         f"(sep) em configs/assets.yml.")
+
     # 2) Detecta coluna de data
     date_col = None
     for c in df.columns:
@@ -49,42 +127,119 @@ def standardize_benchmark_df(df_raw: pd.DataFrame) -> pd.DataFrame:
                 close_col = c
                 break
 
+    if close_col is None and kind == "rate":
+        for c in df.columns:
+            if c != date_col and any(k in c for k in ("valor", "value", "rate", "taxa")):
+                close_col = c
+                break
+
     if close_col is None:
         raise ValueError("Coluna de fechamento ('Adj Close' ou 'Close') não encontrada no benchmark.")
 
     # 4) Monta DataFrame padronizado
+    close, ret = f"{prefix}_close", f"{prefix}_ret_1d"
     df_std = df[[date_col, close_col]].copy()
-    df_std.rename(columns={date_col: "date", close_col: "ibov_close"}, inplace=True)
+    df_std.rename(columns={date_col: "date", close_col: close}, inplace=True)
 
     # 5) Converte para datetime e ordena
-    df_std["date"] = pd.to_datetime(df_std["date"])
+    df_std["date"] = pd.to_datetime(df_std["date"], format=date_format)
     df_std = df_std.sort_values("date")
 
-    # 6) Calcula retorno diário
-    df_std["ibov_ret_1d"] = df_std["ibov_close"].pct_change()
+    # 6) Calcula retorno diário (taxa: acumula o índice a partir da taxa do dia)
+    if kind == "rate":
+        rate = pd.to_numeric(df_std[close], errors="coerce") / 100.0
+        bad = rate.isna() & df_std[close].notna()
+        if bad.any():
+            raise ValueError(f"Taxa não numérica no benchmark ({df_std[close][bad].iloc[0]!r}); "
+                             f"ajuste 'read_options' (sep/decimal) em configs/assets.yml.")
+        df_std[close] = (1.0 + rate.fillna(0.0)).cumprod()
+    df_std[ret] = df_std[close].pct_change()
+
+    return compact_frame(df_std)
 
-    return df_std
 
+def extract_benchmark(entry: dict, file_path: Path, out_path: Path) -> int:
+    """
+    RAW -> BRONZE de um benchmark. Retorna o número de linhas gravadas.
+    'read_options' da entrada vai para a leitura do CSV e 'date_format', para
+    a padronização.
+    """
+    df_raw = read_excel_or_csv(file_path, entry.get("read_options"))
+    df_std = standardize_benchmark_df(df_raw, benchmark_prefix(entry), entry.get("kind", "price"),
+                                      entry.get("date_format"))
+    save_parquet(df_std, out_path)
+    return len(df_std)
 
-def run_extract_benchmark() -> None:
+
+def _extract_benchmark_safe(entry: dict, file_path: Path, out_path: Path) -> tuple[str, str | None]:
     """
-    RAW -> BRONZE para o benchmark (IBOV) definido em configs/assets.yml.
+    Versão de extract_benchmark que não propaga exceções (usada nos workers):
+    retorna (nome, mensagem de erro ou None).
+    """
+    try:
+        extract_benchmark(entry, file_path, out_path)
+        return entry["name"], None
+    except Exception as e:
+        return entry["name"], f"{type(e).__name__}: {e}"
+
+
+# ===============================================================
+# 3. RAW -> BRONZE de todos os benchmarks
+# ===============================================================
+
+def run_extract_benchmark(use_cache: bool = True, max_workers: int | None = None) -> None:
+    """
+    RAW -> BRONZE para todos os benchmarks e séries de fatores definidos em
+    configs/assets.yml (IBOV, IFIX, SMLL, CDI, USD/BRL, ...), um Parquet por
+    benchmark (benchmark_<NOME>.parquet, colunas <prefixo>_close e
+    <prefixo>_ret_1d).
+
+    Os arquivos são independentes e extraídos em paralelo, no mesmo pool de
+    processos da extração de preços ('extract.max_workers' de configs/etl.yml).
+
+    Com use_cache=True, reaproveita o BRONZE de cada benchmark cujo arquivo
+    bruto, entrada em assets.yml e código de padronização não mudaram.
+    Falhas são reunidas e levantadas ao final (a etapa roda de novo).
     """
-    cfg = load_assets_config()
     paths = get_paths()
     raw_dir: Path = paths["raw"]
     bronze_dir: Path = paths["bronze"]
 
-    bench_cfg_list = cfg.get("benchmark", [])
-    if not bench_cfg_list:
+    entries = benchmark_entries()
+    if not entries:
         raise ValueError("Nenhum benchmark definido em configs/assets.yml (chave 'benchmark').")
 
-    bench_cfg = bench_cfg_list[0]
-    file_path = raw_dir / bench_cfg["path"]
-
-    df_raw = read_excel_or_csv(file_path)
-    df_std = standardize_benchmark_df(df_raw)
-
-    out_path = bronze_dir / "benchmark_IBOV.parquet"
-    save_parquet(df_std, out_path)
-    print(f"[EXTRACT] Benchmark IBOV salvo em BRONZE: {out_path}")
+    cache = RawChangeCache(bronze_dir) if use_cache else None
+    code_fp = code_fingerprint(extract_benchmark)
+
+    jobs = []
+    for entry in entries:
+        file_path = raw_dir / entry["path"]
+        out_path = benchmark_bronze_path(bronze_dir, entry)
+        key = f"benchmark:{entry['name']}"
+        if cache is not None and cache.is_fresh(key, file_path, out_path, code_fp, config_fingerprint(entry)):
+            print(f"[EXTRACT] Benchmark {entry['name']} inalterado; BRONZE reaproveitado: {out_path}")
+            continue
+        jobs.append((entry, file_path, out_path))
+
+    workers = min(_resolve_workers(max_workers), len(jobs))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_extract_benchmark_safe, *job) for job in jobs]
+            errors = dict(fut.result() for fut in as_completed(futures))
+    else:
+        errors = dict(_extract_benchmark_safe(*job) for job in jobs)
+
+    for entry, file_path, out_path in jobs:
+        if errors[entry["name"]] is not None:
+            print(f"[ERRO] Benchmark {entry['name']}: {errors[entry['name']]}")
+            continue
+        if cache is not None:
+            cache.record(f"benchmark:{entry['name']}", file_path, out_path, code_fp, config_fingerprint(entry))
+        print(f"[EXTRACT] Benchmark {entry['name']} salvo em BRONZE: {out_path}")
+    if cache is not None:
+        cache.save()
+
+    failed = {name: err for name, err in errors.items() if err is not None}
+    if failed:
+        raise RuntimeError(f"Falha ao extrair {len(failed)} benchmark(s): {', '.join(sorted(failed))}")
@@ -0,0 +1,315 @@
+# etl/extract/extract_intraday.py
+
+from pathlib import Path
+from typing import Iterator
+import numpy as np
+import pandas as pd
+
+from etl.utils.config import load_assets_config, load_etl_settings, get_paths
+from etl.utils.io import read_excel_or_csv, save_parquet
+from etl.utils.metrics import stage_metrics
+from etl.extract.extract_prices import (
+    PRICE_FIELDS,
+    _csv_header,
+    _resolve_columns,
+    _ticker_column,
+    symbol_to_ticker,
+)
+
+# Colunas extras das barras diárias agregadas a partir de barras intraday
+INTRADAY_FIELDS = ["vwap", "realized_vol", "intraday_range", "n_bars"]
+# Valores de 'interval' (configs/assets.yml) que indicam barras diárias
+DAILY_INTERVALS = ("", "1d", "d", "daily")
+# Nomes aceitos (substrings) para a coluna de data/hora das barras
+TIMESTAMP_NAMES = ("datetime", "timestamp", "date", "data", "time", "hora")
+
+NS_PER_DAY = 86_400 * 10**9
+
+# Agregados parciais por (ticker, pregão): somas e extremos que se combinam
+# entre blocos do arquivo. rv é a soma dos retornos log ao quadrado dentro
+# da parte; first_close liga a parte à anterior do mesmo pregão.
+PARTIAL_COLUMNS = ["first_ts", "open", "high", "low", "close", "volume", "pv", "rv", "n_bars", "first_close"]
+
+
+def intraday_sources() -> set[Path]:
+    """
+    Arquivos brutos de configs/assets.yml com barras intraday: ativos com
+    'interval' diferente de diário (ex.: interval: 1m, interval: 5m).
+    """
+    raw_dir = get_paths()["raw"]
+    return {
+        raw_dir / asset["path"]
+        for asset in load_assets_config().get("assets", [])
+        if str(asset.get("interval", "1d")).strip().lower() not in DAILY_INTERVALS
+    }
+
+
+# ===============================================================
+# 1. Leitura em blocos
+# ===============================================================
+
+def _intraday_columns(columns: list[str]) -> tuple[int, int | None, dict[str, int]]:
+    """
+    (posição da data/hora, posição do ticker ou None, {campo OHLCV: posição}),
+    com a mesma detecção de colunas de standardize_price_df.
+    """
+    ticker_pos = _ticker_column(columns)
+    others = [i for i in range(len(columns)) if i != ticker_pos]
+    names = [str(columns[i]).strip() for i in others]
+    ts = next((k for k, c in enumerate(names) if any(p in c.lower() for p in TIMESTAMP_NAMES)), None)
+    if ts is None:
+        raise ValueError("Coluna de data/hora ('Datetime'/'Timestamp'/'Date') não encontrada.")
+    names[ts] = "date"
+    date_pos, _, picks = _resolve_columns(names, single=True)
+    return others[date_pos], ticker_pos, {field: others[pos] for (_, field), pos in picks.items()}
+
+
+def _intraday_frames(file_path: Path, settings: dict) -> Iterator[pd.DataFrame]:
+    """
+    Blocos do arquivo de barras, só com as colunas necessárias, renomeadas
+    para [date (data/hora), ticker (se houver), open, high, low, close, volume]:
+    - Parquet: um lote de até 'intraday.batch_rows' linhas por vez (por row group);
+    - CSV: leitor do Arrow em blocos de 'extract.stream.block_mb';
+    - demais formatos (Excel, Arrow IPC): o arquivo inteiro, de uma vez.
+    """
+    import pyarrow as pa
+
+    suffix = file_path.suffix.lower()
+    if suffix == ".parquet":
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(file_path)
+        header = pf.schema_arrow.names
+    elif suffix == ".csv":
+        header = _csv_header(file_path)
+    else:
+        df = read_excel_or_csv(file_path)
+        header = [str(c) for c in df.columns]
+
+    ts_pos, ticker_pos, picks = _intraday_columns(header)
+    positions = [ts_pos] + ([ticker_pos] if ticker_pos is not None else []) + [picks[f] for f in PRICE_FIELDS]
+    columns = [header[p] for p in positions]
+    names = ["date"] + (["ticker"] if ticker_pos is not None else []) + PRICE_FIELDS
+
+    if suffix == ".parquet":
+        for batch in pf.iter_batches(batch_size=int(settings["intraday"]["batch_rows"]), columns=columns):
+            yield batch.to_pandas().set_axis(names, axis=1)
+    elif suffix == ".csv":
+        import pyarrow.csv as pacsv
+        # Data/hora com tipo inferido no primeiro bloco (com ou sem fuso);
+        # ticker como texto e campos em float64 fixos em todos os blocos
+        column_types = {c: pa.float64() for c in columns[-len(PRICE_FIELDS):]}
+        if ticker_pos is not None:
+            column_types[header[ticker_pos]] = pa.string()
+        block_size = int(settings["extract"]["stream"]["block_mb"] * 2**20)
+        reader = pacsv.open_csv(
+            file_path,
+            read_options=pacsv.ReadOptions(use_threads=True, block_size=block_size),
+            convert_options=pacsv.ConvertOptions(include_columns=columns, column_types=column_types),
+        )
+        for batch in reader:
+            yield batch.to_pandas().set_axis(names, axis=1)
+    else:
+        yield df.iloc[:, positions].set_axis(names, axis=1)
+
+
+def _session_ns(values: pd.Series, timezone: str) -> np.ndarray:
+    """
+    Horário local do pregão em ns (int64). Datas com fuso são convertidas
+    para 'timezone'; sem fuso, já são o horário local da bolsa.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+        try:
+            values = pd.to_datetime(values)
+        except ValueError:  # offsets diferentes na mesma coluna
+            values = pd.to_datetime(values, utc=True)
+    if values.dt.tz is not None:
+        values = values.dt.tz_convert(timezone).dt.tz_localize(None)
+    return values.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+# ===============================================================
+# 2. Agregação (barras -> partes por pregão -> barra diária)
+# ===============================================================
+
+def _bars_to_partials(frame: pd.DataFrame,
+                      ticker: str | None,
+                      wanted: set[str] | None,
+                      timezone: str) -> pd.DataFrame:
+    """
+    Converte um bloco de barras em agregados parciais por (ticker, pregão):
+    cada barra é uma parte de uma barra só, combinadas por _combine_partials.
+    """
+    values = frame[PRICE_FIELDS].to_numpy(dtype=np.float64)
+    ns = _session_ns(frame["date"], timezone)
+    if "ticker" in frame.columns:
+        codes, uniques = pd.factorize(frame["ticker"].astype(str))
+        mapped = np.array([symbol_to_ticker(u.strip()) for u in uniques], dtype=object)
+        names = np.unique(mapped)
+        codes = np.searchsorted(names, mapped)[codes] if len(mapped) else codes
+    else:
+        if ticker is None:
+            raise ValueError("Arquivo intraday sem coluna de ticker com mais de um ativo.")
+        names, codes = np.array([ticker], dtype=object), np.zeros(len(frame), dtype=np.int64)
+
+    o, h, l, c, v = values.T
+    keep = ~np.isnan(c) & (ns != np.iinfo(np.int64).min)
+    if wanted is not None:
+        keep &= np.isin(names, list(wanted))[codes]
+    o, h, l, c, v, ns, codes = o[keep], h[keep], l[keep], c[keep], v[keep], ns[keep], codes[keep]
+
+    v = np.nan_to_num(v)
+    typical = np.where(np.isnan(h) | np.isnan(l), c, (h + l + c) / 3)
+    bars = pd.DataFrame({
+        "ticker": pd.Categorical.from_codes(codes, categories=names),
+        "day": ns // NS_PER_DAY,
+        "first_ts": ns,
+        "open": o, "high": h, "low": l, "close": c, "volume": v,
+        "pv": typical * v,
+        "rv": np.zeros(len(c)),
+        "n_bars": np.ones(len(c), dtype=np.int64),
+        "first_close": c,
+    })
+    return _combine_partials(bars)
+
+
+def _combine_partials(part: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combina partes do mesmo (ticker, pregão) em ordem de horário: abertura da
+    primeira, fechamento da última, máxima/mínima, somas de volume e de
+    preço x volume, e variância realizada somando, além das internas, o
+    retorno entre o fechamento de uma parte e o primeiro da seguinte.
+
+    Vale para partes que não se sobrepõem no tempo (barras de cada ticker em
+    ordem de horário no arquivo, como nos dumps por ticker ou por horário).
+    Devolve uma linha por (ticker, pregão), ordenada por ticker e pregão.
+    """
+    if part.empty:
+        return part.reset_index(drop=True)
+    ticker = part["ticker"]
+    if not isinstance(ticker.dtype, pd.CategoricalDtype):
+        ticker = ticker.astype("category")
+    codes, names = ticker.cat.codes.to_numpy(), ticker.cat.categories
+    days = part["day"].to_numpy()
+    order = np.lexsort((part["first_ts"].to_numpy(), days, codes))
+    codes, days = codes[order], days[order]
+    p = {col: part[col].to_numpy()[order] for col in PARTIAL_COLUMNS}
+
+    new = np.r_[True, (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])]
+    starts = np.flatnonzero(new)
+    ends = np.r_[starts[1:], len(codes)] - 1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap = np.log(p["first_close"][1:] / p["close"][:-1])
+    rv = p["rv"].copy()
+    rv[1:] += np.where(new[1:], 0.0, np.nan_to_num(gap, nan=0.0, posinf=0.0, neginf=0.0)) ** 2
+
+    return pd.DataFrame({
+        "ticker": pd.Categorical.from_codes(codes[starts], categories=names),
+        "day": days[starts],
+        "first_ts": p["first_ts"][starts],
+        "open": p["open"][starts],
+        "high": np.fmax.reduceat(p["high"], starts),
+        "low": np.fmin.reduceat(p["low"], starts),
+        "close": p["close"][ends],
+        "volume": np.add.reduceat(p["volume"], starts),
+        "pv": np.add.reduceat(p["pv"], starts),
+        "rv": np.add.reduceat(rv, starts),
+        "n_bars": np.add.reduceat(p["n_bars"], starts),
+        "first_close": p["first_close"][starts],
+    })
+
+
+def _daily_from_partials(part: pd.DataFrame) -> pd.DataFrame:
+    """
+    Barra diária no esquema de BRONZE (date, ticker, OHLCV) mais as colunas
+    intraday: vwap (preço típico ponderado pelo volume), realized_vol (raiz
+    da soma dos retornos log intraday ao quadrado; NaN com uma barra só),
+    intraday_range ((máxima - mínima) / abertura) e n_bars.
+    """
+    volume = part["volume"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vwap = np.where(volume > 0, part["pv"].to_numpy() / volume, np.nan)
+        intraday_range = (part["high"].to_numpy() - part["low"].to_numpy()) / part["open"].to_numpy()
+    n_bars = part["n_bars"].to_numpy()
+    return pd.DataFrame({
+        "date": part["day"].to_numpy().astype("datetime64[D]").astype("datetime64[ns]"),
+        "ticker": part["ticker"].astype("category").cat.remove_unused_categories().array,
+        "open": part["open"].to_numpy(),
+        "high": part["high"].to_numpy(),
+        "low": part["low"].to_numpy(),
+        "close": part["close"].to_numpy(),
+        "volume": volume,
+        "vwap": vwap,
+        "realized_vol": np.where(n_bars > 1, np.sqrt(part["rv"].to_numpy()), np.nan),
+        "intraday_range": intraday_range,
+        "n_bars": n_bars,
+    })
+
+
+def aggregate_intraday(file_path: Path,
+                       tickers: list[str] | None = None,
+                       settings: dict | None = None) -> pd.DataFrame:
+    """
+    Agrega um arquivo de barras intraday (1 min, 5 min, ...) em barras diárias:
+
+        date, ticker, open, high, low, close, volume,
+        vwap, realized_vol, intraday_range, n_bars
+
+    O arquivo é lido bloco a bloco (_intraday_frames) e cada bloco vira
+    agregados parciais por (ticker, pregão), combinados ao final; o
+    histórico de barras nunca fica inteiro na memória, só as partes (no
+    máximo ~uma linha por ticker e pregão, compactadas a cada
+    'intraday.max_partial_rows').
+
+    Aceita o layout longo (coluna de ticker) ou um ativo por arquivo (tickers
+    com um único ticker). O pregão é a data no fuso 'intraday.timezone'.
+    tickers filtra os ativos lidos do layout longo.
+    """
+    settings = settings or load_etl_settings()
+    cfg = settings["intraday"]
+    wanted = set(tickers) if tickers else None
+    single = tickers[0] if tickers and len(tickers) == 1 else None
+
+    with stage_metrics("intraday_aggregate", profile=False, report=False, file=file_path.name) as m:
+        m.rows_in = 0
+        parts, pending = [], 0
+        for frame in _intraday_frames(file_path, settings):
+            m.rows_in += len(frame)
+            parts.append(_bars_to_partials(frame, single, wanted, cfg["timezone"]))
+            pending += len(parts[-1])
+            if pending > cfg["max_partial_rows"] and len(parts) > 1:
+                parts = [_combine_partials(pd.concat(parts, ignore_index=True))]
+                pending = len(parts[0])
+        partials = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+            columns=["ticker", "day"] + PARTIAL_COLUMNS)
+        daily = _daily_from_partials(_combine_partials(partials))
+        m.rows_out = len(daily)
+        m.read(file_path)
+    return daily
+
+
+def extract_intraday_assets(tickers: list[str],
+                            file_path: Path,
+                            out_paths: list[Path],
+                            settings: dict | None = None) -> dict[str, str]:
+    """
+    RAW -> BRONZE de ativos com barras intraday (interval em assets.yml):
+    agrega o arquivo em barras diárias (aggregate_intraday) e salva um
+    prices_<TICKER>.parquet por ativo, com as colunas intraday além do OHLCV.
+    Retorna {ticker: erro} dos ativos ausentes do arquivo.
+    """
+    daily = aggregate_intraday(file_path, tickers, settings)
+    errors = {}
+    # Frame ordenado por ticker: cada ativo é uma fatia contígua
+    codes = daily["ticker"].cat.codes.to_numpy()
+    bounds = np.searchsorted(codes, np.arange(len(daily["ticker"].cat.categories) + 1))
+    position = {t: i for i, t in enumerate(daily["ticker"].cat.categories)}
+    for ticker, out_path in zip(tickers, out_paths):
+        if ticker not in position:
+            errors[ticker] = f"ValueError: ticker {ticker} ausente em {file_path.name}"
+            continue
+        i = position[ticker]
+        df_ticker = daily.iloc[bounds[i]:bounds[i + 1]].reset_index(drop=True)
+        df_ticker["ticker"] = df_ticker["ticker"].cat.remove_unused_categories()
+        save_parquet(df_ticker, out_path)
+    return errors
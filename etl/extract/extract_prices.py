@@ -1,10 +1,250 @@
 # etl/extract/extract_prices.py
 
+import csv
+import os
+import shutil
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
-from etl.utils.config import load_assets_config, get_paths
-from etl.utils.io import read_excel_or_csv, save_parquet
+from etl.utils.config import load_assets_config, load_etl_settings, get_paths
+from etl.utils.io import (
+    DATASET_MARKER,
+    dataset_exists,
+    read_dataset,
+    read_excel_or_csv,
+    save_dataset,
+    read_parquet,
+    save_parquet,
+    staging_dir,
+)
+from etl.utils.schema import compact_frame
+from etl.utils.cache import RawChangeCache, code_fingerprint, config_fingerprint
+from etl.utils.metrics import stage_metrics
+
+
+# Dataset compactado de BRONZE (todos os prices_<TICKER>.parquet juntos)
+BRONZE_PRICES_DATASET = "prices"
+
+
+# Campos OHLCV: substrings aceitas nos nomes de coluna, em ordem de preferência
+# (o fechamento prefere o ajustado: 'adj close' antes de 'close')
+PRICE_FIELD_PATTERNS = (
+    ("adj close", "close"),
+    ("adjclose", "close"),
+    ("adj_close", "close"),
+    ("close", "close"),
+    ("open", "open"),
+    ("high", "high"),
+    ("low", "low"),
+    ("volume", "volume"),
+    ("vol", "volume"),
+)
+PRICE_FIELDS = ["open", "high", "low", "close", "volume"]
+# Nomes aceitos para a coluna de ticker em arquivos longos (um ticker por linha)
+TICKER_COLUMN_NAMES = ("ticker", "symbol", "ativo", "codigo")
+# Linhas por row group no staging da leitura em streaming
+STREAM_ROWS_PER_GROUP = 64 * 1024
+
+# Layouts de colunas já detectados: impressão digital -> layout (por processo)
+_LAYOUT_CACHE: dict[tuple, tuple] = {}
+_LAYOUT_CACHE_SIZE = 1024
+
+
+def layout_fingerprint(columns: list[str]) -> tuple:
+    """
+    Impressão digital do layout de um arquivo bruto: o nome de cada coluna
+    até o primeiro '_' (o campo, no layout '<Campo>_<SÍMBOLO>' do yfinance).
+    Não depende dos símbolos, então arquivos de tickers diferentes baixados
+    do mesmo jeito compartilham o layout.
+    """
+    return tuple(c.lower().split("_", 1)[0] for c in columns)
+
+
+def _detect_layout(columns: list[str]) -> tuple:
+    """
+    Detecta o papel de cada coluna: ('date',) para a coluna de data (a
+    primeira com 'date'/'data') e (padrão, campo, rank, início) para as
+    colunas OHLCV (padrão encontrado mais cedo no nome; no empate, o
+    preferido); None para as demais.
+    """
+    layout = []
+    date_found = False
+    for name in columns:
+        lower = name.lower()
+        if not date_found and ("date" in lower or "data" in lower):
+            layout.append(("date",))
+            date_found = True
+            continue
+        best = None
+        for rank, (pattern, field) in enumerate(PRICE_FIELD_PATTERNS):
+            pos = lower.find(pattern)
+            if pos >= 0 and (best is None or pos < best[3]):
+                best = (pattern, field, rank, pos)
+        layout.append(best)
+    return tuple(layout)
+
+
+def _column_layout(columns: list[str]) -> tuple:
+    """
+    Layout das colunas, reaproveitando o detectado para a mesma impressão
+    digital (validado pelo padrão na mesma posição de cada nome).
+    """
+    key = layout_fingerprint(columns)
+    layout = _LAYOUT_CACHE.get(key)
+    if layout is not None and all(
+        role is None or role == ("date",)
+        or name.lower()[role[3]:role[3] + len(role[0])] == role[0]
+        for name, role in zip(columns, layout)
+    ):
+        return layout
+    layout = _detect_layout(columns)
+    if len(_LAYOUT_CACHE) >= _LAYOUT_CACHE_SIZE:
+        _LAYOUT_CACHE.clear()
+    _LAYOUT_CACHE[key] = layout
+    return layout
+
+
+def symbol_to_ticker(symbol: str) -> str:
+    """
+    Ticker interno de um símbolo do yfinance: 'BBAS3.SA' -> 'BBAS3'.
+    """
+    return symbol[:-3] if symbol.upper().endswith(".SA") else symbol
+
+
+def _flat_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Achata colunas MultiIndex (Price x Ticker do yf.download) para
+    '<Campo>_<SÍMBOLO>' e traz a data do índice para uma coluna.
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy(deep=False)
+        df.columns = ["_".join(str(v).strip() for v in col if str(v).strip()) for col in df.columns]
+    if isinstance(df.index, pd.DatetimeIndex):
+        df = df.rename_axis(df.index.name or "date").reset_index()
+    return df
+
+
+def _resolve_columns(columns: list[str], single: bool) -> tuple[int, list, dict]:
+    """
+    (posição da data, símbolos, {(símbolo, campo): posição}) a partir do
+    layout das colunas. Com single=True todas as colunas são de um só ativo
+    (o sufixo do nome não é lido como símbolo) e, por campo, vale a primeira
+    coluna com o padrão preferido.
+    """
+    layout = _column_layout(columns)
+    date_pos = next((i for i, role in enumerate(layout) if role == ("date",)), None)
+    if date_pos is None:
+        raise ValueError("Coluna de data ('Date'/'Data') não encontrada na planilha.")
+
+    # (símbolo, campo) -> (rank, posição da coluna); fica a de menor rank
+    ranked: dict[tuple, tuple[int, int]] = {}
+    symbols: list = []
+    for pos, (name, role) in enumerate(zip(columns, layout)):
+        if role is None or role == ("date",):
+            continue
+        pattern, field, rank, start = role
+        symbol = None if single else (name[:start] + name[start + len(pattern):]).strip(" _-") or None
+        if symbol not in symbols:
+            symbols.append(symbol)
+        if (symbol, field) not in ranked or rank < ranked[(symbol, field)][0]:
+            ranked[(symbol, field)] = (rank, pos)
+
+    missing = [f if s is None else f"{f}_{s}" for s in symbols for f in PRICE_FIELDS if (s, f) not in ranked]
+    if missing or not symbols:
+        raise ValueError(f"Colunas OHLCV faltando na planilha: {missing or PRICE_FIELDS}")
+    return date_pos, symbols, {key: pos for key, (_, pos) in ranked.items()}
+
+
+def _reshape_long(df_raw: pd.DataFrame,
+                  single: bool,
+                  tickers: dict[str, str] | None,
+                  dropna: bool) -> pd.DataFrame:
+    """
+    Núcleo de standardize_wide_prices/standardize_price_df (ver _resolve_columns).
+    """
+    df = _flat_columns(df_raw)
+    date_pos, symbols, picks = _resolve_columns([str(c).strip() for c in df.columns], single)
+
+    # Gather único: (n_datas, n_símbolos * 5) -> (n_símbolos * n_datas, 5)
+    n, k = len(df), len(symbols)
+    idx = [picks[(s, f)] for s in symbols for f in PRICE_FIELDS]
+    values = df.iloc[:, idx].to_numpy(dtype="float64")
+    values = values.reshape(n, k, len(PRICE_FIELDS)).transpose(1, 0, 2).reshape(k * n, len(PRICE_FIELDS))
+    dates = pd.to_datetime(df.iloc[:, date_pos]).to_numpy()
+
+    out = pd.DataFrame(values, columns=PRICE_FIELDS)
+    out.insert(0, "date", np.tile(dates, k))
+    if symbols != [None]:
+        tickers = tickers or {}
+        names = [tickers.get(s) or symbol_to_ticker(s) for s in symbols]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Símbolos mapeados para o mesmo ticker: {symbols}")
+        out.insert(1, "ticker", pd.Categorical.from_codes(np.repeat(np.arange(k), n), categories=names))
+    if dropna:
+        out = out[~np.isnan(values).all(axis=1)]
+    return out.reset_index(drop=True)
+
+
+def _ticker_column(columns: list[str]) -> int | None:
+    """
+    Posição da coluna de ticker de um arquivo longo (None se não houver).
+    """
+    return next((i for i, c in enumerate(columns) if str(c).strip().lower() in TICKER_COLUMN_NAMES), None)
+
+
+def standardize_long_prices(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Padroniza um arquivo longo (uma linha por data e ticker, com coluna
+    'ticker'/'symbol'/'ativo'/'codigo', como os dumps de fornecedores) para
+    o formato interno, com a mesma detecção de colunas de standardize_price_df.
+    Tickers passam por symbol_to_ticker.
+
+    Devolve o esquema compacto, ordenado por ticker (ordem do arquivo dentro
+    de cada ticker).
+    """
+    pos = _ticker_column(list(df_raw.columns))
+    if pos is None:
+        raise ValueError(f"Coluna de ticker ({', '.join(TICKER_COLUMN_NAMES)}) não encontrada.")
+    codes, uniques = pd.factorize(df_raw.iloc[:, pos].astype(str))
+    mapped = np.array([symbol_to_ticker(u.strip()) for u in uniques], dtype=object)
+    names = np.unique(mapped)
+    codes = np.searchsorted(names, mapped)[codes] if len(mapped) else codes
+
+    df = _reshape_long(df_raw.drop(columns=df_raw.columns[pos]), True, None, dropna=False)
+    df.insert(1, "ticker", pd.Categorical.from_codes(codes, categories=names))
+    order = np.argsort(codes, kind="stable")
+    return compact_frame(df.iloc[order].reset_index(drop=True))
+
+
+def standardize_wide_prices(df_raw: pd.DataFrame,
+                            tickers: dict[str, str] | None = None,
+                            dropna: bool = True) -> pd.DataFrame:
+    """
+    Padroniza um download largo (vários tickers por arquivo) para o formato
+    longo interno:
+
+        date, ticker, open, high, low, close, volume
+
+    Aceita colunas MultiIndex (Price x Ticker, como yf.download de vários
+    símbolos) ou achatadas ('<Campo>_<SÍMBOLO>', ex.: 'Adj Close_BBAS3.SA').
+    O papel de cada coluna é detectado uma vez por layout (ver
+    layout_fingerprint) e o reshape é um único gather numpy: nada de loops
+    por ticker.
+
+    tickers: {símbolo: ticker}; padrão: symbol_to_ticker. Colunas sem símbolo
+    (ex.: 'Close') geram um frame sem coluna ticker. dropna remove as linhas
+    em que o ticker não tem nenhum campo (datas em que não negociou).
+
+    Devolve o esquema compacto (etl/utils/schema.py) em blocos por ticker (na
+    ordem das colunas do arquivo), com as datas na ordem do arquivo dentro de
+    cada ticker, como standardize_price_df: BRONZE preserva a ordem da fonte
+    e a ordenação por data fica para o SILVER.
+    """
+    return compact_frame(_reshape_long(df_raw, False, tickers, dropna))
 
 
 def standardize_price_df(df_raw: pd.DataFrame, ticker: str | None = None) -> pd.DataFrame:
@@ -13,99 +253,353 @@ def standardize_price_df(df_raw: pd.DataFrame, ticker: str | None = None) -> pd.
 
         date, ticker, open, high, low, close, volume
 
-    - Normaliza nomes de colunas para minúsculas.
-    - Aceita variações como:
+    - Aceita variações (sem diferenciar maiúsculas) como:
         Date, data, Adj Close, Close, High, Low, Open, Volume,
         e versões com sufixo de ticker (ex.: 'close_bbas3.sa').
+    - Um ticker por arquivo; para downloads com vários tickers, ver
+      standardize_wide_prices (mesma detecção de colunas, com cache por layout).
+
+    Já devolve o esquema compacto (etl/utils/schema.py): ticker categórico e
+    volume inteiro.
     """
-    df = df_raw.copy()
+    df = _reshape_long(df_raw, True, None, dropna=False)
 
-    # 1) Normaliza nomes de colunas: strip + lower
-    col_norm = {c: str(c).strip() for c in df.columns}
-    df.rename(columns=col_norm, inplace=True)
+    # Adiciona ticker, se fornecido
+    if ticker is not None:
+        df.insert(1, "ticker", ticker)
+    return compact_frame(df)
 
-    col_lower = {c: c.lower() for c in df.columns}
-    df.rename(columns=col_lower, inplace=True)
-    # Ex.: 'Adj Close_BBAS3.SA' -> 'adj close_bbas3.sa'
 
-    # 2) Detecta coluna de data
-    date_col = None
-    for c in df.columns:
-        if "date" in c or "data" in c:
-            date_col = c
-            break
+def extract_asset(ticker: str, file_path: Path, out_path: Path) -> int:
+    """
+    RAW -> BRONZE de um único ativo: lê o arquivo bruto, padroniza e salva
+    prices_<TICKER>.parquet. Retorna o número de linhas gravadas.
+    """
+    with stage_metrics("extract_asset", profile=False, report=False, ticker=ticker) as m:
+        df_raw = read_excel_or_csv(file_path)
+        df_std = standardize_price_df(df_raw, ticker=ticker)
+        save_parquet(df_std, out_path)
+        m.rows_in, m.rows_out = len(df_raw), len(df_std)
+        m.read(file_path)
+        m.wrote(out_path)
+    return len(df_std)
 
-    if date_col is None:
-        raise ValueError("Coluna de data ('Date'/'Data') não encontrada na planilha.")
 
-    # 3) Detecta colunas OHLCV por substring
-
-    def find_col(substring_list, avoid_substrings=None):
-        """
-        Procura, na ordem, por qualquer substring em substring_list dentro dos nomes de coluna.
-        Opcionalmente evita colunas que contenham avoid_substrings.
-        """
-        avoid_substrings = avoid_substrings or []
-        for sub in substring_list:
-            for c in df.columns:
-                if sub in c:
-                    if any(a in c for a in avoid_substrings):
-                        continue
-                    return c
-        return None
-
-    # abertura
-    open_col = find_col(["open"])
-    # máxima
-    high_col = find_col(["high"])
-    # mínima
-    low_col = find_col(["low"])
-    # fechamento: prefere 'adj close' se existir, depois 'close'
-    close_col = find_col(["adj close", "adjclose", "adj_close"])
-    if close_col is None:
-        close_col = find_col(["close"])
-    # volume
-    volume_col = find_col(["volume", "vol"])
-
-    rename_map = {}
-    if open_col:
-        rename_map[open_col] = "open"
-    if high_col:
-        rename_map[high_col] = "high"
-    if low_col:
-        rename_map[low_col] = "low"
-    if close_col:
-        rename_map[close_col] = "close"
-    if volume_col:
-        rename_map[volume_col] = "volume"
-
-    df = df.rename(columns=rename_map)
-
-    required_cols = ["open", "high", "low", "close", "volume"]
-    missing = [c for c in required_cols if c not in df.columns]
-    if missing:
-        raise ValueError(f"Colunas OHLCV faltando na planilha: {missing}")
-
-    # 4) Monta DataFrame padronizado
-    df_std = df[[date_col, "open", "high", "low", "close", "volume"]].copy()
-    df_std.rename(columns={date_col: "date"}, inplace=True)
-
-    # 5) Converte para datetime
-    df_std["date"] = pd.to_datetime(df_std["date"])
-
-    # 6) Adiciona ticker, se fornecido
-    if ticker is not None:
-        df_std["ticker"] = ticker
+def extract_assets_wide(tickers: list[str], file_path: Path, out_paths: list[Path]) -> dict[str, str]:
+    """
+    RAW -> BRONZE de vários ativos que compartilham um arquivo bruto largo
+    (ex.: um lote do yf.download com vários símbolos) ou longo (coluna de
+    ticker): lê e padroniza o arquivo uma vez (standardize_wide_prices /
+    standardize_long_prices) e salva um prices_<TICKER>.parquet por ativo.
+    Retorna {ticker: erro} dos ativos ausentes do arquivo.
+    """
+    errors = {}
+    with stage_metrics("extract_wide", profile=False, report=False, file=file_path.name) as m:
+        df_raw = read_excel_or_csv(file_path)
+        if _ticker_column(list(df_raw.columns)) is not None:
+            df_long = standardize_long_prices(df_raw)
+        else:
+            df_long = standardize_wide_prices(df_raw)
+        m.rows_in, m.rows_out = len(df_raw), 0
+        m.read(file_path)
 
-    cols = ["date", "ticker", "open", "high", "low", "close", "volume"] if "ticker" in df_std.columns else \
-           ["date", "open", "high", "low", "close", "volume"]
+        # Frame ordenado por ticker: cada ativo é uma fatia contígua
+        codes = df_long["ticker"].cat.codes.to_numpy()
+        bounds = np.searchsorted(codes, np.arange(len(df_long["ticker"].cat.categories) + 1))
+        position = {t: i for i, t in enumerate(df_long["ticker"].cat.categories)}
+        for ticker, out_path in zip(tickers, out_paths):
+            if ticker not in position:
+                errors[ticker] = f"ValueError: ticker {ticker} ausente em {file_path.name}"
+                continue
+            i = position[ticker]
+            df_ticker = df_long.iloc[bounds[i]:bounds[i + 1]].reset_index(drop=True)
+            df_ticker["ticker"] = df_ticker["ticker"].cat.remove_unused_categories()
+            save_parquet(df_ticker, out_path)
+            m.rows_out += len(df_ticker)
+            m.wrote(out_path)
+    return errors
 
-    return df_std[cols]
 
+def _csv_header(path: Path) -> list[str]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return [c.strip() for c in next(csv.reader(f))]
 
-def run_extract_prices() -> None:
+
+def should_stream(file_path: Path, settings: dict | None = None) -> bool:
     """
-    RAW -> BRONZE para todos os ativos definidos em configs/assets.yml.
+    True se o arquivo bruto deve ser lido em streaming: CSV com pelo menos
+    'extract.stream.threshold_mb' (configs/etl.yml).
+    """
+    cfg = (settings or load_etl_settings())["extract"]["stream"]
+    return (file_path.suffix.lower() == ".csv" and file_path.exists()
+            and file_path.stat().st_size >= cfg["threshold_mb"] * 2**20)
+
+
+def extract_assets_stream(tickers: list[str],
+                          file_path: Path,
+                          out_paths: list[Path],
+                          wide: bool = False,
+                          settings: dict | None = None) -> dict[str, str]:
+    """
+    RAW -> BRONZE de um CSV grande (dump de fornecedor com milhares de tickers
+    ou muitos anos) com memória limitada, independente do tamanho do arquivo:
+
+    1) o leitor CSV do Arrow (multithread) lê o arquivo em blocos de
+       'extract.stream.block_mb', só com as colunas necessárias (data, OHLCV
+       e ticker; no layout largo, só as dos ativos pedidos);
+    2) cada bloco é padronizado (standardize_long_prices / _wide_ / _price_df)
+       e gravado direto em um dataset de staging particionado por ticker;
+    3) cada ticker é lido sozinho (só os arquivos da sua partição) e gravado
+       em prices_<TICKER>.parquet, na ordem do arquivo (o contrato do BRONZE e
+       do cache RAW -> BRONZE). O pico de memória é o de um ticker, qualquer
+       que seja o número de tickers do arquivo.
+
+    Aceita os layouts longo (coluna de ticker), largo (wide=True) e de um
+    ativo só. Retorna {ticker: erro} dos ativos ausentes do arquivo.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as ds
+
+    settings = settings or load_etl_settings()
+    cfg = settings["extract"]["stream"]
+    full_precision = bool(settings["storage"]["full_precision"])
+    header = _csv_header(file_path)
+    ticker_pos = _ticker_column(header)
+    wanted = set(tickers)
+
+    # Colunas necessárias, a partir do cabeçalho (mesma detecção dos demais layouts)
+    if ticker_pos is not None:
+        others = [c for i, c in enumerate(header) if i != ticker_pos]
+        date_pos, _, picks = _resolve_columns(others, single=True)
+        text_cols = [header[ticker_pos], others[date_pos]]
+        columns = text_cols + [others[p] for p in picks.values()]
+        standardize = standardize_long_prices
+    elif wide:
+        date_pos, symbols, picks = _resolve_columns(header, single=False)
+        keep = {s for s in symbols if symbol_to_ticker(s) in wanted}
+        text_cols = [header[date_pos]]
+        columns = text_cols + [header[p] for (s, _), p in picks.items() if s in keep]
+        standardize = standardize_wide_prices
+    else:
+        date_pos, _, picks = _resolve_columns(header, single=True)
+        text_cols = [header[date_pos]]
+        columns = text_cols + [header[p] for p in picks.values()]
+
+        def standardize(df: pd.DataFrame) -> pd.DataFrame:
+            return standardize_price_df(df, ticker=tickers[0])
+    # Tipos fixos: a inferência por bloco poderia divergir entre blocos
+    column_types = {c: (pa.string() if c in text_cols else pa.float64()) for c in columns}
+
+    schema = pa.schema([("date", pa.timestamp("ns")), ("ticker", pa.string())]
+                       + [(f, pa.float64()) for f in PRICE_FIELDS]
+                       + [("row", pa.int64())])
+    partitioning = ds.partitioning(pa.schema([("ticker", pa.string())]), flavor="hive")
+    staging = staging_dir(out_paths[0].parent / f"stream_{file_path.stem}")
+    errors = {}
+
+    with stage_metrics("extract_stream", profile=False, report=False, file=file_path.name) as m:
+        reader = pacsv.open_csv(
+            file_path,
+            read_options=pacsv.ReadOptions(use_threads=True, block_size=int(cfg["block_mb"] * 2**20)),
+            convert_options=pacsv.ConvertOptions(include_columns=columns, column_types=column_types),
+        )
+        m.rows_in, m.rows_out = 0, 0
+
+        def batches():
+            offset = 0
+            for batch in reader:
+                df = standardize(batch.to_pandas())
+                df = df[df["ticker"].isin(wanted)]
+                m.rows_in += batch.num_rows
+                if df.empty:
+                    continue
+                yield pa.RecordBatch.from_arrays(
+                    [pa.array(df["date"].to_numpy(dtype="datetime64[ns]")),
+                     pa.array(df["ticker"].astype(str).to_numpy(), pa.string())]
+                    + [pa.array(df[f].to_numpy(dtype="float64", na_value=np.nan)) for f in PRICE_FIELDS]
+                    + [pa.array(np.arange(offset, offset + len(df), dtype=np.int64))],
+                    schema=schema,
+                )
+                offset += len(df)
+
+        try:
+            ds.write_dataset(
+                batches(), staging, schema=schema, format="parquet",
+                partitioning=partitioning,
+                existing_data_behavior="overwrite_or_ignore",
+                max_partitions=len(wanted) + 1,
+                # Row groups pequenos: o escritor não acumula ~1M linhas por ticker
+                max_rows_per_group=STREAM_ROWS_PER_GROUP,
+            )
+            m.read(file_path)
+
+            # Um ticker por vez (o filtro na partição lê só os arquivos dele);
+            # sem linha de nenhum ticker pedido, o staging nem é criado
+            found = set()
+            pending = list(zip(tickers, out_paths)) if staging.exists() else []
+            if pending:
+                staged = ds.dataset(staging, format="parquet", partitioning=partitioning)
+            for ticker, out_path in pending:
+                table = staged.to_table(columns=["date", "row"] + PRICE_FIELDS, filter=ds.field("ticker") == ticker)
+                if table.num_rows == 0:
+                    continue
+                df_ticker = table.sort_by("row").drop_columns(["row"]).to_pandas()
+                del table
+                df_ticker.insert(1, "ticker", ticker)
+                save_parquet(compact_frame(df_ticker), out_path, full_precision=full_precision)
+                found.add(ticker)
+                m.rows_out += len(df_ticker)
+                m.wrote(out_path)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    for ticker in tickers:
+        if ticker not in found:
+            errors[ticker] = f"ValueError: ticker {ticker} ausente em {file_path.name}"
+    return errors
+
+
+def _extract_asset_safe(ticker: str, file_path: Path, out_path: Path) -> tuple[str, str | None]:
+    """
+    Versão de extract_asset que não propaga exceções (usada nos workers):
+    retorna (ticker, mensagem de erro ou None).
+    """
+    try:
+        extract_asset(ticker, file_path, out_path)
+        return ticker, None
+    except Exception as e:
+        return ticker, f"{type(e).__name__}: {e}"
+
+
+def _extract_group_safe(tickers: list[str],
+                        file_path: Path,
+                        out_paths: list[Path],
+                        wide: bool = False) -> list[tuple[str, str | None]]:
+    """
+    Extrai um grupo de ativos do mesmo arquivo bruto (ver group_price_jobs)
+    sem propagar exceções: [(ticker, mensagem de erro ou None)]. Arquivos de
+    barras intraday (interval em assets.yml) são agregados em barras diárias
+    (etl/extract/extract_intraday.py).
+    """
+    from etl.extract.extract_intraday import extract_intraday_assets, intraday_sources
+
+    intraday = file_path in intraday_sources()
+    if not (wide or intraday or should_stream(file_path)):
+        return [_extract_asset_safe(tickers[0], file_path, out_paths[0])]
+    try:
+        if intraday:
+            errors = extract_intraday_assets(tickers, file_path, out_paths)
+        elif should_stream(file_path):
+            errors = extract_assets_stream(tickers, file_path, out_paths, wide)
+        else:
+            errors = extract_assets_wide(tickers, file_path, out_paths)
+    except Exception as e:
+        errors = {t: f"{type(e).__name__}: {e}" for t in tickers}
+    return [(t, errors.get(t)) for t in tickers]
+
+
+def group_price_jobs(jobs: list[tuple[str, Path, Path]]) -> list[tuple[list[str], Path, list[Path], bool]]:
+    """
+    Agrupa os jobs (ticker, raw_path, out_path) por arquivo bruto: ativos que
+    apontam para o mesmo arquivo em assets.yml (download largo) são lidos e
+    padronizados de uma vez. Retorna [(tickers, raw_path, out_paths, wide)],
+    com wide=True se o arquivo é compartilhado em assets.yml (mesmo que só
+    parte dos seus ativos precise rodar).
+    """
+    raw_dir = get_paths()["raw"]
+    shared = Counter(raw_dir / a["path"] for a in load_assets_config().get("assets", []))
+    groups: dict[Path, tuple[list[str], Path, list[Path], bool]] = {}
+    for ticker, raw_path, out_path in jobs:
+        group = groups.setdefault(raw_path, ([], raw_path, [], shared[raw_path] > 1))
+        group[0].append(ticker)
+        group[2].append(out_path)
+    return list(groups.values())
+
+
+# Pool de processos compartilhado pelos tasks de extração do flow (ver
+# price_process_pool); sem ele, extract_price_group roda no próprio chamador
+_PROCESS_POOL: ProcessPoolExecutor | None = None
+
+
+@contextmanager
+def price_process_pool(max_workers: int | None = None):
+    """
+    Abre o pool de processos ('extract.max_workers') usado por
+    extract_price_group enquanto o bloco roda. Os processos são criados aqui,
+    antes de o flow abrir threads: fork a partir de um processo com threads
+    ativas pode travar o filho.
+    """
+    global _PROCESS_POOL
+    pool = ProcessPoolExecutor(max_workers=_resolve_workers(max_workers))
+    pool.submit(os.getpid).result()  # com fork, cria todos os processos agora
+    _PROCESS_POOL = pool
+    try:
+        yield pool
+    finally:
+        _PROCESS_POOL = None
+        pool.shutdown(cancel_futures=True)
+
+
+def extract_price_group(tickers: list[str],
+                        file_path: Path,
+                        out_paths: list[Path],
+                        wide: bool) -> list[tuple[str, str | None]]:
+    """
+    Extrai um grupo de group_price_jobs (um arquivo bruto) em um processo do
+    pool aberto por price_process_pool: a padronização é limitada por CPU,
+    então tasks concorrentes do flow (threads) só esperam pelo resultado.
+    Retorna [(ticker, erro ou None)], como run_extract_prices.
+    """
+    if _PROCESS_POOL is None:
+        return _extract_group_safe(tickers, file_path, out_paths, wide)
+    return _PROCESS_POOL.submit(_extract_group_safe, tickers, file_path, out_paths, wide).result()
+
+
+def _resolve_workers(max_workers: int | None) -> int:
+    if max_workers is None:
+        max_workers = load_etl_settings()["extract"]["max_workers"]
+    if not max_workers or max_workers < 1:
+        max_workers = os.cpu_count() or 1
+    return max_workers
+
+
+def compact_bronze_prices(bronze_dir: Path, tickers: list[str], storage: dict | None = None) -> bool:
+    """
+    Compacta os arquivos pequenos prices_<TICKER>.parquet de BRONZE em um único
+    dataset particionado (data/bronze/prices/, ver etl/utils/io.save_dataset).
+
+    Só reescreve se algum arquivo por ticker for mais novo que a última
+    compactação ou se faltar algum ticker no dataset. Os arquivos por ticker
+    continuam sendo a saída da extração (e do cache RAW -> BRONZE); o dataset é
+    o que load_all_bronze_prices lê. Retorna True se compactou.
+    """
+    storage = storage or load_etl_settings()["storage"]
+    root = bronze_dir / BRONZE_PRICES_DATASET
+    files = {t: bronze_dir / f"prices_{t}.parquet" for t in tickers}
+    files = {t: p for t, p in files.items() if p.exists()}
+    if not files:
+        return False
+
+    if dataset_exists(root):
+        compacted_at = (root / DATASET_MARKER).stat().st_mtime_ns
+        newer = [t for t, p in files.items() if p.stat().st_mtime_ns > compacted_at]
+        covered = set(read_dataset(root, columns=["ticker"])["ticker"].unique())
+        if not newer and set(files) <= covered:
+            return False
+
+    df = pd.concat([read_parquet(p) for p in files.values()], ignore_index=True)
+    save_dataset(df, root,
+                 n_buckets=int(storage["n_buckets"]),
+                 row_group_size=int(storage["row_group_size"]))
+    print(f"[EXTRACT] BRONZE compactado: {len(files)} arquivos -> {root}")
+    return True
+
+
+def _price_jobs(use_cache: bool = True):
+    """
+    Jobs RAW -> BRONZE de configs/assets.yml e impressões digitais do cache:
+    (jobs, cache, code_fp, config_fps), com jobs = [(ticker, raw_path, out_path)].
     """
     cfg = load_assets_config()
     paths = get_paths()
@@ -116,14 +610,109 @@ def run_extract_prices() -> None:
     if not assets:
         raise ValueError("Nenhum ativo definido em configs/assets.yml (chave 'assets').")
 
-    for asset in assets:
-        ticker = asset["ticker"]
-        # assume que 'path' é o nome do arquivo dentro de data/raw
-        file_path = raw_dir / asset["path"]
+    # assume que 'path' é o nome do arquivo dentro de data/raw
+    jobs = [
+        (asset["ticker"], raw_dir / asset["path"], bronze_dir / f"prices_{asset['ticker']}.parquet")
+        for asset in assets
+    ]
 
-        df_raw = read_excel_or_csv(file_path)
-        df_std = standardize_price_df(df_raw, ticker=ticker)
+    from etl.extract import extract_intraday as intraday
 
-        out_path = bronze_dir / f"prices_{ticker}.parquet"
-        save_parquet(df_std, out_path)
-        print(f"[EXTRACT] Ativo {ticker} salvo em BRONZE: {out_path}")
+    cache = RawChangeCache(bronze_dir) if use_cache else None
+    # Código deste módulo, de extract_intraday e dos helpers de etl.utils que importam
+    code_fp = code_fingerprint(extract_asset, intraday.aggregate_intraday)
+    config_fps = {asset["ticker"]: config_fingerprint(asset) for asset in assets}
+    return jobs, cache, code_fp, config_fps
+
+
+def plan_price_extraction(use_cache: bool = True) -> list[tuple[str, Path, Path]]:
+    """
+    Jobs (ticker, raw_path, out_path) que precisam rodar: com use_cache=True,
+    ativos cujo BRONZE ainda corresponde ao arquivo bruto ficam de fora.
+    """
+    jobs, cache, code_fp, config_fps = _price_jobs(use_cache)
+    if cache is None:
+        return jobs
+
+    fresh = [job for job in jobs
+             if cache.is_fresh(job[0], job[1], job[2], code_fp, config_fps[job[0]])]
+    for ticker, _, _ in fresh:
+        print(f"[EXTRACT] Ativo {ticker} inalterado; BRONZE reaproveitado.")
+    fresh_tickers = {job[0] for job in fresh}
+    return [job for job in jobs if job[0] not in fresh_tickers]
+
+
+def finish_price_extraction(results: list[tuple[str, str | None]], use_cache: bool = True) -> dict[str, str]:
+    """
+    Registra no manifesto do cache o resultado (ticker, erro ou None) de cada
+    extract_asset e, com storage.layout = dataset, compacta o BRONZE.
+    Retorna {ticker: mensagem de erro} dos ativos que falharam.
+    """
+    jobs, cache, code_fp, config_fps = _price_jobs(use_cache)
+    job_by_ticker = {job[0]: job for job in jobs}
+
+    errors = {}
+    for ticker, err in results:
+        _, raw_path, out_path = job_by_ticker[ticker]
+        if err is None:
+            print(f"[EXTRACT] Ativo {ticker} salvo em BRONZE: {out_path}")
+            if cache is not None:
+                cache.record(ticker, raw_path, out_path, code_fp, config_fps[ticker])
+        else:
+            errors[ticker] = err
+            print(f"[ERRO] Falha ao extrair {ticker}: {err}")
+            if cache is not None:
+                cache.invalidate(ticker)
+
+    if cache is not None:
+        cache.save()
+
+    if load_etl_settings()["storage"]["layout"] == "dataset":
+        compact_bronze_prices(get_paths()["bronze"], [job[0] for job in jobs])
+
+    if errors:
+        print(f"[EXTRACT] {len(jobs) - len(errors)}/{len(jobs)} ativos extraídos; "
+              f"{len(errors)} com erro: {sorted(errors)}")
+    return errors
+
+
+def run_extract_prices(max_workers: int | None = None, use_cache: bool = True) -> dict[str, str]:
+    """
+    RAW -> BRONZE para todos os ativos definidos em configs/assets.yml.
+
+    Cada arquivo bruto é independente: com max_workers > 1 a extração roda em
+    um pool de processos (padrão: 'extract.max_workers' de configs/etl.yml;
+    0 = todos os núcleos). Ativos que compartilham um arquivo largo
+    (vários tickers, ver standardize_wide_prices) são extraídos juntos, com
+    uma leitura só. Erros por ticker são coletados sem abortar o lote.
+
+    Com use_cache=True, ativos cujo arquivo bruto, entrada em assets.yml e
+    código de padronização não mudaram desde a última execução reaproveitam o
+    Parquet de BRONZE existente (manifesto em data/bronze/_raw_manifest.json).
+
+    Com storage.layout = dataset (configs/etl.yml), ao final os arquivos por
+    ticker são compactados em data/bronze/prices/ (compact_bronze_prices).
+
+    O flow do Prefect (etl/run_etl.py) usa as mesmas etapas, com um task por
+    arquivo bruto: plan_price_extraction -> group_price_jobs -> extração ->
+    finish_price_extraction.
+
+    Retorna {ticker: mensagem de erro} dos ativos que falharam.
+    """
+    with stage_metrics("extract_prices") as m:
+        jobs_to_run = plan_price_extraction(use_cache)
+        groups = group_price_jobs(jobs_to_run)
+
+        workers = min(_resolve_workers(max_workers), len(groups))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_extract_group_safe, *group) for group in groups]
+                results = [r for fut in as_completed(futures) for r in fut.result()]
+        else:
+            results = [r for group in groups for r in _extract_group_safe(*group)]
+
+        errors = finish_price_extraction(results, use_cache)
+        m.tags.update(extracted=len(jobs_to_run) - len(errors), failed=len(errors))
+        m.read(*[job[1] for job in jobs_to_run])
+        m.wrote(*[job[2] for job in jobs_to_run if job[0] not in errors])
+    return errors
@@ -0,0 +1,240 @@
+# etl/extract/fetcher.py
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Protocol, Tuple
+
+import pandas as pd
+
+from etl.utils.io import read_excel_or_csv
+
+
+# ===============================================================
+# 1. Fontes de dados (plugáveis)
+# ===============================================================
+
+class HistorySource(Protocol):
+    """
+    Interface mínima de uma fonte de históricos diários.
+
+    download(symbols, start) deve retornar {símbolo: DataFrame} no layout
+    "achatado" do yfinance (coluna 'Date' + colunas '<Campo>_<SÍMBOLO>').
+    Símbolos sem dados podem ser omitidos do dicionário.
+    """
+
+    def download(self, symbols: List[str], start: str) -> Dict[str, pd.DataFrame]:
+        ...
+
+
+def _split_by_symbol(hist: pd.DataFrame, symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Separa um download multi-ticker do yfinance (colunas MultiIndex Price x Ticker)
+    em um DataFrame por símbolo, com colunas '<Campo>_<SÍMBOLO>'.
+    """
+    out: Dict[str, pd.DataFrame] = {}
+    if hist.empty:
+        return out
+
+    if not isinstance(hist.columns, pd.MultiIndex):
+        # yfinance antigo: download de um único símbolo vem com colunas simples
+        df = hist.copy()
+        df.columns = [f"{c}_{symbols[0]}" for c in df.columns]
+        out[symbols[0]] = df.dropna(how="all").reset_index()
+        return out
+
+    available = set(hist.columns.get_level_values(1))
+    for sym in symbols:
+        if sym not in available:
+            continue
+        df = hist.xs(sym, axis=1, level=1).dropna(how="all")
+        if df.empty:
+            continue
+        df.columns = [f"{c}_{sym}" for c in df.columns]
+        out[sym] = df.reset_index()
+    return out
+
+
+class YFinanceSource:
+    """
+    Fonte real: yfinance, com vários símbolos por requisição.
+    """
+
+    def download(self, symbols: List[str], start: str) -> Dict[str, pd.DataFrame]:
+        import yfinance as yf
+
+        hist = yf.download(
+            symbols,
+            start=start,
+            auto_adjust=False,
+            group_by="column",
+            progress=False,
+            threads=False,
+        )
+        return _split_by_symbol(hist, symbols)
+
+
+class LocalStubSource:
+    """
+    Fonte offline para testes: serve históricos "enlatados" a partir de um
+    dicionário {símbolo: DataFrame} ou de um diretório com arquivos '<SÍMBOLO>.*'.
+
+    latency simula o tempo de ida e volta de uma requisição.
+    """
+
+    def __init__(self,
+                 histories: Dict[str, pd.DataFrame] | None = None,
+                 directory: Path | None = None,
+                 latency: float = 0.0):
+        self.histories = dict(histories or {})
+        self.directory = directory
+        self.latency = latency
+        self.calls = 0
+
+    def _load(self, symbol: str) -> pd.DataFrame | None:
+        if symbol in self.histories:
+            return self.histories[symbol]
+        if self.directory is not None:
+            for path in sorted(self.directory.glob(f"{symbol}.*")):
+                df = read_excel_or_csv(path)
+                self.histories[symbol] = df
+                return df
+        return None
+
+    def download(self, symbols: List[str], start: str) -> Dict[str, pd.DataFrame]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        out: Dict[str, pd.DataFrame] = {}
+        for sym in symbols:
+            df = self._load(sym)
+            if df is None or df.empty:
+                continue
+            df = df[pd.to_datetime(df["Date"]) >= pd.Timestamp(start)]
+            if not df.empty:
+                out[sym] = df.reset_index(drop=True)
+        return out
+
+
+# ===============================================================
+# 2. Rate limiting (token bucket)
+# ===============================================================
+
+class TokenBucket:
+    """
+    Limitador de taxa thread-safe: no máximo `rate` requisições por segundo,
+    com rajadas de até `capacity` requisições.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate deve ser positivo.")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Bloqueia até haver `tokens` disponíveis e os consome.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# ===============================================================
+# 3. Fetcher concorrente em lotes
+# ===============================================================
+
+def _make_batches(requests: Dict[str, str], batch_size: int) -> List[Tuple[str, List[str]]]:
+    """
+    Agrupa símbolos com a mesma data inicial e os divide em lotes de batch_size.
+    """
+    by_start: Dict[str, List[str]] = {}
+    for sym, start in requests.items():
+        by_start.setdefault(start, []).append(sym)
+
+    batches = []
+    for start, syms in by_start.items():
+        for i in range(0, len(syms), batch_size):
+            batches.append((start, syms[i:i + batch_size]))
+    return batches
+
+
+def _fetch_batch(source: HistorySource,
+                 limiter: TokenBucket,
+                 symbols: List[str],
+                 start: str,
+                 max_retries: int,
+                 backoff: float) -> Dict[str, pd.DataFrame]:
+    """
+    Executa uma requisição de lote com retry e backoff exponencial (com jitter).
+    """
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            return source.download(symbols, start)
+        except Exception as e:
+            if attempt >= max_retries:
+                raise
+            wait = backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+            print(f"[AVISO] Falha ao baixar {symbols} ({e}). Tentando de novo em {wait:.1f}s...")
+            time.sleep(wait)
+            attempt += 1
+
+
+def fetch_histories(requests: Dict[str, str],
+                    source: HistorySource | None = None,
+                    batch_size: int = 20,
+                    max_workers: int = 4,
+                    rate_per_sec: float = 2.0,
+                    max_retries: int = 3,
+                    backoff: float = 1.0) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """
+    Baixa os históricos de vários símbolos de forma concorrente.
+
+    - requests: {símbolo: data inicial 'YYYY-MM-DD'}
+    - source: fonte de dados (padrão: YFinanceSource)
+    - batch_size: símbolos por requisição
+    - max_workers: requisições simultâneas
+    - rate_per_sec: taxa máxima de requisições (token bucket)
+    - max_retries / backoff: política de retry exponencial por lote
+
+    Retorna (históricos, erros): históricos por símbolo e mensagem de erro dos
+    símbolos cujo lote falhou após todas as tentativas.
+    """
+    source = source if source is not None else YFinanceSource()
+    limiter = TokenBucket(rate_per_sec)
+    batches = _make_batches(requests, batch_size)
+
+    histories: Dict[str, pd.DataFrame] = {}
+    errors: Dict[str, str] = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_fetch_batch, source, limiter, syms, start, max_retries, backoff): syms
+            for start, syms in batches
+        }
+        for fut in as_completed(futures):
+            syms = futures[fut]
+            try:
+                histories.update(fut.result())
+            except Exception as e:
+                for sym in syms:
+                    errors[sym] = str(e)
+                print(f"[ERRO] Lote {syms} falhou após {max_retries} novas tentativas: {e}")
+
+    return histories, errors
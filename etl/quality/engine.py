@@ -0,0 +1,283 @@
+# etl/quality/engine.py
+
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from etl.utils.config import get_paths, load_etl_settings
+from etl.utils.io import save_parquet
+
+# Relatórios por ticker: data/_quality/<tabela>.parquet
+QUALITY_DIR_NAME = "_quality"
+
+# Regras do motor de qualidade, na ordem das colunas do relatório
+RULES = (
+    "null_dates",           # date nula
+    "null_close",           # close nulo
+    "duplicate_keys",       # (date, ticker) repetido
+    "negative_close",       # close < 0
+    "ohlc_inconsistent",    # high abaixo de open/low ou low acima de open
+    "non_positive_volume",  # volume <= 0
+    "calendar_gaps",        # pregões do calendário ausentes no histórico do ticker
+    "return_jumps",         # |retorno diário| > max_abs_return
+    "stale_prices",         # pregões com close idêntico há stale_days ou mais
+)
+SEVERITIES = ("error", "warn", "off")
+
+
+def active_rules(cfg: dict) -> dict[str, str]:
+    """
+    {regra: severidade} das regras ligadas na seção 'quality.rules'.
+    """
+    rules = {}
+    for rule, severity in cfg["rules"].items():
+        if rule not in RULES:
+            raise ValueError(f"Regra de qualidade desconhecida: {rule!r} (válidas: {', '.join(RULES)}).")
+        if severity not in SEVERITIES:
+            raise ValueError(f"Severidade inválida para {rule}: {severity!r} (use error, warn ou off).")
+        if severity != "off":
+            rules[rule] = severity
+    return rules
+
+
+def sample_tickers(tickers, fraction: float) -> list:
+    """
+    Amostra determinística de tickers (CRC32 do ticker), para avaliar tabelas
+    muito grandes em modo amostrado: históricos inteiros de uma fração dos
+    tickers, de modo que as regras sequenciais continuam válidas.
+    """
+    if fraction >= 1:
+        return list(tickers)
+    cut = int(fraction * 10_000)
+    return [t for t in tickers if zlib.crc32(str(t).encode("utf-8")) % 10_000 < cut]
+
+
+# ===============================================================
+# 1. Avaliação em pandas/numpy
+# ===============================================================
+
+def _float_column(df: pd.DataFrame, col: str) -> np.ndarray | None:
+    if col not in df.columns:
+        return None
+    return df[col].to_numpy(dtype="float64", na_value=np.nan)
+
+
+def evaluate_price_quality(df: pd.DataFrame,
+                           calendar: pd.Series | None = None,
+                           settings: dict | None = None) -> pd.DataFrame:
+    """
+    Avalia as regras de 'quality' (configs/etl.yml) em uma passada sobre os
+    dados ordenados por (ticker, date), sem interromper na primeira falha.
+
+    Cada regra é uma máscara vetorizada sobre as colunas (as sequenciais
+    comparam cada linha com a anterior do mesmo ticker) e as violações são
+    somadas por ticker com bincount. calendar: pregões de referência para
+    calendar_gaps (padrão: datas distintas de df).
+
+    Retorna o relatório por ticker: ticker, rows e uma coluna de contagem por
+    regra ativa (calendar_gaps conta pregões ausentes).
+    """
+    cfg = (settings or load_etl_settings())["quality"]
+    rules = active_rules(cfg)
+    if cfg["sample_fraction"] < 1:
+        df = df[df["ticker"].isin(sample_tickers(df["ticker"].unique(), cfg["sample_fraction"]))]
+
+    codes, names = pd.factorize(df["ticker"], use_na_sentinel=False)
+    dates = df["date"].to_numpy(dtype="datetime64[ns]")
+    close = _float_column(df, "close")
+
+    # Ordena por (ticker, date) só se preciso (BRONZE/SILVER já vêm ordenados)
+    keys = dates.view("int64")
+    step = np.diff(codes)
+    if not ((step > 0) | ((step == 0) & (np.diff(keys) >= 0))).all():
+        order = np.lexsort((keys, codes))
+        codes, dates, keys = codes[order], dates[order], keys[order]
+        close = close[order]
+        df = df.iloc[order]
+
+    n, k = len(codes), len(names)
+    valid = ~np.isnat(dates)
+    # same[i]: linha i e a anterior são do mesmo ticker, com datas válidas
+    same = np.zeros(n, dtype=bool)
+    same[1:] = (codes[1:] == codes[:-1]) & valid[1:] & valid[:-1]
+    duplicate = np.zeros(n, dtype=bool)
+    duplicate[1:] = same[1:] & (keys[1:] == keys[:-1])
+    # Pares consecutivos de pregões distintos do mesmo ticker
+    step_pair = same & ~duplicate
+    prev_close = np.empty(n)
+    prev_close[:1] = np.nan
+    prev_close[1:] = close[:-1]
+
+    masks = {}
+    if "null_dates" in rules:
+        masks["null_dates"] = ~valid
+    if "null_close" in rules:
+        masks["null_close"] = np.isnan(close)
+    if "duplicate_keys" in rules:
+        masks["duplicate_keys"] = duplicate
+    if "negative_close" in rules:
+        masks["negative_close"] = close < 0
+    if "ohlc_inconsistent" in rules and {"open", "high", "low"} <= set(df.columns):
+        # close é o ajustado (proventos), então não entra na comparação
+        o, h, l = (_float_column(df, c) for c in ("open", "high", "low"))
+        masks["ohlc_inconsistent"] = (h < o) | (h < l) | (l > o)
+    if "non_positive_volume" in rules and "volume" in df.columns:
+        masks["non_positive_volume"] = _float_column(df, "volume") <= 0
+    if "calendar_gaps" in rules:
+        cal = np.unique(dates[valid]) if calendar is None else \
+            np.sort(pd.to_datetime(pd.Series(calendar)).dropna().unique().to_numpy(dtype="datetime64[ns]"))
+        pos = np.searchsorted(cal, dates)
+        gaps = np.zeros(n, dtype=np.int64)
+        gaps[1:] = np.where(step_pair[1:], np.maximum(pos[1:] - pos[:-1] - 1, 0), 0)
+        masks["calendar_gaps"] = gaps
+    if "return_jumps" in rules:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret = close / prev_close - 1
+        masks["return_jumps"] = step_pair & (np.abs(ret) > cfg["max_abs_return"])
+    if "stale_prices" in rules:
+        # Posição de cada linha na sequência de closes idênticos do ticker
+        idx = np.arange(n)
+        run_start = np.maximum.accumulate(np.where(same & (close == prev_close), 0, idx))
+        masks["stale_prices"] = (idx - run_start) >= cfg["stale_days"] - 1
+
+    report = pd.DataFrame({"ticker": names, "rows": np.bincount(codes, minlength=k)})
+    for rule in RULES:
+        if rule in masks:
+            report[rule] = np.bincount(codes, weights=masks[rule], minlength=k).astype(np.int64)
+    return report[report["rows"] > 0].reset_index(drop=True)
+
+
+# ===============================================================
+# 2. Avaliação em SQL (DuckDB)
+# ===============================================================
+
+def evaluate_price_quality_sql(con, relation: str, settings: dict | None = None) -> pd.DataFrame:
+    """
+    Mesmo relatório de evaluate_price_quality, calculado em SQL (DuckDB) sobre
+    relation em uma varredura com janelas por ticker, sem trazer a tabela para
+    o pandas. O calendário de referência são as datas distintas de relation.
+    """
+    from etl.transform.sql_engine import relation_columns, sql_list
+
+    cfg = (settings or load_etl_settings())["quality"]
+    rules = active_rules(cfg)
+    columns = set(relation_columns(con, relation))
+    where = ""
+    if cfg["sample_fraction"] < 1:
+        tickers = [r[0] for r in con.execute(f"SELECT DISTINCT ticker FROM {relation}").fetchall()]
+        where = f"WHERE r.ticker IN (SELECT unnest({sql_list(sample_tickers(tickers, cfg['sample_fraction']))}))"
+
+    step_pair = "prev_date IS NOT NULL AND date IS NOT NULL AND date <> prev_date"
+    exprs = {
+        "null_dates": "count(*) FILTER (WHERE date IS NULL)",
+        "null_close": "count(*) FILTER (WHERE close IS NULL OR isnan(close))",
+        "duplicate_keys": "count(*) FILTER (WHERE date = prev_date)",
+        "negative_close": "count(*) FILTER (WHERE close < 0)",
+        "calendar_gaps": f"coalesce(sum(greatest(pos - prev_pos - 1, 0)) FILTER (WHERE {step_pair}), 0)",
+        "return_jumps": f"count(*) FILTER (WHERE {step_pair} AND prev_close <> 0 "
+                        f"AND abs(close / prev_close - 1) > {float(cfg['max_abs_return'])})",
+        "stale_prices": f"count(*) FILTER (WHERE run_pos >= {int(cfg['stale_days']) - 1})",
+    }
+    if {"open", "high", "low"} <= columns:
+        exprs["ohlc_inconsistent"] = "count(*) FILTER (WHERE high < open OR high < low OR low > open)"
+    if "volume" in columns:
+        exprs["non_positive_volume"] = "count(*) FILTER (WHERE volume <= 0)"
+    selected = [f"{exprs[rule]}::BIGINT AS {rule}" for rule in RULES if rule in rules and rule in exprs]
+    extra = "".join(f", r.{c}" for c in ("open", "high", "low", "volume") if c in columns)
+
+    report = con.execute(f"""
+        WITH cal AS (
+            SELECT date, row_number() OVER (ORDER BY date) AS pos
+            FROM (SELECT DISTINCT date FROM {relation} WHERE date IS NOT NULL)
+        ),
+        seq AS (
+            SELECT r.ticker, r.date, r.close{extra}, c.pos,
+                   lag(r.date) OVER w AS prev_date,
+                   lag(r.close) OVER w AS prev_close,
+                   lag(c.pos) OVER w AS prev_pos
+            FROM {relation} r LEFT JOIN cal c ON r.date = c.date
+            {where}
+            WINDOW w AS (PARTITION BY r.ticker ORDER BY r.date)
+        ),
+        runs AS (
+            SELECT *, sum(CASE WHEN prev_date IS NOT NULL AND date IS NOT NULL AND close = prev_close
+                               THEN 0 ELSE 1 END)
+                          OVER (PARTITION BY ticker ORDER BY date ROWS UNBOUNDED PRECEDING) AS run_id
+            FROM seq
+        ),
+        ranked AS (
+            SELECT *, row_number() OVER (PARTITION BY ticker, run_id ORDER BY date) - 1 AS run_pos
+            FROM runs
+        )
+        SELECT ticker, count(*)::BIGINT AS rows{''.join(', ' + s for s in selected)}
+        FROM ranked
+        GROUP BY ticker
+        ORDER BY ticker;
+    """).df()
+    return report
+
+
+# ===============================================================
+# 3. Relatório e ação
+# ===============================================================
+
+def quality_dir() -> Path:
+    return get_paths()["raw"].parent / QUALITY_DIR_NAME
+
+
+def enforce_quality(report: pd.DataFrame, table: str, settings: dict | None = None) -> None:
+    """
+    Resume o relatório, grava-o em data/_quality/<tabela>.parquet e, se
+    alguma regra de severidade 'error' tiver violações, levanta ValueError
+    listando todas (não só a primeira).
+    """
+    rules = active_rules((settings or load_etl_settings())["quality"])
+    save_parquet(report, quality_dir() / f"{table}.parquet")
+
+    errors = []
+    for rule, severity in rules.items():
+        if rule not in report.columns:
+            continue
+        hits = report.loc[report[rule] > 0, ["ticker", rule]]
+        if hits.empty:
+            continue
+        worst = ", ".join(f"{t} ({n})" for t, n in hits.sort_values(rule, ascending=False).head(5).itertuples(index=False))
+        msg = f"{rule}: {int(hits[rule].sum())} em {len(hits)} ticker(s) [{worst}]"
+        if severity == "error":
+            errors.append(msg)
+        else:
+            print(f"[AVISO] [QUALITY] {table}: {msg}")
+    if errors:
+        raise ValueError(f"Falha de qualidade em {table}: " + "; ".join(errors))
+
+
+def run_price_quality(df: pd.DataFrame,
+                      table: str = "asset_prices_daily",
+                      calendar: pd.Series | None = None,
+                      settings: dict | None = None) -> pd.DataFrame:
+    """
+    evaluate_price_quality + enforce_quality. Retorna o relatório por ticker.
+    """
+    start = time.perf_counter()
+    report = evaluate_price_quality(df, calendar, settings)
+    print(f"[QUALITY] {table}: {len(report)} tickers, {int(report['rows'].sum())} linhas "
+          f"avaliadas em {time.perf_counter() - start:.3f}s")
+    enforce_quality(report, table, settings)
+    return report
+
+
+def run_price_quality_sql(con, relation: str,
+                          table: str = "asset_prices_daily",
+                          settings: dict | None = None) -> pd.DataFrame:
+    """
+    evaluate_price_quality_sql + enforce_quality. Retorna o relatório por ticker.
+    """
+    start = time.perf_counter()
+    report = evaluate_price_quality_sql(con, relation, settings)
+    print(f"[QUALITY] {table}: {len(report)} tickers, {int(report['rows'].sum())} linhas "
+          f"avaliadas em {time.perf_counter() - start:.3f}s (SQL)")
+    enforce_quality(report, table, settings)
+    return report
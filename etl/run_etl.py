@@ -1,65 +1,203 @@
 # etl/run_etl.py
 
+import argparse
+
 from prefect import flow, task
 
-from etl.extract.extract_prices import run_extract_prices
+from etl.utils.config import load_assets_config, load_etl_settings
+from etl.extract.extract_prices import (
+    extract_price_group,
+    finish_price_extraction,
+    group_price_jobs,
+    plan_price_extraction,
+    price_process_pool,
+)
 from etl.extract.extract_benchmark import run_extract_benchmark
-from etl.transform.build_silver_prices import run_build_silver_prices
+from etl.transform.build_silver_prices import (
+    clean_silver_prices,
+    prepare_silver_ticker,
+    run_build_silver_prices,
+    save_silver_prices,
+)
 from etl.transform.build_silver_benchmark import run_build_silver_benchmark
 from etl.transform.build_gold_features_labels import run_build_gold_features_labels
+from etl.utils.lineage import pipeline_stages, record_stage, run_stage, stage_is_fresh
+from etl.utils.metrics import enable_profiling
+
+
+def _task_runner():
+    """
+    Task runner concorrente (threads) com até 'flow.max_workers' tasks
+    simultâneos (configs/etl.yml; 0 = padrão do Prefect). Prefect 3 usa
+    ThreadPoolTaskRunner; Prefect 2, ConcurrentTaskRunner. A extração, que é
+    limitada por CPU, roda em processos (extract_price_group); as threads só
+    coordenam os tasks. Montado na execução (run_flow), não na importação.
+    """
+    max_workers = load_etl_settings()["flow"]["max_workers"] or None
+    try:
+        from prefect.task_runners import ThreadPoolTaskRunner
+    except ImportError:  # Prefect 2.x
+        from prefect.task_runners import ConcurrentTaskRunner
+        return ConcurrentTaskRunner()
+    return ThreadPoolTaskRunner(max_workers=max_workers)
 
 
 # === Tasks (wrappers) ===
 
-@task(name="Extract Prices")
-def extract_prices_task() -> None:
-    run_extract_prices()
+@task(name="Plan Price Extraction")
+def plan_price_extraction_task(use_cache: bool = True) -> list:
+    return plan_price_extraction(use_cache)
+
+
+@task(name="Extract Asset", task_run_name="extract-{file_path.stem}")
+def extract_asset_task(tickers: list, file_path, out_paths: list, wide: bool) -> list[tuple[str, str | None]]:
+    return extract_price_group(tickers, file_path, out_paths, wide)
+
+
+@task(name="Finish Price Extraction")
+def finish_price_extraction_task(results: list, use_cache: bool = True) -> dict[str, str]:
+    errors = finish_price_extraction([r for group in results for r in group], use_cache)
+    if errors:
+        # A etapa não é registrada (roda de novo na próxima vez) e SILVER/GOLD,
+        # que esperam por este task, não rodam sobre BRONZE faltante ou antigo
+        raise RuntimeError(f"Falha ao extrair {len(errors)} ativo(s): {', '.join(sorted(errors))}")
+    record_stage(pipeline_stages()["extract_prices"])
+    return errors
 
 
 @task(name="Extract Benchmark")
-def extract_benchmark_task() -> None:
-    run_extract_benchmark()
+def extract_benchmark_task(use_cache: bool = True, force: bool = False) -> None:
+    run_stage("extract_benchmark", run_extract_benchmark, use_cache, force=force)
+
+
+@task(name="Prepare SILVER Ticker", task_run_name="silver-{ticker}")
+def prepare_silver_ticker_task(ticker: str):
+    return prepare_silver_ticker(ticker)
+
+
+def _save_silver_prices(frames: list) -> None:
+    settings = load_etl_settings()
+    save_silver_prices(clean_silver_prices(frames, settings), storage=settings["storage"])
+    print("[SILVER] asset_prices_daily e trading_calendar salvos")
+
+
+@task(name="Save SILVER Prices")
+def save_silver_prices_task(frames: list, force: bool = False) -> None:
+    run_stage("silver_prices", _save_silver_prices, frames, force=force)
 
 
 @task(name="Build SILVER Prices")
-def build_silver_prices_task() -> None:
-    run_build_silver_prices()
+def build_silver_prices_task(force: bool = False) -> None:
+    run_stage("silver_prices", run_build_silver_prices, force=force)
 
 
 @task(name="Build SILVER Benchmark")
-def build_silver_benchmark_task() -> None:
-    run_build_silver_benchmark()
+def build_silver_benchmark_task(force: bool = False) -> None:
+    run_stage("silver_benchmark", run_build_silver_benchmark, force=force)
 
 
 @task(name="Build GOLD Features & Labels")
-def build_gold_features_labels_task() -> None:
-    run_build_gold_features_labels()
+def build_gold_features_labels_task(mode: str = "full", force: bool = False) -> None:
+    run_stage("gold", run_build_gold_features_labels, mode, force=force, gold_mode=mode)
 
 
 # === Flow principal ===
 
 @flow(name="ETL Previsão de Ativos")
-def etl_previsao_ativos_flow() -> None:
+def etl_previsao_ativos_flow(mode: str = "full", use_cache: bool = True, force: bool = False) -> dict[str, str]:
     """
     Flow principal do Prefect para orquestrar o pipeline de ETL.
-    Ordem:
 
-    1) RAW -> BRONZE
-    2) BRONZE -> SILVER
-    3) SILVER -> GOLD
+    Dois ramos independentes rodam em paralelo no task runner concorrente
+    (ver run_flow):
+    - benchmarks: RAW -> BRONZE (um arquivo por benchmark, em paralelo) -> SILVER
+      (matriz larga benchmarks_daily)
+    - preços: um task de extração por arquivo bruto (só os que mudaram, ver o
+      cache de RAW -> BRONZE; um arquivo largo traz vários tickers), cada um
+      executado no pool de processos da extração, e, no motor pandas, um task de leitura para o SILVER
+      por ticker, que começa assim que a extração daquele ticker termina
+      (qualidade e limpeza rodam no universo reunido); no motor duckdb,
+      SILVER é um único task SQL (já paralelo) após todas as extrações.
+
+    A gravação do SILVER de preços espera o fim da extração (registro do
+    cache e compactação do BRONZE): se algum ativo falhou, o flow falha sem
+    rodar SILVER/GOLD de preços sobre BRONZE faltante ou desatualizado. O
+    GOLD espera SILVER de preços e do benchmark.
+
+    Cada etapa registra um manifesto de linhagem (hashes de entradas e saídas,
+    código e configuração; ver etl/utils/lineage.py) e é pulada se nada
+    mudou desde a última execução; se algo mudou, só as etapas afetadas
+    rodam. force=True roda tudo.
+
+    mode: modo do GOLD ('full' ou 'append'). Retorna {ticker: erro} da
+    extração (vazio; falhas levantam RuntimeError).
     """
-    # RAW -> BRONZE
-    extract_prices_task()
-    extract_benchmark_task()
-
-    # BRONZE -> SILVER
-    build_silver_prices_task()
-    build_silver_benchmark_task()
+    settings = load_etl_settings()
+    tickers = [a["ticker"] for a in load_assets_config().get("assets", [])]
+    stages = pipeline_stages()
+
+    # Ramo do benchmark
+    bench_bronze = extract_benchmark_task.submit(use_cache, force)
+    bench_silver = build_silver_benchmark_task.submit(force, wait_for=[bench_bronze])
+
+    # Ramo dos preços: RAW -> BRONZE por ticker
+    prices_fresh = not force and stage_is_fresh(stages["extract_prices"])
+    if prices_fresh:
+        print("[LINEAGE] Etapa extract_prices inalterada; pulando.")
+        extracted, extracted_by_ticker, finished = [], {}, None
+    else:
+        groups = group_price_jobs(plan_price_extraction_task(use_cache))
+        extracted = extract_asset_task.map(
+            [g[0] for g in groups], [g[1] for g in groups], [g[2] for g in groups], [g[3] for g in groups]
+        )
+        extracted_by_ticker = {t: fut for g, fut in zip(groups, extracted) for t in g[0]}
+        finished = finish_price_extraction_task.submit(extracted, use_cache)
+
+    # BRONZE -> SILVER (com BRONZE inalterado, decide já se SILVER está em dia)
+    after_extract = [finished] if finished is not None else None
+    if prices_fresh and stage_is_fresh(stages["silver_prices"]):
+        print("[LINEAGE] Etapa silver_prices inalterada; pulando.")
+        silver_prices = None
+    elif settings["transform"]["engine"] == "duckdb":
+        silver_prices = build_silver_prices_task.submit(force, wait_for=after_extract)
+    else:
+        frames = [
+            prepare_silver_ticker_task.submit(
+                ticker, wait_for=[extracted_by_ticker[ticker]] if ticker in extracted_by_ticker else None
+            )
+            for ticker in tickers
+        ]
+        silver_prices = save_silver_prices_task.submit(frames, force, wait_for=after_extract)
 
     # SILVER -> GOLD
-    build_gold_features_labels_task()
+    gold = build_gold_features_labels_task.submit(
+        mode, force, wait_for=[f for f in (silver_prices, bench_silver) if f is not None]
+    )
+
+    gold.result()
+    return finished.result() if finished is not None else {}
+
+
+def run_flow(mode: str = "full", use_cache: bool = True, force: bool = False) -> dict[str, str]:
+    """
+    Roda o flow com o task runner de configs/etl.yml (flow.max_workers) e o
+    pool de processos da extração aberto durante a execução.
+    """
+    with price_process_pool():
+        return etl_previsao_ativos_flow.with_options(task_runner=_task_runner())(
+            mode=mode, use_cache=use_cache, force=force
+        )
 
 
 if __name__ == "__main__":
     # Permite rodar localmente com: python -m etl.run_etl
-    etl_previsao_ativos_flow()
+    parser = argparse.ArgumentParser(description="Roda o pipeline RAW -> BRONZE -> SILVER -> GOLD.")
+    parser.add_argument("--mode", choices=["full", "append"], default="full",
+                        help="modo do GOLD (padrão: full)")
+    parser.add_argument("--force", action="store_true",
+                        help="roda todas as etapas, mesmo as inalteradas")
+    parser.add_argument("--profile", action="store_true",
+                        help="grava um cProfile por etapa em data/_metrics/profiles/")
+    args = parser.parse_args()
+    enable_profiling(args.profile)
+    run_flow(mode=args.mode, force=args.force)
@@ -4,107 +4,431 @@ from pathlib import Path
 import numpy as np
 import pandas as pd
 
-from etl.utils.config import get_paths
-from etl.utils.io import save_parquet
+from etl.utils.config import get_paths, load_assets_config, load_etl_settings
+from etl.utils.io import (
+    dataset_buckets,
+    dataset_exists,
+    read_dataset,
+    read_parquet,
+    save_dataset,
+    save_layer,
+    save_parquet,
+    ticker_bucket,
+)
+from etl.utils.schema import column_kind, feature_dtype, restore_frame
+from etl.utils.calendar import asof_index, calendar_days, session_keys
+from etl.extract.extract_benchmark import rate_prefixes
+from etl.transform.build_silver_benchmark import BENCHMARKS_FILE
+from etl.transform.feature_engine import (
+    Segments,
+    ema_segmented,
+    shift_segmented,
+    sort_and_segment,
+)
+from etl.transform.kpi_engine import (
+    compute_kpis_by_period,
+    kpi_partials,
+    kpis_by_period_from_partials,
+    summary_from_periods,
+    trailing_rows,
+)
+from etl.transform.panel import compute_panel_features, panel_from_long, panel_to_rows, ticker_groups
+from etl.utils.metrics import stage_metrics
+from etl.transform.feature_registry import (
+    benchmark_specs,
+    compute_features,
+    ema_features,
+    feature_base_columns,
+    feature_lookback,
+    load_feature_registry,
+    resolve_feature_set,
+)
+
+# Tabela principal do GOLD: dataset particionado <GOLD>/asset_features_daily/
+# (ou arquivo único asset_features_daily.parquet, conforme storage.layout)
+FEATURES_TABLE = "asset_features_daily"
+
+# Estado persistido para o modo incremental (append) do GOLD
+FEATURES_STATE_FILE = "asset_features_state.parquet"
+FEATURES_TAIL_FILE = "asset_features_tail.parquet"
+# Estado dos KPIs: agregados por ticker x mês e retornos das janelas trailing
+KPIS_PARTIALS_FILE = "asset_kpis_partials.parquet"
+KPIS_RECENT_FILE = "asset_kpis_recent.parquet"
+
+
+def state_tail_rows(registry: dict, computed: list[str]) -> int:
+    """
+    Linhas de SILVER guardadas por ticker no tail do modo incremental: a
+    última linha processada (re-finalizada no append) mais o histórico que
+    as features calculadas exigem para ela (maior soma de janelas e
+    deslocamentos do registro; ex.: vol_63d sobre ret_1d = 63 linhas).
+    """
+    return feature_lookback(registry["asset"], computed) + 1
+
+
+def _seeded_emas(df: pd.DataFrame, seg: Segments, values: np.ndarray,
+                 ema_state: pd.DataFrame, names: list[str], spans: list[int]) -> np.ndarray:
+    """
+    EMAs continuando das já conhecidas: as linhas de df presentes em
+    ema_state (ticker, date) recebem as EMAs guardadas (o tail do modo
+    incremental, para lags e janelas sobre EMAs) e as linhas posteriores à
+    última data conhecida de cada ticker seguem a recorrência a partir dela.
+    Tickers sem estado são calculados do zero.
+    """
+    tickers = ema_state["ticker"].astype(str).to_numpy()
+    known = pd.DataFrame(ema_state[names].to_numpy(dtype=np.float64), columns=names,
+                         index=pd.MultiIndex.from_arrays([tickers, ema_state["date"].to_numpy()]))
+    last = ema_state.groupby(tickers, sort=False)["date"].max()
+
+    row_tickers = df["ticker"].astype(str).to_numpy()
+    dates = df["date"].to_numpy()
+    last_date = last.reindex(row_tickers).to_numpy()
+    out = known.reindex(pd.MultiIndex.from_arrays([row_tickers, dates])).to_numpy(dtype=np.float64, copy=True)
+
+    after = np.isnat(last_date) | (dates > last_date)
+    if after.any():
+        codes = np.repeat(np.arange(len(seg.starts)), seg.lengths)[after]
+        sub = Segments(codes)
+        saved = known.reindex(pd.MultiIndex.from_arrays([row_tickers[after], last_date[after]]))
+        init = saved.to_numpy(dtype=np.float64)[sub.starts]
+        out[after] = ema_segmented(values[after], sub, spans, init=init)
+    return out
+
+
+def _requested_asset_features(registry: dict, features: str | list[str] | None) -> list[str]:
+    """
+    Features de ativo a materializar: o conjunto pedido (padrão: 'gold.feature_set'
+    de configs/etl.yml) mais a entrada do label (ret_1d), usada também nos KPIs.
+    """
+    if features is None:
+        features = load_etl_settings()["gold"]["feature_set"]
+    requested = resolve_feature_set(registry, features, "asset")
+    label_input = registry["label"].get("input", "ret_1d")
+    if label_input not in requested:
+        requested = [label_input] + requested
+    return requested
+
+
+def _requested_cross_sectional(registry: dict, features: str | list[str] | None) -> list[str]:
+    """
+    Features transversais a materializar (seção 'cross_sectional_features').
+    """
+    if features is None:
+        features = load_etl_settings()["gold"]["feature_set"]
+    specs = registry["cross_sectional"]
+    names = resolve_feature_set(registry, features, "cross_sectional")
+    unknown = [n for n in names if n not in specs]
+    if unknown:
+        raise ValueError(f"Features transversais desconhecidas no conjunto {features!r}: {unknown}")
+    return names
+
+
+def _cross_sectional_inputs(registry: dict, cs_requested: list[str]) -> list[str]:
+    """
+    Features de ativo usadas como entrada pelas transversais pedidas:
+    calculadas junto com as demais (e com o estado do modo incremental) e
+    descartadas do GOLD se não fizerem parte do conjunto.
+    """
+    inputs = []
+    for name in cs_requested:
+        for i in registry["cross_sectional"][name].inputs:
+            if i in registry["cross_sectional"]:
+                raise ValueError(f"Feature transversal '{name}' não pode usar outra transversal ('{i}') como entrada.")
+            if i in registry["asset"] and i not in inputs:
+                inputs.append(i)
+    return inputs
+
+
+def _feature_dtype(full_precision: bool | None):
+    """
+    dtype das features materializadas (None = storage.full_precision de
+    configs/etl.yml). Os kernels sempre calculam em float64.
+    """
+    if full_precision is None:
+        full_precision = load_etl_settings()["storage"]["full_precision"]
+    return feature_dtype(full_precision)
+
+
+def _state_dates(tickers: pd.Series, state: pd.DataFrame) -> pd.Series:
+    """
+    Data do estado salvo para cada linha (NaT para tickers sem estado).
+    """
+    by_ticker = pd.Series(state["date"].to_numpy(), index=state["ticker"].astype(str).to_numpy())
+    return pd.Series(by_ticker.reindex(tickers.astype(str).to_numpy()).to_numpy(), index=tickers.index)
 
 
-def add_asset_features(df: pd.DataFrame) -> pd.DataFrame:
+def add_asset_features(df: pd.DataFrame,
+                       features: str | list[str] | None = None,
+                       ema_state: pd.DataFrame | None = None,
+                       keep_emas: bool = False,
+                       registry: dict | None = None,
+                       full_precision: bool | None = None) -> pd.DataFrame:
     """
     Recebe asset_prices_daily com colunas:
       date, ticker, open, high, low, close, volume
     Retorna com features: retornos, volatilidade, EMAs, lags etc.
-    """
-    df = df.sort_values(["ticker", "date"]).copy()
-
-    # ==========================
-    # Retornos
-    # ==========================
-    df["ret_1d"] = df.groupby("ticker")["close"].pct_change()
-    df["ret_5d"] = df.groupby("ticker")["close"].pct_change(periods=5)
-
-    # ==========================
-    # Volatilidade móvel (21 dias) anualizada
-    # ==========================
-    rolling_vol = (
-        df.groupby("ticker")["ret_1d"]
-        .rolling(21)
-        .std()
-        .reset_index(level=0, drop=True)
-    )
-    df["vol_21d"] = rolling_vol * np.sqrt(252)
-
-    # ==========================
-    # Médias móveis exponenciais (EMAs)
-    # ==========================
-    # EMA de 9 períodos
-    df["ema_9"] = (
-        df.groupby("ticker")["close"]
-        .transform(lambda s: s.ewm(span=9, adjust=False).mean())
-    )
 
-    # EMA de 72 períodos
-    df["ema_72"] = (
-        df.groupby("ticker")["close"]
-        .transform(lambda s: s.ewm(span=72, adjust=False).mean())
-    )
-
-    # EMA de 200 períodos
-    df["ema_200"] = (
-        df.groupby("ticker")["close"]
-        .transform(lambda s: s.ewm(span=200, adjust=False).mean())
-    )
+    As features vêm do registro declarativo (configs/features.yml): features é
+    o nome de um conjunto ('default', 'production', 'research', ...) ou uma
+    lista de nomes. Só o que foi pedido é materializado; intermediárias são
+    calculadas uma única vez pelo DAG do registro.
 
-    # Ratios entre EMAs (úteis como features)
-    df["ema_9_72_ratio"] = df["ema_9"] / df["ema_72"]
-    df["ema_9_200_ratio"] = df["ema_9"] / df["ema_200"]
+    Ordena uma única vez, calcula as fronteiras de cada ticker uma única vez e
+    avalia todas as features com kernels vetorizados sobre os segmentos
+    contíguos (ver etl/transform/feature_engine.py).
 
-    # ==========================
-    # Lags de retornos (ex: 3 lags)
-    # ==========================
-    for lag in [1, 2, 3]:
-        df[f"ret_1d_lag{lag}"] = (
-            df.groupby("ticker")["ret_1d"].shift(lag)
-        )
+    ema_state (opcional; colunas ticker, date e uma coluna por EMA): EMAs já
+    conhecidas por ticker nas últimas datas (o tail do modo incremental); as
+    linhas seguintes continuam da última delas.
+    keep_emas=True materializa também EMAs intermediárias (estado incremental).
 
+    As features são gravadas em float32 (ver etl/utils/schema.py), exceto com
+    full_precision=True; com keep_emas=True as EMAs ficam em float64, pois
+    são o ponto de partida do modo incremental.
+    """
+    registry = registry or load_feature_registry()
+    specs = registry["asset"]
+    requested = _requested_asset_features(registry, features)
+
+    df, seg = sort_and_segment(df, "ticker")
+
+    ema_cols = []
+    if keep_emas:
+        ema_cols = [s.name for s in ema_features(specs, requested, list(df.columns))]
+        requested += [c for c in ema_cols if c not in requested]
+
+    ema_init = None
+    if ema_state is not None:
+        def ema_init(frame, segments, values, batch):
+            return _seeded_emas(frame, segments, values, ema_state,
+                                [s.name for s in batch], [int(s.params["span"]) for s in batch])
+
+    values = compute_features(df, seg, specs, requested, ema_init=ema_init)
+    dtype = _feature_dtype(full_precision)
+    for name, arr in values.items():
+        df[name] = arr if name in ema_cols else arr.astype(dtype, copy=False)
     return df
 
 
-def define_label(df: pd.DataFrame) -> pd.DataFrame:
+def define_label(df: pd.DataFrame,
+                 registry: dict | None = None,
+                 full_precision: bool | None = None) -> pd.DataFrame:
     """
     Define target_direction: prever se o retorno de amanhã é positivo ou não.
+    O retorno futuro e o horizonte vêm da seção 'label' de configs/features.yml.
     """
-    df = df.sort_values(["ticker", "date"]).copy()
+    registry = registry or load_feature_registry()
+    label = registry["label"]
+    name = label.get("name", "futuro_ret_1d")
+    source = label.get("input", "ret_1d")
+    target = label.get("target", "target_direction")
+    horizon = int(label.get("horizon", 1))
+
+    df, seg = sort_and_segment(df, "ticker")
 
-    df["futuro_ret_1d"] = df.groupby("ticker")["ret_1d"].shift(-1)
-    df["target_direction"] = (df["futuro_ret_1d"] > 0).astype(int)
+    df[name] = shift_segmented(df[source].to_numpy(dtype=np.float64), seg, -horizon).astype(
+        _feature_dtype(full_precision), copy=False)
+    df[target] = (df[name] > 0).astype(np.int8)
 
     # Remove linhas sem label
-    df = df.dropna(subset=["futuro_ret_1d"])
+    df = df.dropna(subset=[name])
     return df
 
 
-def add_ibov_features(df_assets: pd.DataFrame, df_ibov: pd.DataFrame) -> pd.DataFrame:
+def add_cross_sectional_features(df: pd.DataFrame,
+                                 features: str | list[str] | None = None,
+                                 registry: dict | None = None,
+                                 full_precision: bool | None = None,
+                                 calendar: pd.DataFrame | None = None,
+                                 sectors: dict | None = None) -> pd.DataFrame:
+    """
+    Features transversais (seção 'cross_sectional_features' do registro):
+    rank do retorno na data, z-score contra o universo, momentum relativo ao
+    setor etc. As entradas vão para o painel denso datas x tickers
+    (etl/transform/panel.py) e cada feature é calculada por data com poucas
+    passadas sobre o array, sem groupby por data; o resultado volta às
+    linhas de df pela posição de cada célula.
+
+    A seção transversal de cada data é a das linhas presentes em df.
+    sectors: {ticker: setor} (padrão: chave 'sector' dos ativos em
+    configs/assets.yml); tickers sem setor ficam NaN em sector_relative.
+    """
+    registry = registry or load_feature_registry()
+    requested = _requested_cross_sectional(registry, features)
+    if not requested:
+        return df
+    if sectors is None:
+        sectors = {a["ticker"]: a["sector"] for a in load_assets_config().get("assets", []) if a.get("sector")}
+
+    inputs = {i for name in requested for i in registry["cross_sectional"][name].inputs}
+    columns = [c for c in df.columns
+               if c in inputs or any(c in feature_base_columns(registry["asset"], i) for i in inputs)]
+    panel = panel_from_long(df, columns, calendar)
+    compute_panel_features(panel, registry, requested, ticker_groups(panel, sectors))
+
+    dtype = _feature_dtype(full_precision)
+    return df.assign(**{name: panel_to_rows(panel, name, len(df)).astype(dtype) for name in requested})
+
+
+def benchmark_prefixes(columns) -> list[str]:
+    """
+    Prefixos dos benchmarks presentes na matriz de SILVER (colunas <prefixo>_close).
+    """
+    return [c[: -len("_close")] for c in columns if c.endswith("_close")]
+
+
+def _benchmark_plan(columns: list[str],
+                    registry: dict,
+                    features: str | list[str]) -> tuple[dict, dict, list[str], dict]:
     """
-    Faz join por date, trazendo ibov_ret_1d e seus lags.
+    Plano das features de benchmark sobre a matriz larga de SILVER:
+    - specs: features de benchmark com os modelos '{bench}' expandidos
+    - by_owner: {prefixo: [features]} calculadas sobre as datas do benchmark
+      (None: features que combinam benchmarks, sobre todas as datas)
+    - out_cols: colunas levadas ao GOLD (preços, retornos e features)
+    - owner: {coluna de out_cols: prefixo ou None}
     """
-    df_ibov = df_ibov.sort_values("date").copy()
+    prefixes = benchmark_prefixes(columns)
+    specs = benchmark_specs(registry, prefixes)
+    requested = resolve_feature_set(registry, features, "benchmark", prefixes)
 
-    # Lags do ibov
-    for lag in [1, 2, 3]:
-        df_ibov[f"ibov_ret_lag{lag}"] = df_ibov["ibov_ret_1d"].shift(lag)
+    def owner_of(cols) -> str | None:
+        owners = {max((p for p in prefixes if c.startswith(p + "_")), key=len, default=None) for c in cols}
+        return owners.pop() if len(owners) == 1 else None
 
-    df_merged = df_assets.merge(df_ibov, on="date", how="left")
-    return df_merged
+    by_owner: dict = {}
+    owner = {c: owner_of([c]) for c in columns if c != "date"}
+    for name in requested:
+        if name not in owner:
+            owner[name] = owner_of(feature_base_columns(specs, name))
+            by_owner.setdefault(owner[name], []).append(name)
+    out_cols = list(owner)
+    return specs, by_owner, out_cols, owner
 
 
-def _max_drawdown_from_ret(returns: pd.Series) -> float:
+def _stale_fill(column: str, owner: str | None, rates: set[str]) -> float | None:
     """
-    Calcula max drawdown aproximado a partir de série de retornos diários.
+    Valor de uma coluna de benchmark em pregão sem cotação dele (casado com
+    a cotação anterior pela tolerância do join as-of): None para níveis
+    (<prefixo>_close, que seguem valendo), 0 para retornos e features de
+    benchmarks de taxa e NaN para os demais (o retorno do dia não existe).
     """
-    cum = (1 + returns.fillna(0)).cumprod()
-    running_max = cum.cummax()
-    drawdown = (cum - running_max) / running_max
-    return float(drawdown.min())  # valor negativo
+    if column_kind(column, np.float64) == "price":
+        return None
+    return 0.0 if owner in rates else np.nan
+
+
+def add_benchmark_features(df_assets: pd.DataFrame,
+                           df_bench: pd.DataFrame,
+                           features: str | list[str] | None = None,
+                           registry: dict | None = None,
+                           full_precision: bool | None = None,
+                           calendar: pd.DataFrame | None = None,
+                           tolerance: int | None = None,
+                           rates: set[str] | None = None) -> pd.DataFrame:
+    """
+    Traz os preços e retornos dos benchmarks (<prefixo>_close e
+    <prefixo>_ret_1d: ibov, ifix, cdi, ...) e suas features (seção
+    'benchmark_features' do registro de features) para cada linha de
+    df_assets.
+
+    df_bench é a matriz larga de SILVER (benchmarks_daily: date + colunas
+    prefixadas). As features de cada benchmark são calculadas sobre as datas
+    em que ele tem cotação.
+
+    O join é as-of sobre o calendário de pregão (etl/utils/calendar.py): cada
+    benchmark é reindexado às sessões uma vez, com a última linha a até
+    `tolerance` sessões (padrão: 'gold.benchmark_tolerance' de
+    configs/etl.yml), e todas as colunas vão para uma matriz sessão x coluna.
+    As linhas de df_assets viram chaves de sessão uma única vez e recebem a
+    matriz inteira em um gather 2-D, em vez de um merge por benchmark. Em
+    pregões sem cotação de um benchmark (feriados, suspensões, atraso da
+    fonte), só os níveis (<prefixo>_close) vêm da cotação anterior: retornos
+    e features dele ficam NaN, ou 0 nos benchmarks de taxa (rates; padrão:
+    kind 'rate' em configs/assets.yml), em vez de repetir o retorno do
+    último pregão.
+
+    calendar: trading_calendar de SILVER (unido às datas dos benchmarks); sem
+    ele, o calendário é a união das datas de df_assets e df_bench.
+    """
+    registry = registry or load_feature_registry()
+    settings = load_etl_settings()
+    if features is None:
+        features = settings["gold"]["feature_set"]
+    if tolerance is None:
+        tolerance = int(settings["gold"]["benchmark_tolerance"])
+    if rates is None:
+        rates = rate_prefixes()
+
+    df_bench = df_bench.sort_values("date", kind="stable").reset_index(drop=True)
+    specs, by_owner, out_cols, owner = _benchmark_plan(list(df_bench.columns), registry, features)
+
+    # Linhas com cotação de cada benchmark (None: todas as datas)
+    obs = {o: np.arange(len(df_bench)) if o is None else np.flatnonzero(df_bench[f"{o}_close"].notna())
+           for o in dict.fromkeys(owner.values())}
+
+    # Features de cada benchmark sobre as próprias datas
+    dtype = _feature_dtype(full_precision)
+    for o, names in by_owner.items():
+        rows = obs[o]
+        sub = df_bench.iloc[rows].reset_index(drop=True)
+        for name, arr in compute_features(sub, Segments(np.zeros(len(sub), dtype=np.int64)), specs, names).items():
+            col = np.full(len(df_bench), np.nan, dtype=dtype)
+            col[rows] = arr
+            df_bench[name] = col
+
+    # Benchmarks reindexados às sessões: linha da matriz de cada benchmark por sessão
+    days = calendar_days(calendar, df_bench) if calendar is not None else calendar_days(None, df_assets, df_bench)
+    owners = list(obs)
+    at_session = np.full((len(days), len(owners)), -1, dtype=np.int64)
+    for j, o in enumerate(owners):
+        idx = asof_index(days, df_bench["date"].to_numpy()[obs[o]], tolerance)
+        at_session[:, j] = np.where(idx >= 0, obs[o][np.maximum(idx, 0)], -1)
+    # Sessões casadas com uma cotação anterior (dentro da tolerância)
+    bench_sessions = session_keys(df_bench["date"], days)
+    stale = (at_session >= 0) & (bench_sessions[np.maximum(at_session, 0)] != np.arange(len(days))[:, None])
+
+    # Uma linha extra de NaN para sessões sem benchmark e datas fora do calendário
+    keys = session_keys(df_assets["date"], days)
+    keys = np.where(keys >= 0, keys, len(days))
+    for j, o in enumerate(owners):
+        missing = int(np.append(at_session[:, j] < 0, True)[keys].sum())
+        if missing:
+            label = "dos benchmarks" if o is None else f"de {o}"
+            print(f"[AVISO] {missing} linhas sem cotação {label} a até {tolerance} pregão(ões); "
+                  f"features {label} em NaN.")
+
+    # Matriz sessão x coluna (uma por dtype) e um gather 2-D por linha de df_assets
+    gathered = {}
+    for col_dtype in dict.fromkeys(df_bench[c].dtype for c in out_cols):
+        cols = [c for c in out_cols if df_bench[c].dtype == col_dtype]
+        matrix = np.full((len(days) + 1, len(cols)), np.nan, dtype=col_dtype)
+        for j, c in enumerate(cols):
+            k = owners.index(owner[c])
+            rows = at_session[:, k]
+            matrix[:-1, j] = np.where(rows >= 0, df_bench[c].to_numpy()[np.maximum(rows, 0)], np.nan)
+            fill = _stale_fill(c, owner[c], rates)
+            if fill is not None:
+                matrix[:-1, j][stale[:, k]] = fill
+        block = matrix[keys]
+        gathered.update({c: block[:, j] for j, c in enumerate(cols)})
+
+    df_merged = df_assets.reset_index(drop=True)
+    return df_merged.assign(**{c: gathered[c] for c in out_cols})
+
+
+def _float64_returns(rows: pd.DataFrame, frame: pd.DataFrame, registry: dict) -> pd.DataFrame:
+    """
+    rows (linhas gravadas no GOLD) com ret_1d recalculado em float64 a partir
+    de frame (preços de SILVER que as cobrem): os KPIs usam o retorno antes
+    da conversão para float32 do esquema compacto.
+    """
+    cols = ["ticker", "date"] + sorted(feature_base_columns(registry["asset"], "ret_1d"))
+    prices, seg = sort_and_segment(frame[cols], "ticker")
+    ret = compute_features(prices, seg, registry["asset"], ["ret_1d"])["ret_1d"]
+    by_key = pd.Series(ret, index=pd.MultiIndex.from_arrays([prices["ticker"].astype(str), prices["date"]]))
+    keys = pd.MultiIndex.from_arrays([rows["ticker"].astype(str), rows["date"]])
+    return rows.assign(ret_1d=by_key.reindex(keys).to_numpy())
 
 
 def compute_asset_kpis(df: pd.DataFrame) -> pd.DataFrame:
@@ -118,54 +442,529 @@ def compute_asset_kpis(df: pd.DataFrame) -> pd.DataFrame:
     - kurtosis_ret
     - hit_ratio
     - max_drawdown
-    """
-    grouped = df.groupby("ticker")
-
-    # usa funções explícitas para evitar erro com 'kurt'
-    base = grouped["ret_1d"].agg(
-        mean_ret_1d="mean",
-        vol_daily="std",
-        skew_ret=lambda x: x.skew(),
-        kurtosis_ret=lambda x: x.kurt(),   # ou x.kurtosis()
-    ).reset_index()
 
-    base["vol_annual"] = base["vol_daily"] * np.sqrt(252)
-    base["sharpe_like"] = base["mean_ret_1d"] / base["vol_daily"]
+    É a visão do período 'all' do motor de KPIs (etl/transform/kpi_engine.py).
+    """
+    return summary_from_periods(compute_kpis_by_period(df, ["all"]))
 
-    hits = grouped["ret_1d"].apply(lambda x: (x > 0).mean()).reset_index(name="hit_ratio")
-    mdd = grouped["ret_1d"].apply(_max_drawdown_from_ret).reset_index(name="max_drawdown")
 
-    kpis = base.merge(hits, on="ticker").merge(mdd, on="ticker")
-    return kpis
+def build_feature_state(df_feat: pd.DataFrame,
+                        df_prices: pd.DataFrame,
+                        ema_cols: list[str],
+                        tail_rows: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Monta o estado do modo incremental a partir das features (antes do label):
+    - state: última linha de cada ticker (ticker, date, close, EMAs)
+    - tail: últimas tail_rows linhas de SILVER de cada ticker, com as EMAs
+      de cada linha (histórico de lags e janelas sobre EMAs)
+    """
+    ordered = df_feat.sort_values(["ticker", "date"])
+    last = ordered.groupby("ticker", sort=False, observed=True).tail(1)
+    state = last[["ticker", "date", "close"] + ema_cols].reset_index(drop=True)
+
+    tail = (
+        ordered[list(df_prices.columns) + [c for c in ema_cols if c not in df_prices.columns]]
+        .groupby("ticker", sort=False, observed=True)
+        .tail(tail_rows)
+        .reset_index(drop=True)
+    )
+    return state, tail
 
 
-def run_build_gold_features_labels() -> None:
+def _tail_covers(tail: pd.DataFrame, state: pd.DataFrame, tail_rows: int) -> bool:
     """
-    SILVER -> GOLD:
-    - asset_features_daily.parquet (features + label target_direction)
-    - asset_kpis_summary.parquet
+    True se o tail salvo traz tail_rows linhas de cada ticker, ou todo o
+    histórico de SILVER dele até o estado (ativos com histórico curto).
     """
-    paths = get_paths()
-    silver_dir: Path = paths["silver"]
-    gold_dir: Path = paths["gold"]
+    counts = tail.groupby("ticker", observed=True).size()
+    short = counts.index[counts < tail_rows].astype(str).tolist()
+    if not short:
+        return True
+    silver = read_dataset(get_paths()["silver"] / "asset_prices_daily", tickers=short, columns=["ticker", "date"])
+    silver = silver[silver["date"] <= _state_dates(silver["ticker"], state)]
+    history = silver.groupby("ticker", observed=True).size()
+    return bool((history.reindex(short).fillna(0).to_numpy() <= counts.loc[short].to_numpy()).all())
+
+
+def _save_feature_state(state: pd.DataFrame, tail: pd.DataFrame, gold_dir: Path) -> None:
+    # EMAs do estado e do tail sempre em float64: o modo incremental continua delas
+    save_parquet(state, gold_dir / FEATURES_STATE_FILE, full_precision=True)
+    save_parquet(tail, gold_dir / FEATURES_TAIL_FILE, full_precision=True)
+
+
+def _build_gold_full(df_prices: pd.DataFrame,
+                     df_bench: pd.DataFrame,
+                     gold_dir: Path,
+                     features: str | list[str] | None,
+                     registry: dict,
+                     calendar: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Reconstrução completa do GOLD (e do estado do modo incremental).
+    Retorna ticker, date e ret_1d (float64) das linhas gravadas, para os KPIs.
+    """
+    requested = _requested_asset_features(registry, features)
+    cs_requested = _requested_cross_sectional(registry, features)
+    computed = requested + [c for c in _cross_sectional_inputs(registry, cs_requested) if c not in requested]
+    ema_cols = [s.name for s in ema_features(registry["asset"], computed, list(df_prices.columns))]
 
-    df_prices = pd.read_parquet(silver_dir / "asset_prices_daily.parquet")
-    df_ibov = pd.read_parquet(silver_dir / "benchmark_ibov.parquet")
+    # Features por ativo (com as EMAs intermediárias, para o estado incremental)
+    df_feat = add_asset_features(df_prices, computed, keep_emas=True, registry=registry)
+    state, tail = build_feature_state(df_feat, df_prices, ema_cols, state_tail_rows(registry, computed))
 
-    # Features por ativo
-    df_feat = add_asset_features(df_prices)
+    # Features transversais (painel datas x tickers)
+    df_feat = add_cross_sectional_features(df_feat, cs_requested, registry, calendar=calendar)
+    df_feat = df_feat.drop(columns=[c for c in dict.fromkeys(ema_cols + computed) if c not in requested])
 
     # Label de classificação
-    df_feat = define_label(df_feat)
+    df_feat = define_label(df_feat, registry)
 
-    # Features do IBOV
-    df_feat = add_ibov_features(df_feat, df_ibov)
+    # Features dos benchmarks (as-of sobre o calendário de pregão)
+    df_feat = add_benchmark_features(df_feat, df_bench, features, registry, calendar=calendar)
 
     # Persistência da tabela principal
-    save_parquet(df_feat, gold_dir / "asset_features_daily.parquet")
+    save_layer(df_feat, gold_dir / FEATURES_TABLE, load_etl_settings()["storage"])
+    _save_feature_state(state, tail, gold_dir)
+    return _float64_returns(df_feat[["ticker", "date"]], df_prices, registry)
+
+
+def _bench_select(column: str, alias: str, tolerance: int, fill: float | None) -> str:
+    """
+    Coluna de benchmark no SELECT do GOLD em SQL, com a regra de
+    add_benchmark_features: a cotação até `tolerance` sessões antes e, em
+    pregão sem cotação, `fill` (ver _stale_fill) no lugar de retornos.
+    """
+    from etl.transform.sql_engine import quote_ident as q
+
+    col = f"{alias}.{q(column)}"
+    if fill is None:
+        return f"CASE WHEN a._session - {alias}.session <= {tolerance} THEN {col} END AS {q(column)}"
+    stale = "NULL" if np.isnan(fill) else f"{float(fill)!r}::DOUBLE"
+    return (f"CASE WHEN a._session = {alias}.session THEN {col} "
+            f"WHEN a._session - {alias}.session <= {tolerance} THEN {stale} END AS {q(column)}")
+
+
+def _build_gold_full_sql(silver_dir: Path,
+                         gold_dir: Path,
+                         features: str | list[str] | None,
+                         registry: dict,
+                         settings: dict) -> pd.DataFrame:
+    """
+    Versão DuckDB de _build_gold_full: features (window functions e EMAs em
+    CTE recursiva, ver etl/transform/sql_engine.py), label e join dos
+    benchmarks são executados em SQL sobre o Parquet de SILVER e gravados direto no GOLD,
+    junto com o estado do modo incremental. O DuckDB paraleliza e faz spill
+    em disco; só ticker, date e ret_1d (float64, para os KPIs) e o estado
+    incremental (última linha e tail de cada ticker) voltam ao pandas.
+    """
+    from etl.transform.sql_engine import (
+        connect,
+        copy_to_layer,
+        cross_sectional_sql,
+        feature_ctes,
+        layer_source,
+        quote_ident as q,
+        relation_columns,
+        text_values,
+        with_ctes,
+    )
+
+    if features is None:
+        features = settings["gold"]["feature_set"]
+    label = registry["label"]
+    name = label.get("name", "futuro_ret_1d")
+    source = label.get("input", "ret_1d")
+    target = label.get("target", "target_direction")
+    horizon = int(label.get("horizon", 1))
+
+    con = connect(settings)
+    prices_src = layer_source(silver_dir / "asset_prices_daily")
+    bench_src = layer_source((silver_dir / BENCHMARKS_FILE).with_suffix(""))
+    price_cols = relation_columns(con, prices_src)
+    bench_cols = relation_columns(con, bench_src)
+
+    requested = _requested_asset_features(registry, features)
+    cs_requested = _requested_cross_sectional(registry, features)
+    computed = requested + [c for c in _cross_sectional_inputs(registry, cs_requested) if c not in requested]
+    ema_cols = [s.name for s in ema_features(registry["asset"], computed, price_cols)]
+    bench_specs, bench_by_owner, bench_out, bench_owner = _benchmark_plan(bench_cols, registry, features)
+
+    # Features por ativo (com as intermediárias, para o estado incremental)
+    ema_method = settings["transform"]["duckdb"]["ema_method"]
+    asset_ctes, asset_final = feature_ctes(registry["asset"], computed, price_cols, prices_src,
+                                           "ticker", "fa", con=con, ema_method=ema_method)
+    con.execute(f"CREATE TEMP TABLE gold_asset_features AS "
+                f"{with_ctes(asset_ctes, f'SELECT * FROM {asset_final}')}")
+
+    # Calendário de pregão de SILVER unido às datas dos benchmarks, com a
+    # chave inteira de cada sessão (mesmo alinhamento de add_benchmark_features)
+    calendar_root = silver_dir / "trading_calendar"
+    calendar_src = (layer_source(calendar_root) if calendar_root.with_suffix(".parquet").exists()
+                    else prices_src)
+    tolerance = int(settings["gold"]["benchmark_tolerance"])
+    rates = rate_prefixes()
+    align_ctes = [
+        ("cal_sessions", f"""
+            SELECT date, row_number() OVER (ORDER BY date) - 1 AS session
+            FROM (SELECT date FROM {calendar_src} UNION SELECT date FROM {bench_src})
+            WHERE date IS NOT NULL
+        """),
+    ]
+
+    # Features de cada benchmark sobre as datas em que ele tem cotação (um
+    # único segmento), com a chave de sessão; o DuckDB faz um join as-of por
+    # benchmark (o motor pandas faz um gather só)
+    bench_ctes, bench_joins = [], []
+    owners = list(dict.fromkeys(bench_owner.values()))
+    for i, o in enumerate(owners):
+        where = "" if o is None else f" WHERE {q(o + '_close')} IS NOT NULL"
+        ctes, final = feature_ctes(bench_specs, bench_by_owner.get(o, []), bench_cols + ["bench_seg"],
+                                   f"(SELECT *, 0 AS bench_seg FROM {bench_src}{where})", "bench_seg", f"fb{i}",
+                                   con=con, ema_method=ema_method)
+        bench_ctes += ctes + [(f"bench_keyed{i}",
+                               f"SELECT fb.*, s.session FROM {final} fb JOIN cal_sessions s USING (date)")]
+        bench_joins.append(f"ASOF LEFT JOIN bench_keyed{i} b{i} ON a._session >= b{i}.session")
+
+    # Features transversais: janelas por data sobre todas as linhas (antes do
+    # filtro do label), com o setor de configs/assets.yml
+    sectors = [(a["ticker"], a["sector"]) for a in load_assets_config().get("assets", []) if a.get("sector")]
+    align_ctes.append(("cs_sectors", f"SELECT * FROM {text_values(sectors, ['ticker', '_sector'])}"))
+    align_ctes.append(("cs_step0", f"""
+        SELECT g.*, c._sector,
+               lead({q(source)}, {horizon}) OVER (PARTITION BY g.ticker ORDER BY g.date) AS {q(name)}
+        FROM gold_asset_features g
+        LEFT JOIN cs_sectors c ON CAST(g.ticker AS VARCHAR) = c.ticker
+    """))
+    # Um SELECT por passo das features (ver cross_sectional_sql), sobre as
+    # entradas na precisão em que o motor pandas as materializa
+    float32 = not settings["storage"]["full_precision"]
+    cs_steps = [cross_sectional_sql(spec, float32_input=float32 and spec.inputs[0] in computed)
+                for spec in (registry["cross_sectional"][c] for c in cs_requested)]
+    for k in range(max(map(len, cs_steps), default=0)):
+        exprs = ", ".join(f"{expr} AS {q(col)}" for steps in cs_steps if k < len(steps) for col, expr in [steps[k]])
+        align_ctes.append((f"cs_step{k + 1}", f"SELECT *, {exprs} FROM cs_step{k}"))
+    cs_final = align_ctes[-1][0]
+
+    # Label + join as-of dos benchmarks, mesmas colunas e ordem do motor pandas
+    asset_out = price_cols + [c for c in requested if c not in price_cols]
+    select_list = ", ".join(
+        [f"a.{q(c)}" for c in asset_out + cs_requested]
+        + [f"a.{q(name)}", f"(a.{q(name)} > 0)::TINYINT AS {q(target)}"]
+        + [_bench_select(c, f"b{owners.index(bench_owner[c])}", tolerance, _stale_fill(c, bench_owner[c], rates))
+           for c in bench_out]
+    )
+    bench_join_sql = "\n        ".join(bench_joins)
+    gold_query = with_ctes(align_ctes + bench_ctes, f"""
+        SELECT {select_list}
+        FROM (
+            SELECT fa.*, s.session AS _session
+            FROM {cs_final} fa
+            ASOF LEFT JOIN cal_sessions s ON fa.date >= s.date
+        ) a
+        {bench_join_sql}
+        WHERE a.{q(name)} IS NOT NULL
+    """)
+    tickers = [row[0] for row in con.execute("SELECT DISTINCT ticker FROM gold_asset_features").fetchall()]
+    copy_to_layer(con, gold_query, gold_dir / FEATURES_TABLE, tickers, settings["storage"])
+    # Retornos em DOUBLE (antes dos casts do esquema compacto), para os KPIs
+    kpi_rows = restore_frame(con.execute(f"""
+        SELECT ticker, date, ret_1d FROM gold_asset_features
+        QUALIFY lead({q(source)}, {horizon}) OVER (PARTITION BY ticker ORDER BY date) IS NOT NULL
+        ORDER BY ticker, date
+    """).df())
+
+    # Estado do modo incremental (mesmo conteúdo de build_feature_state),
+    # gravado pelo pandas para sair no mesmo esquema do outro motor
+    state_cols = ", ".join(q(c) for c in ["ticker", "date", "close"] + ema_cols)
+    state = restore_frame(con.execute(f"""
+        SELECT {state_cols} FROM gold_asset_features
+        QUALIFY row_number() OVER (PARTITION BY ticker ORDER BY date DESC) = 1
+        ORDER BY ticker
+    """).df())
+    tail_cols = ", ".join(q(c) for c in price_cols + [c for c in ema_cols if c not in price_cols])
+    tail = restore_frame(con.execute(f"""
+        SELECT {tail_cols} FROM gold_asset_features
+        QUALIFY row_number() OVER (PARTITION BY ticker ORDER BY date DESC) <= {state_tail_rows(registry, computed)}
+        ORDER BY ticker, date
+    """).df())
+    _save_feature_state(state, tail, gold_dir)
+    con.close()
+    return kpi_rows
+
+
+def _partial_sections(df_prices: pd.DataFrame,
+                      df_new: pd.DataFrame,
+                      state: pd.DataFrame,
+                      touched) -> bool:
+    """
+    True se as datas que o modo incremental recalcula (linhas novas e última
+    linha já processada dos tickers tocados) têm em SILVER linhas que ele não
+    recalcula (tickers sem linhas novas, ou atrasados em relação aos demais):
+    a seção transversal dessas datas inclui essas linhas, cujos valores já
+    gravados também mudariam. Nesse caso o GOLD é reconstruído.
+    """
+    redone = pd.concat([df_new[["ticker", "date"]], state.loc[state["ticker"].isin(touched), ["ticker", "date"]]])
+    on_dates = df_prices.loc[df_prices["date"].isin(redone["date"].unique()), ["ticker", "date"]]
+    keys = pd.MultiIndex.from_arrays([redone["ticker"].astype(str), redone["date"]])
+    left_out = ~pd.MultiIndex.from_arrays([on_dates["ticker"].astype(str), on_dates["date"]]).isin(keys)
+    if not left_out.any():
+        return False
+    print(f"[AVISO] Features transversais: {int(left_out.sum())} linha(s) de SILVER nas datas atualizadas "
+          "ficariam fora da seção recalculada; reconstruindo GOLD completo.")
+    return True
+
+
+def _build_gold_append(df_prices: pd.DataFrame,
+                       df_bench: pd.DataFrame,
+                       gold_dir: Path,
+                       features: str | list[str] | None,
+                       registry: dict,
+                       calendar: pd.DataFrame | None = None) -> pd.DataFrame | None:
+    """
+    Atualização incremental do GOLD: processa apenas as linhas de SILVER
+    posteriores ao estado salvo (mais o histórico curto do tail) e re-finaliza a
+    última linha de cada ticker, que estava sem label até chegar o dia seguinte.
+
+    Com storage.layout = dataset, lê e regrava só as partições (bucket de
+    ticker x ano) que recebem linhas; no layout de arquivo único o arquivo
+    inteiro é regravado.
+
+    Retorna ticker, date e ret_1d (float64, para os KPIs) das linhas gravadas
+    no GOLD (vazio se não houver nada novo), ou None se não houver estado
+    (features e KPIs) compatível com o conjunto de features atual, ou se a
+    seção transversal das datas recalculadas ficaria parcial (ver
+    _partial_sections).
+    Assume que linhas antigas de SILVER não mudaram; após correções
+    retroativas, rode mode="full".
+    """
+    gold_root = gold_dir / FEATURES_TABLE
+    state_path = gold_dir / FEATURES_STATE_FILE
+    tail_path = gold_dir / FEATURES_TAIL_FILE
+    has_gold = dataset_exists(gold_root) or gold_root.with_suffix(".parquet").exists()
+    kpi_paths = [gold_dir / KPIS_PARTIALS_FILE, gold_dir / KPIS_RECENT_FILE]
+    if not (has_gold and state_path.exists() and tail_path.exists() and all(p.exists() for p in kpi_paths)):
+        return None
+
+    requested = _requested_asset_features(registry, features)
+    cs_requested = _requested_cross_sectional(registry, features)
+    computed = requested + [c for c in _cross_sectional_inputs(registry, cs_requested) if c not in requested]
+    ema_cols = [s.name for s in ema_features(registry["asset"], computed, list(df_prices.columns))]
+
+    state = read_parquet(state_path)
+    tail = read_parquet(tail_path)
+    if any(c not in state.columns or c not in tail.columns for c in ema_cols):
+        return None
+
+    last_date = _state_dates(df_prices["ticker"], state)
+    df_new = df_prices[last_date.isna() | (df_prices["date"] > last_date)]
+    if df_new.empty:
+        print("[GOLD] Nenhuma linha nova em SILVER; GOLD já está atualizado.")
+        return df_new
+
+    touched = df_new["ticker"].unique()
+    tail_rows = state_tail_rows(registry, computed)
+    if not _tail_covers(tail[tail["ticker"].isin(touched)], state, tail_rows):
+        print(f"[AVISO] Tail do estado incremental tem menos de {tail_rows} linhas por ticker "
+              "(janelas do registro aumentaram); reconstruindo GOLD completo.")
+        return None
+    if cs_requested and _partial_sections(df_prices, df_new, state, touched):
+        return None
+    tail_touched = tail[tail["ticker"].isin(touched)]
+    frame = pd.concat([tail_touched.reindex(columns=df_new.columns), df_new], ignore_index=True)
+
+    # Features continuando das EMAs e do histórico curto salvos (tail)
+    df_feat = add_asset_features(frame, computed, ema_state=tail_touched[["ticker", "date"] + ema_cols],
+                                 keep_emas=True, registry=registry)
+    new_state, new_tail = build_feature_state(df_feat, frame, ema_cols, tail_rows)
+    df_feat = add_cross_sectional_features(df_feat, cs_requested, registry, calendar=calendar)
+    df_feat = df_feat.drop(columns=[c for c in dict.fromkeys(ema_cols + computed) if c not in requested])
+
+    # Mantém a última linha já processada (agora com label) e as linhas novas
+    df_feat = define_label(df_feat, registry)
+    frontier = _state_dates(df_feat["ticker"], state)
+    df_feat = df_feat[frontier.isna() | (df_feat["date"] >= frontier)]
+    df_feat = add_benchmark_features(df_feat, df_bench, features, registry, calendar=calendar)
+
+    storage = load_etl_settings()["storage"]
+    if dataset_exists(gold_root) and storage.get("layout", "dataset") == "dataset":
+        # Reescreve só as partições (bucket de ticker x ano) tocadas
+        buckets = np.unique(ticker_bucket(touched, dataset_buckets(gold_root))).tolist()
+        first_year = pd.Timestamp(year=df_feat["date"].min().year, month=1, day=1)
+        df_part = read_dataset(gold_root, start=first_year, buckets=buckets)
+        df_part = pd.concat([df_part, df_feat], ignore_index=True)
+        df_part = df_part.drop_duplicates(subset=["ticker", "date"], keep="last")
+        save_dataset(df_part, gold_root, row_group_size=int(storage["row_group_size"]),
+                     replace_partitions=True, full_precision=storage.get("full_precision"))
+    else:
+        df_gold = pd.concat([read_dataset(gold_root), df_feat], ignore_index=True)
+        df_gold = df_gold.drop_duplicates(subset=["ticker", "date"], keep="last")
+        df_gold = df_gold.sort_values(["ticker", "date"]).reset_index(drop=True)
+        save_layer(df_gold, gold_root, storage)
+
+    # Atualiza estado e tail apenas dos tickers tocados
+    state = pd.concat([state[~state["ticker"].isin(touched)], new_state], ignore_index=True)
+    tail = pd.concat([tail[~tail["ticker"].isin(touched)].reindex(columns=new_tail.columns), new_tail],
+                     ignore_index=True)
+    _save_feature_state(state, tail, gold_dir)
+
+    print(f"[GOLD] Modo incremental: {len(df_new)} linhas novas de SILVER, "
+          f"{len(df_feat)} linhas gravadas em GOLD ({len(touched)} tickers).")
+    return _float64_returns(df_feat[["ticker", "date"]], frame, registry)
+
+
+def _save_kpis(partials: pd.DataFrame, recent: pd.DataFrame, gold_dir: Path) -> None:
+    """
+    Grava asset_kpis_periods / asset_kpis_summary a partir do estado dos KPIs
+    (agregados por ticker x mês e linhas das janelas trailing) e o próprio
+    estado, em float64, para a próxima atualização incremental.
+    """
+    periods = kpis_by_period_from_partials(partials, recent)
+    save_parquet(periods, gold_dir / "asset_kpis_periods.parquet")
+    save_parquet(summary_from_periods(periods), gold_dir / "asset_kpis_summary.parquet")
+    save_parquet(partials, gold_dir / KPIS_PARTIALS_FILE, full_precision=True)
+    save_parquet(recent, gold_dir / KPIS_RECENT_FILE, full_precision=True)
+
+
+def _kpi_state_full(df_feat: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Estado dos KPIs a partir do GOLD inteiro (ticker, date, ret_1d)
+    return kpi_partials(df_feat), trailing_rows(df_feat)
+
+
+def _update_kpi_state(df_rows: pd.DataFrame, gold_dir: Path) -> tuple[pd.DataFrame, pd.DataFrame] | None:
+    """
+    Atualiza o estado dos KPIs com as linhas recém-gravadas no GOLD (datas
+    posteriores às já existentes de cada ticker): só os meses que receberam
+    linhas são recalculados, a partir das linhas recentes guardadas (que
+    cobrem o mês da última data), e as janelas trailing avançam. Anos e o
+    histórico completo são recombinados dos meses em _save_kpis. None se não
+    houver estado salvo.
+    """
+    partials_path, recent_path = gold_dir / KPIS_PARTIALS_FILE, gold_dir / KPIS_RECENT_FILE
+    if not (partials_path.exists() and recent_path.exists()):
+        return None
+    partials = read_parquet(partials_path)
+    recent = read_parquet(recent_path)
+    partials["ticker"] = partials["ticker"].astype(str)
+    recent["ticker"] = recent["ticker"].astype(str)
+
+    rows = df_rows[["ticker", "date", "ret_1d"]].assign(ticker=df_rows["ticker"].astype(str))
+    touched = rows["ticker"].unique()
+    merged = pd.concat([recent[recent["ticker"].isin(touched)], rows], ignore_index=True)
+    merged = merged.drop_duplicates(subset=["ticker", "date"], keep="last")
+
+    ym = merged["date"].dt.year * 100 + merged["date"].dt.month
+    keys = set(zip(rows["ticker"], rows["date"].dt.year * 100 + rows["date"].dt.month))
+    in_touched = pd.Series(list(zip(merged["ticker"], ym)), index=merged.index).isin(keys)
+    new_parts = kpi_partials(merged[in_touched.to_numpy()])
+    new_parts["ticker"] = new_parts["ticker"].astype(str)
+
+    stale = pd.Series(list(zip(partials["ticker"], partials["month"])), index=partials.index).isin(keys)
+    partials = pd.concat([partials[~stale.to_numpy()], new_parts], ignore_index=True)
+    recent = pd.concat([recent[~recent["ticker"].isin(touched)], trailing_rows(merged)], ignore_index=True)
+    return partials, recent
+
+
+def _read_calendar(silver_dir: Path) -> pd.DataFrame | None:
+    """
+    trading_calendar de SILVER (None se ainda não existir).
+    """
+    path = silver_dir / "trading_calendar.parquet"
+    return read_parquet(path) if path.exists() else None
+
+
+def _append_read_start(gold_dir: Path):
+    """
+    Data mínima de SILVER necessária no modo incremental: a menor data do
+    estado salvo, se todos os ativos de configs/assets.yml já estão nele
+    (ativos novos precisam do histórico completo). None = ler tudo.
+    """
+    state_path = gold_dir / FEATURES_STATE_FILE
+    if not state_path.exists():
+        return None
+    state = read_parquet(state_path, columns=["ticker", "date"])
+    tickers = {a["ticker"] for a in load_assets_config().get("assets", [])}
+    if not tickers or not tickers <= set(state["ticker"]):
+        return None
+    return state["date"].min()
+
+
+def run_build_gold_features_labels(mode: str = "full",
+                                   features: str | list[str] | None = None,
+                                   engine: str | None = None) -> None:
+    """
+    SILVER -> GOLD:
+    - asset_features_daily (features + label target_direction; dataset
+      particionado ou arquivo único, conforme storage.layout de configs/etl.yml)
+    - asset_kpis_summary.parquet
+    - asset_kpis_periods.parquet (KPIs por ano, mês e janelas de 1 e 3 anos)
+
+    features: conjunto de configs/features.yml ('default', 'production',
+    'research', ...) ou lista de nomes; padrão: 'gold.feature_set' de
+    configs/etl.yml.
+
+    mode="full" recalcula tudo a partir do histórico completo.
+    mode="append" processa apenas as linhas novas de SILVER usando o estado
+    persistido (últimas EMAs e tail de preços e EMAs por ticker, em
+    asset_features_state.parquet / asset_features_tail.parquet), regrava só
+    as partições tocadas do GOLD e atualiza os KPIs pelos agregados mensais
+    (asset_kpis_partials.parquet / asset_kpis_recent.parquet); sem estado
+    compatível, cai para a reconstrução completa.
+
+    engine: motor da reconstrução completa, 'pandas' ou 'duckdb' (SQL sobre o
+    Parquet de SILVER, para universos que não cabem na memória); padrão:
+    'transform.engine' de configs/etl.yml. O modo append já processa só as
+    linhas novas e usa sempre o motor pandas; os dois motores gravam o mesmo
+    estado incremental.
+    """
+    if mode not in ("full", "append"):
+        raise ValueError(f"mode deve ser 'full' ou 'append', não {mode!r}.")
 
-    # KPIs agregados
-    df_kpis = compute_asset_kpis(df_feat)
-    save_parquet(df_kpis, gold_dir / "asset_kpis_summary.parquet")
+    settings = load_etl_settings()
+    engine = engine or settings["transform"]["engine"]
+    if engine not in ("pandas", "duckdb"):
+        raise ValueError(f"engine deve ser 'pandas' ou 'duckdb', não {engine!r}.")
 
-    print(f"[GOLD] asset_features_daily e asset_kpis_summary salvos em {gold_dir}")
+    paths = get_paths()
+    silver_dir: Path = paths["silver"]
+    gold_dir: Path = paths["gold"]
+    registry = load_feature_registry()
+    prices_root = silver_dir / "asset_prices_daily"
+
+    with stage_metrics("gold", mode=mode, engine=engine) as m:
+        df_feat = kpi_state = None
+        if mode == "append":
+            # Lê de SILVER só as partições a partir do estado salvo
+            df_prices = read_dataset(prices_root, start=_append_read_start(gold_dir))
+            df_bench = read_parquet(silver_dir / BENCHMARKS_FILE)
+            m.rows_in = len(df_prices)
+            df_feat = _build_gold_append(df_prices, df_bench, gold_dir, features, registry,
+                                         _read_calendar(silver_dir))
+            if df_feat is None:
+                print("[GOLD] Estado incremental ausente ou incompatível; reconstruindo GOLD completo.")
+            elif not df_feat.empty:
+                # KPIs só dos meses com linhas novas
+                kpi_state = _update_kpi_state(df_feat, gold_dir)
+        if df_feat is None:
+            if engine == "duckdb":
+                df_feat = _build_gold_full_sql(silver_dir, gold_dir, features, registry, settings)
+            else:
+                # Histórico completo: no fallback do append, df_prices acima
+                # tinha só as datas a partir do estado salvo
+                df_prices = read_dataset(prices_root)
+                df_bench = read_parquet(silver_dir / BENCHMARKS_FILE)
+                m.rows_in = len(df_prices)
+                df_feat = _build_gold_full(df_prices, df_bench, gold_dir, features, registry,
+                                           _read_calendar(silver_dir))
+            kpi_state = _kpi_state_full(df_feat)
+
+        # KPIs agregados (resumo = período 'all' do mesmo cálculo)
+        if kpi_state is not None:
+            _save_kpis(*kpi_state, gold_dir)
+
+        m.rows_out = len(df_feat)
+        m.read(prices_root, prices_root.with_suffix(".parquet"), silver_dir / BENCHMARKS_FILE)
+        m.wrote(gold_dir / FEATURES_TABLE, (gold_dir / FEATURES_TABLE).with_suffix(".parquet"),
+                gold_dir / FEATURES_STATE_FILE, gold_dir / FEATURES_TAIL_FILE,
+                gold_dir / "asset_kpis_periods.parquet", gold_dir / "asset_kpis_summary.parquet",
+                gold_dir / KPIS_PARTIALS_FILE, gold_dir / KPIS_RECENT_FILE)
+
+    print(f"[GOLD] asset_features_daily, asset_kpis_summary e asset_kpis_periods salvos em {gold_dir}")
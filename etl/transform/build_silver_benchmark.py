@@ -1,24 +1,68 @@
 # etl/transform/build_silver_benchmark.py
 
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 from etl.utils.config import get_paths
-from etl.utils.io import save_parquet
+from etl.utils.io import read_parquet, save_parquet
+from etl.utils.calendar import calendar_days, session_keys
+from etl.extract.extract_benchmark import benchmark_bronze_path, benchmark_entries, benchmark_prefix
+
+# Matriz larga de benchmarks em SILVER: uma linha por data, colunas
+# <prefixo>_close e <prefixo>_ret_1d de cada benchmark de configs/assets.yml
+BENCHMARKS_FILE = "benchmarks_daily.parquet"
+
+
+def _standardize_benchmark(df: pd.DataFrame, prefix: str) -> pd.DataFrame:
+    """
+    Um benchmark de BRONZE ordenado por data, sem datas repetidas (vale a
+    última linha), com <prefixo>_ret_1d recalculado sobre as próprias linhas.
+    """
+    df = df.dropna(subset=["date"]).sort_values("date", kind="stable")
+    df = df.drop_duplicates(subset=["date"], keep="last").reset_index(drop=True)
+    df[f"{prefix}_ret_1d"] = df[f"{prefix}_close"].pct_change()
+    return df
+
+
+def benchmark_matrix(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Une os benchmarks (date + colunas prefixadas, datas únicas) em uma matriz
+    larga indexada pela união das datas:
+
+        date, ibov_close, ibov_ret_1d, ifix_close, ifix_ret_1d, ...
+
+    Cada série é posicionada por chave inteira de dia (etl/utils/calendar.py),
+    um scatter por coluna em vez de N merges; datas sem cotação de um
+    benchmark ficam NaN nas colunas dele.
+    """
+    days = calendar_days(None, *frames)
+    out = {"date": days.astype("datetime64[D]").astype("datetime64[ns]")}
+    for df in frames:
+        pos = session_keys(df["date"], days)
+        for c in df.columns.drop("date"):
+            values = df[c].to_numpy(dtype=np.float64 if df[c].dtype.kind != "f" else df[c].dtype)
+            col = np.full(len(days), np.nan, dtype=values.dtype)
+            col[pos] = values
+            out[c] = col
+    return pd.DataFrame(out)
 
 
 def run_build_silver_benchmark() -> None:
     """
-    BRONZE -> SILVER para o benchmark IBOV, adicionando ibov_ret_1d.
+    BRONZE -> SILVER para os benchmarks de configs/assets.yml: recalcula
+    <prefixo>_ret_1d de cada um e grava a matriz larga benchmarks_daily
+    (ver benchmark_matrix), lida pelo GOLD em um único join por data.
     """
     paths = get_paths()
     bronze_dir: Path = paths["bronze"]
     silver_dir: Path = paths["silver"]
 
-    df = pd.read_parquet(bronze_dir / "benchmark_IBOV.parquet")
-    df = df.sort_values("date").copy()
-
-    df["ibov_ret_1d"] = df["ibov_close"].pct_change()
+    frames = [
+        _standardize_benchmark(read_parquet(benchmark_bronze_path(bronze_dir, entry)), benchmark_prefix(entry))
+        for entry in benchmark_entries()
+    ]
+    df = benchmark_matrix(frames)
 
-    save_parquet(df, silver_dir / "benchmark_ibov.parquet")
-    print(f"[SILVER] benchmark_ibov salvo em {silver_dir}")
+    save_parquet(df, silver_dir / BENCHMARKS_FILE)
+    print(f"[SILVER] benchmarks_daily salvo em {silver_dir} ({len(frames)} benchmark(s), {len(df)} datas)")
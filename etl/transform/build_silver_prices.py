@@ -3,52 +3,214 @@
 from pathlib import Path
 import pandas as pd
 
-from etl.utils.config import load_assets_config, get_paths
-from etl.utils.io import save_parquet
+from etl.utils.config import load_assets_config, load_etl_settings, get_paths
+from etl.utils.io import DATASET_MARKER, dataset_exists, read_dataset, read_parquet, save_layer, save_parquet
 from etl.utils.calendar import build_trading_calendar
-from etl.quality.checks import run_basic_price_checks
+from etl.quality.engine import run_price_quality
+from etl.utils.metrics import stage_metrics
+from etl.extract.extract_prices import BRONZE_PRICES_DATASET
 
 
-def load_all_bronze_prices(bronze_dir: Path, tickers: list[str]) -> pd.DataFrame:
+def load_all_bronze_prices(bronze_dir: Path,
+                           tickers: list[str],
+                           start=None,
+                           end=None) -> pd.DataFrame:
     """
-    Lê todos os arquivos de BRONZE para os tickers informados e concatena.
+    Lê BRONZE para os tickers informados (opcionalmente só entre start e end)
+    e concatena.
+
+    Se existir o dataset compactado (data/bronze/prices/), lê dele apenas as
+    partições dos tickers/anos pedidos; tickers cujo prices_<TICKER>.parquet é
+    mais novo que a compactação (ou que não estão nela) vêm do arquivo próprio.
     """
+    root = bronze_dir / BRONZE_PRICES_DATASET
+    from_files = list(tickers)
     dfs = []
-    for ticker in tickers:
+    if dataset_exists(root):
+        df_compact = read_dataset(root, tickers=_compacted_tickers(bronze_dir, tickers), start=start, end=end)
+        dfs.append(df_compact)
+        covered = set(df_compact["ticker"].unique())
+        from_files = [t for t in tickers if t not in covered]
+
+    filters = []
+    if start is not None:
+        filters.append(("date", ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append(("date", "<=", pd.Timestamp(end)))
+    for ticker in from_files:
         path = bronze_dir / f"prices_{ticker}.parquet"
-        df = pd.read_parquet(path)
+        df = read_parquet(path, filters=filters or None)
         dfs.append(df)
     df_all = pd.concat(dfs, ignore_index=True)
     return df_all
 
 
-def run_build_silver_prices() -> None:
+def _compacted_tickers(bronze_dir: Path, tickers: list[str]) -> list[str]:
+    """
+    Tickers a ler do dataset compactado de BRONZE: os que não têm
+    prices_<TICKER>.parquet mais novo que a compactação.
+    """
+    compacted_at = (bronze_dir / BRONZE_PRICES_DATASET / DATASET_MARKER).stat().st_mtime_ns
+    files = {t: bronze_dir / f"prices_{t}.parquet" for t in tickers}
+    return [t for t in tickers if not files[t].exists() or files[t].stat().st_mtime_ns <= compacted_at]
+
+
+def _build_silver_prices_sql(bronze_dir: Path, silver_dir: Path, tickers: list[str], settings: dict) -> int:
+    """
+    Versão DuckDB de run_build_silver_prices: checagens de qualidade sobre o
+    BRONZE, deduplicação com QUALIFY (mantém a primeira ocorrência de
+    (date, ticker) na ordem dos tickers e das linhas, como drop_duplicates) e
+    calendário em SQL, gravação direto em Parquet.
+
+    Lê o BRONZE como load_all_bronze_prices: do dataset compactado
+    (data/bronze/prices/), com os arquivos por ticker só para os tickers
+    mais novos que a compactação ou fora dela.
+    Retorna o número de linhas de SILVER.
+    """
+    from etl.quality.engine import run_price_quality_sql
+    from etl.transform.sql_engine import connect, copy_to_file, copy_to_layer, sql_list
+
+    con = connect(settings)
+    order = pd.DataFrame({"ticker": list(tickers), "file_idx": range(len(tickers))})
+    con.register("bronze_order", order)
+    sources = []
+    from_files = list(tickers)
+    root = bronze_dir / BRONZE_PRICES_DATASET
+    if dataset_exists(root):
+        compacted = _compacted_tickers(bronze_dir, tickers)
+        con.execute(f"""
+            CREATE TEMP VIEW bronze_compact AS
+            SELECT * FROM (
+                SELECT * EXCLUDE (ticker_bucket, year)
+                FROM read_parquet({sql_list([(root / "**" / "*.parquet").as_posix()])},
+                                  hive_partitioning = true, filename = true, file_row_number = true)
+            )
+            WHERE CAST(ticker AS VARCHAR) IN (SELECT UNNEST({sql_list(compacted)}::VARCHAR[]));
+        """)
+        covered = {row[0] for row in con.execute(
+            "SELECT DISTINCT CAST(ticker AS VARCHAR) FROM bronze_compact").fetchall()}
+        from_files = [t for t in tickers if t not in covered]
+        sources.append("SELECT * FROM bronze_compact")
+    if from_files:
+        paths = [(bronze_dir / f"prices_{t}.parquet").as_posix() for t in from_files]
+        sources.append(f"SELECT * FROM read_parquet({sql_list(paths)}, filename = true, "
+                       f"file_row_number = true, union_by_name = true)")
+    con.execute(f"""
+        CREATE TEMP VIEW bronze_prices AS
+        SELECT r.*, o.file_idx
+        FROM ({" UNION ALL BY NAME ".join(sources)}) r
+        JOIN bronze_order o ON o.ticker = CAST(r.ticker AS VARCHAR);
+    """)
+
+    # Qualidade sobre o BRONZE, antes da limpeza
+    run_price_quality_sql(con, "bronze_prices", settings=settings)
+
+    con.execute("""
+        CREATE TEMP TABLE silver_prices AS
+        SELECT * EXCLUDE (filename, file_row_number, file_idx)
+        FROM (
+            SELECT * FROM bronze_prices
+            QUALIFY row_number() OVER (PARTITION BY date, ticker
+                                       ORDER BY file_idx, filename, file_row_number) = 1
+        )
+        WHERE date IS NOT NULL AND close IS NOT NULL;
+    """)
+
+    # Persistência (calendário = datas distintas, com a chave inteira de sessão)
+    copy_to_layer(con, "SELECT * FROM silver_prices", silver_dir / "asset_prices_daily", tickers, settings["storage"])
+    copy_to_file(con, """
+        SELECT date, (row_number() OVER (ORDER BY date) - 1)::INTEGER AS session
+        FROM (SELECT DISTINCT date FROM silver_prices)
+        ORDER BY date
+    """, silver_dir / "trading_calendar.parquet")
+    n_rows = con.execute("SELECT count(*) FROM silver_prices").fetchone()[0]
+    con.close()
+    return n_rows
+
+
+def run_build_silver_prices(engine: str | None = None) -> None:
     """
     BRONZE -> SILVER para preços dos ativos (asset_prices_daily + trading_calendar).
+
+    engine: 'pandas' ou 'duckdb' (SQL sobre os Parquet de BRONZE, sem carregar
+    o universo na memória); padrão: 'transform.engine' de configs/etl.yml.
     """
     cfg = load_assets_config()
     paths = get_paths()
     bronze_dir: Path = paths["bronze"]
     silver_dir: Path = paths["silver"]
+    settings = load_etl_settings()
+    engine = engine or settings["transform"]["engine"]
 
     tickers = [a["ticker"] for a in cfg.get("assets", [])]
     if not tickers:
         raise ValueError("Nenhum ativo definido em configs/assets.yml (chave 'assets').")
 
-    df_all = load_all_bronze_prices(bronze_dir, tickers)
+    if engine not in ("pandas", "duckdb"):
+        raise ValueError(f"engine deve ser 'pandas' ou 'duckdb', não {engine!r}.")
+
+    with stage_metrics("silver_prices", engine=engine) as m:
+        m.read(bronze_dir / BRONZE_PRICES_DATASET, *[bronze_dir / f"prices_{t}.parquet" for t in tickers])
+        if engine == "duckdb":
+            m.rows_out = _build_silver_prices_sql(bronze_dir, silver_dir, tickers, settings)
+        else:
+            df_bronze = load_all_bronze_prices(bronze_dir, tickers)
+            df_all = clean_silver_prices(df_bronze, settings)
+            save_silver_prices(df_all, silver_dir, settings["storage"])
+            m.rows_in, m.rows_out = len(df_bronze), len(df_all)
+        prices_root = silver_dir / "asset_prices_daily"
+        m.wrote(prices_root, prices_root.with_suffix(".parquet"), silver_dir / "trading_calendar.parquet")
+
+    suffix = " (engine duckdb)" if engine == "duckdb" else ""
+    print(f"[SILVER] asset_prices_daily e trading_calendar salvos em {silver_dir}{suffix}")
+
+
+def clean_silver_prices(df: pd.DataFrame | list[pd.DataFrame],
+                        settings: dict | None = None) -> pd.DataFrame:
+    """
+    Limpeza de BRONZE -> SILVER: avalia as regras de qualidade sobre o BRONZE
+    (etl/quality/engine.py, com a seção 'quality' de settings; relatório por
+    ticker em data/_quality/) e remove duplicatas de (date, ticker) (mantém a
+    primeira) e registros sem date/close. Aceita o DataFrame completo ou a
+    lista de DataFrames por ticker.
+    """
+    if isinstance(df, list):
+        df = pd.concat(df, ignore_index=True)
+    run_price_quality(df, settings=settings)
+    df = df.drop_duplicates(subset=["date", "ticker"])
+    df = df.dropna(subset=["date", "close"])
+    return df
+
 
-    # Remover duplicatas e registros sem date/close
-    df_all = df_all.drop_duplicates(subset=["date", "ticker"])
-    df_all = df_all.dropna(subset=["date", "close"])
+def prepare_silver_ticker(ticker: str) -> pd.DataFrame:
+    """
+    Lê BRONZE/prices_<TICKER>.parquet para o SILVER (usado pelo flow do
+    Prefect, um task por ticker). A limpeza roda sobre o universo reunido
+    (clean_silver_prices), pois o calendário das checagens é o de todos os
+    tickers.
+    """
+    path = get_paths()["bronze"] / f"prices_{ticker}.parquet"
+    with stage_metrics("silver_ticker", profile=False, report=False, ticker=ticker) as m:
+        df = read_parquet(path)
+        m.rows_in = len(df)
+        m.read(path)
+    return df
 
-    # Checagens básicas
-    run_basic_price_checks(df_all)
+
+def save_silver_prices(df_all: pd.DataFrame | list[pd.DataFrame],
+                       silver_dir: Path | None = None,
+                       storage: dict | None = None) -> None:
+    """
+    Persiste asset_prices_daily (layout de storage) e o calendário de pregão.
+    Aceita o DataFrame completo ou a lista de DataFrames por ticker.
+    """
+    if isinstance(df_all, list):
+        df_all = pd.concat(df_all, ignore_index=True)
+    silver_dir = silver_dir or get_paths()["silver"]
+    storage = storage or load_etl_settings()["storage"]
 
     # Calendário de pregão
     calendar = build_trading_calendar(df_all)
 
-    # Persistência
-    save_parquet(df_all, silver_dir / "asset_prices_daily.parquet")
+    save_layer(df_all, silver_dir / "asset_prices_daily", storage)
     save_parquet(calendar, silver_dir / "trading_calendar.parquet")
-
-    print(f"[SILVER] asset_prices_daily e trading_calendar salvos em {silver_dir}")
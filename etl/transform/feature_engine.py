@@ -0,0 +1,247 @@
+# etl/transform/feature_engine.py
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+
+# ===============================================================
+# 1. Segmentos contíguos por ticker
+# ===============================================================
+
+class Segments:
+    """
+    Fronteiras de grupos contíguos (ex.: um ticker) em um array já ordenado.
+
+    - starts / lengths: início e tamanho de cada segmento
+    - pos: posição de cada linha dentro do seu segmento (0, 1, 2, ...)
+    - seg_start: início do segmento de cada linha
+    """
+
+    def __init__(self, keys: np.ndarray):
+        n = len(keys)
+        if n == 0:
+            self.starts = np.empty(0, dtype=np.int64)
+        else:
+            change = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+            self.starts = np.concatenate([[0], change]).astype(np.int64)
+        ends = np.append(self.starts[1:], n).astype(np.int64)
+        self.lengths = ends - self.starts
+        self.n = n
+        self.seg_start = np.repeat(self.starts, self.lengths)
+        self.pos = np.arange(n, dtype=np.int64) - self.seg_start
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, col: str = "ticker") -> "Segments":
+        """
+        Segmentos a partir de uma coluna de um DataFrame ordenado por essa coluna.
+        """
+        codes, _ = pd.factorize(df[col], sort=False)
+        return cls(codes)
+
+
+def sort_and_segment(df: pd.DataFrame, col: str = "ticker") -> tuple[pd.DataFrame, Segments]:
+    """
+    Ordena df por (col, date) - mesma ordem estável de
+    df.sort_values([col, "date"]) - e devolve também os segmentos de col.
+
+    Ordena uma única chave int64 (código do ticker + data) em vez de comparar
+    strings, e pula a reordenação se os dados já estiverem ordenados.
+    """
+    codes, _ = pd.factorize(df[col], sort=True)
+    days = df["date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    key = (codes.astype(np.int64) << 32) + (days - days.min() if len(days) else days)
+
+    if len(key) and not np.all(key[1:] >= key[:-1]):
+        order = np.argsort(key, kind="stable")
+        df = df.take(order)
+        codes = codes[order]
+    return df.reset_index(drop=True), Segments(codes)
+
+
+# ===============================================================
+# 2. Kernels vetorizados (NumPy) por segmento
+# ===============================================================
+
+def shift_segmented(values: np.ndarray, seg: Segments, periods: int = 1) -> np.ndarray:
+    """
+    Equivalente a groupby(...).shift(periods) sobre segmentos contíguos.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if periods == 0:
+        return values.copy()
+
+    out = np.full(seg.n, np.nan)
+    if abs(periods) >= seg.n:
+        return out
+    if periods > 0:
+        out[periods:] = values[:-periods]
+        out[seg.pos < periods] = np.nan
+    else:
+        out[:periods] = values[-periods:]
+        seg_len = np.repeat(seg.lengths, seg.lengths)
+        out[seg.pos >= seg_len + periods] = np.nan
+    return out
+
+
+def safe_divide(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    """
+    num / den com NaN onde den == 0 (em vez de ±inf), como x / nullif(y, 0)
+    no motor SQL.
+    """
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den == 0, np.nan, num / den)
+
+
+def pct_change_segmented(values: np.ndarray, seg: Segments, periods: int = 1) -> np.ndarray:
+    """
+    Equivalente a groupby(...).pct_change(periods) (sem preenchimento de NaN),
+    exceto pela base zero: NaN em vez de ±inf (ver safe_divide).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return safe_divide(values, shift_segmented(values, seg, periods)) - 1
+
+
+class _SegmentWindowIndexer(BaseIndexer):
+    """
+    Janelas móveis de tamanho fixo que não atravessam a fronteira do segmento.
+    Gera exatamente as mesmas janelas de groupby(...).rolling(window).
+    """
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        start = np.maximum(end - self.window_size, self.seg_start)
+        return start, end
+
+
+def _rolling_segmented(values: np.ndarray, seg: Segments, window: int):
+    indexer = _SegmentWindowIndexer(window_size=window, seg_start=seg.seg_start)
+    s = pd.Series(np.asarray(values, dtype=np.float64))
+    return s.rolling(indexer, min_periods=window)
+
+
+def rolling_std_segmented(values: np.ndarray, seg: Segments, window: int) -> np.ndarray:
+    """
+    Desvio-padrão móvel (ddof=1) por segmento, numa única chamada ao kernel
+    de janelas do pandas sobre o array contíguo (sem groupby nem reset_index).
+    """
+    return _rolling_segmented(values, seg, window).std().to_numpy()
+
+
+def rolling_mean_segmented(values: np.ndarray, seg: Segments, window: int) -> np.ndarray:
+    """
+    Média móvel por segmento (mesmas janelas de rolling_std_segmented).
+    """
+    return _rolling_segmented(values, seg, window).mean().to_numpy()
+
+
+def ema_segmented(values: np.ndarray,
+                  seg: Segments,
+                  spans: list[int],
+                  init: np.ndarray | None = None) -> np.ndarray:
+    """
+    EMAs (adjust=False) para vários spans de uma vez, com a mesma recorrência
+    de Series.ewm(span, adjust=False).mean() aplicada por segmento.
+
+    A recursão avança pela posição dentro do segmento: a cada passo, atualiza
+    simultaneamente todos os segmentos (e todos os spans) com operações NumPy,
+    em vez de um laço Python por ticker.
+
+    init (opcional, shape (n_segmentos, len(spans))): EMA já conhecida antes da
+    primeira linha de cada segmento (NaN = sem estado). Usado no modo incremental.
+
+    Retorna array (n_linhas, len(spans)).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    spans_arr = np.asarray(spans, dtype=np.float64)
+    alpha = 1.0 / (1.0 + (spans_arr - 1) / 2.0)
+    new_wt = alpha
+    old_wt_factor = 1.0 - alpha
+
+    n_seg = len(seg.starts)
+    out = np.full((seg.n, len(spans)), np.nan)
+    if n_seg == 0:
+        return out
+
+    if init is None and not np.isnan(values).any():
+        return _ema_dense(values, seg, new_wt, old_wt_factor)
+
+    starts = seg.starts
+    first = values[starts][:, None].repeat(len(spans), axis=1)
+    old_wt = np.ones((n_seg, len(spans)))
+
+    if init is None:
+        weighted = first
+    else:
+        # Estado anterior: a primeira linha já é uma atualização da EMA guardada
+        weighted = np.array(init, dtype=np.float64)
+        old_wt = np.where(weighted == weighted, old_wt * old_wt_factor, old_wt)
+        weighted, old_wt = _ema_update(weighted, old_wt, first, new_wt)
+    out[starts] = weighted
+
+    active = np.arange(n_seg)
+    for k in range(1, int(seg.lengths.max())):
+        keep = seg.lengths[active] > k
+        if not keep.all():
+            active = active[keep]
+            weighted = weighted[keep]
+            old_wt = old_wt[keep]
+        idx = starts[active] + k
+        cur = values[idx][:, None]
+        old_wt = np.where(weighted == weighted, old_wt * old_wt_factor, old_wt)
+        weighted, old_wt = _ema_update(weighted, old_wt, cur, new_wt)
+        out[idx] = weighted
+    return out
+
+
+def _ema_dense(values: np.ndarray, seg: Segments,
+               new_wt: np.ndarray, old_wt_factor: np.ndarray) -> np.ndarray:
+    """
+    Caminho rápido sem NaN: com adjust=False o peso antigo é sempre
+    old_wt_factor, então a recorrência vira uma única expressão por passo.
+    Os valores são rearranjados em uma matriz (posição x segmento).
+    """
+    n_seg = len(seg.starts)
+    seg_id = np.repeat(np.arange(n_seg), seg.lengths)
+    dense = np.full((int(seg.lengths.max()), n_seg), np.nan)
+    dense[seg.pos, seg_id] = values
+
+    n_spans = len(new_wt)
+    fac = old_wt_factor[:, None]
+    wt = new_wt[:, None]
+    denom = fac + wt
+
+    result = np.empty((dense.shape[0], n_spans, n_seg))
+    weighted = np.repeat(dense[0][None, :], n_spans, axis=0)
+    result[0] = weighted
+    blended = np.empty_like(weighted)
+    with np.errstate(invalid="ignore"):
+        for k in range(1, dense.shape[0]):
+            cur = dense[k]
+            np.multiply(fac, weighted, out=blended)
+            blended += wt * cur
+            blended /= denom
+            np.copyto(weighted, blended, where=weighted != cur)
+            result[k] = weighted
+    return result[seg.pos, :, seg_id]
+
+
+def _ema_update(weighted: np.ndarray, old_wt: np.ndarray, cur: np.ndarray, new_wt: np.ndarray):
+    """
+    Um passo da recorrência do pandas (ewm, adjust=False, ignore_na=False),
+    com old_wt já multiplicado pelo fator de decaimento.
+    """
+    cur = np.broadcast_to(cur, weighted.shape)
+    has_w = weighted == weighted
+    is_obs = cur == cur
+
+    upd = has_w & is_obs & (weighted != cur)
+    with np.errstate(invalid="ignore"):
+        blended = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+    weighted = np.where(upd, blended, weighted)
+    old_wt = np.where(has_w & is_obs, 1.0, old_wt)
+    weighted = np.where(~has_w & is_obs, cur, weighted)
+    return weighted, old_wt
+
@@ -0,0 +1,324 @@
+# etl/transform/feature_registry.py
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from etl.utils.config import CONFIG_DIR
+from etl.transform.feature_engine import (
+    Segments,
+    ema_segmented,
+    pct_change_segmented,
+    rolling_mean_segmented,
+    rolling_std_segmented,
+    safe_divide,
+    shift_segmented,
+)
+
+
+@dataclass
+class FeatureSpec:
+    """
+    Definição declarativa de uma feature (uma entrada de configs/features.yml).
+    """
+    name: str
+    type: str
+    inputs: List[str]
+    params: Dict = field(default_factory=dict)
+
+
+# ===============================================================
+# 1. Kernels por tipo de feature
+# ===============================================================
+# Cada kernel recebe (lista de arrays de entrada, segmentos, params) e
+# devolve o array da feature. EMAs são tratadas à parte (em lote).
+
+def _k_pct_change(inputs, seg, params):
+    return pct_change_segmented(inputs[0], seg, int(params.get("periods", 1)))
+
+
+def _k_lag(inputs, seg, params):
+    return shift_segmented(inputs[0], seg, int(params.get("periods", 1)))
+
+
+def _k_rolling_std(inputs, seg, params):
+    out = rolling_std_segmented(inputs[0], seg, int(params["window"]))
+    if params.get("annualize"):
+        out = out * np.sqrt(float(params["annualize"]))
+    return out
+
+
+def _k_rolling_mean(inputs, seg, params):
+    return rolling_mean_segmented(inputs[0], seg, int(params["window"]))
+
+
+def _k_ratio(inputs, seg, params):
+    return safe_divide(inputs[0], inputs[1])
+
+
+def _k_difference(inputs, seg, params):
+    return inputs[0] - inputs[1]
+
+
+KERNELS: Dict[str, Callable] = {
+    "pct_change": _k_pct_change,
+    "lag": _k_lag,
+    "rolling_std": _k_rolling_std,
+    "rolling_mean": _k_rolling_mean,
+    "ratio": _k_ratio,
+    "difference": _k_difference,
+    "ema": None,  # calculada em lote por ema_segmented
+}
+
+
+# ===============================================================
+# 2. Registro (configs/features.yml)
+# ===============================================================
+
+# Marcador de modelo nas features de benchmark ('{bench}_ret_lag1'),
+# trocado pelo prefixo de cada benchmark de configs/assets.yml
+BENCH_TEMPLATE = "{bench}"
+
+# Tipos das features transversais (por data, entre ativos), calculadas no
+# painel datas x tickers (ver etl/transform/panel.py)
+CROSS_SECTIONAL_TYPES = ("cs_rank", "cs_zscore", "sector_relative")
+
+
+def _parse_specs(section: Dict, types=KERNELS) -> Dict[str, FeatureSpec]:
+    specs = {}
+    for name, raw in (section or {}).items():
+        raw = dict(raw)
+        ftype = raw.pop("type")
+        if ftype not in types:
+            raise ValueError(f"Tipo de feature desconhecido em '{name}': {ftype}")
+        inputs = raw.pop("inputs", None) or [raw.pop("input")]
+        specs[name] = FeatureSpec(name=name, type=ftype, inputs=list(inputs), params=raw)
+    return specs
+
+
+def load_feature_registry(path: Path | None = None) -> Dict:
+    """
+    Lê configs/features.yml e retorna:
+      {"asset": {nome: FeatureSpec}, "benchmark": {nome: FeatureSpec},
+       "cross_sectional": {nome: FeatureSpec},
+       "label": {...}, "feature_sets": {nome_do_conjunto: [features]}}
+    """
+    path = path or CONFIG_DIR / "features.yml"
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f) or {}
+    return {
+        "asset": _parse_specs(cfg.get("asset_features")),
+        "benchmark": _parse_specs(cfg.get("benchmark_features")),
+        "cross_sectional": _parse_specs(cfg.get("cross_sectional_features"), CROSS_SECTIONAL_TYPES),
+        "label": cfg.get("label", {}),
+        "feature_sets": cfg.get("feature_sets", {}),
+    }
+
+
+def feature_scope(registry: Dict, name: str) -> str | None:
+    """
+    Seção do registro a que um nome pertence: 'asset', 'cross_sectional' ou
+    'benchmark' (entradas explícitas, modelos '{bench}' e nomes expandidos
+    deles, ex.: ibov_ret_lag1); None se nenhuma.
+    """
+    for scope in ("asset", "cross_sectional", "benchmark"):
+        if name in registry[scope]:
+            return scope
+    for template in registry["benchmark"]:
+        if BENCH_TEMPLATE not in template:
+            continue
+        head, tail = template.split(BENCH_TEMPLATE, 1)
+        if len(name) > len(head) + len(tail) and name.startswith(head) and name.endswith(tail):
+            return "benchmark"
+    return None
+
+
+def resolve_feature_set(registry: Dict,
+                        features: str | List[str],
+                        scope: str = "asset",
+                        prefixes: List[str] | None = None) -> List[str]:
+    """
+    Aceita o nome de um conjunto de configs/features.yml (ex.: 'production') ou
+    uma lista explícita de features. scope: 'asset', 'benchmark' ou
+    'cross_sectional'.
+
+    De uma lista explícita, só os nomes da seção scope (ver feature_scope);
+    nomes que não pertencem a nenhuma seção do registro são erro.
+
+    Com prefixes (escopo 'benchmark'), nomes com '{bench}' viram um por
+    benchmark (ver benchmark_specs).
+    """
+    if isinstance(features, str):
+        try:
+            names = list(registry["feature_sets"][features].get(scope, []))
+        except KeyError:
+            raise ValueError(f"Conjunto de features desconhecido: {features}")
+    else:
+        scopes = {name: feature_scope(registry, name) for name in features}
+        unknown = [name for name, s in scopes.items() if s is None]
+        if unknown:
+            raise ValueError(f"Features desconhecidas no registro (configs/features.yml): {unknown}")
+        names = [name for name, s in scopes.items() if s == scope]
+    if prefixes is None:
+        return names
+    expanded: List[str] = []
+    for name in names:
+        for item in ([name.replace(BENCH_TEMPLATE, p) for p in prefixes] if BENCH_TEMPLATE in name else [name]):
+            if item not in expanded:
+                expanded.append(item)
+    return expanded
+
+
+def benchmark_specs(registry: Dict, prefixes: List[str]) -> Dict[str, FeatureSpec]:
+    """
+    Features de benchmark do registro com os modelos expandidos: uma entrada
+    '{bench}_ret_lag1' (input '{bench}_ret_1d') vira ibov_ret_lag1,
+    ifix_ret_lag1, ... para cada prefixo. Entradas explícitas prevalecem.
+    """
+    specs: Dict[str, FeatureSpec] = {}
+    for name, spec in registry["benchmark"].items():
+        if BENCH_TEMPLATE not in name:
+            continue
+        for p in prefixes:
+            specs[name.replace(BENCH_TEMPLATE, p)] = FeatureSpec(
+                name=name.replace(BENCH_TEMPLATE, p), type=spec.type,
+                inputs=[i.replace(BENCH_TEMPLATE, p) for i in spec.inputs], params=spec.params,
+            )
+    specs.update({name: spec for name, spec in registry["benchmark"].items() if BENCH_TEMPLATE not in name})
+    return specs
+
+
+def feature_base_columns(specs: Dict[str, FeatureSpec], name: str) -> set:
+    """
+    Colunas de base (fora do registro) das quais a feature depende,
+    diretamente ou via intermediárias.
+    """
+    if name not in specs:
+        return {name}
+    return set().union(*(feature_base_columns(specs, i) for i in specs[name].inputs))
+
+
+def ema_features(specs: Dict[str, FeatureSpec], requested: List[str], base_columns: List[str]) -> List[FeatureSpec]:
+    """
+    EMAs (inclusive intermediárias) necessárias para calcular `requested`.
+    São as features recursivas cujo estado o modo incremental precisa guardar.
+    """
+    return [s for s in compile_feature_plan(specs, requested, base_columns) if s.type == "ema"]
+
+
+def feature_lookback(specs: Dict[str, FeatureSpec], requested: List[str]) -> int:
+    """
+    Linhas anteriores de cada ticker necessárias para calcular `requested` em
+    uma linha nova, somando ao longo do DAG os deslocamentos (periods) e
+    janelas (window - 1) de cada feature. EMAs não contam: continuam do
+    estado salvo. É o histórico que o modo incremental precisa guardar.
+    """
+    memo: Dict[str, int] = {}
+
+    def visit(name: str) -> int:
+        if name not in specs:
+            return 0
+        if name not in memo:
+            spec = specs[name]
+            if spec.type in ("pct_change", "lag"):
+                own = max(int(spec.params.get("periods", 1)), 0)
+            elif spec.type in ("rolling_std", "rolling_mean"):
+                own = int(spec.params["window"]) - 1
+            else:
+                own = 0
+            memo[name] = own + max((visit(i) for i in spec.inputs), default=0)
+        return memo[name]
+
+    return max((visit(name) for name in requested), default=0)
+
+
+# ===============================================================
+# 3. Compilação do DAG e execução
+# ===============================================================
+
+def compile_feature_plan(specs: Dict[str, FeatureSpec],
+                         requested: List[str],
+                         base_columns: List[str]) -> List[FeatureSpec]:
+    """
+    Ordena topologicamente apenas as features necessárias para `requested`
+    (incluindo intermediárias), cada uma exatamente uma vez.
+    base_columns são colunas já presentes no DataFrame (ex.: close).
+    """
+    base = set(base_columns)
+    plan: List[FeatureSpec] = []
+    state: Dict[str, str] = {}  # nome -> "visiting" | "done"
+
+    def visit(name: str, path: List[str]) -> None:
+        if name in base or state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Ciclo no registro de features: {' -> '.join(path + [name])}")
+        if name not in specs:
+            raise ValueError(f"Feature/coluna desconhecida: {name} (requerida por {path[-1] if path else 'conjunto'})")
+        state[name] = "visiting"
+        for dep in specs[name].inputs:
+            visit(dep, path + [name])
+        state[name] = "done"
+        plan.append(specs[name])
+
+    for name in requested:
+        visit(name, [])
+    return plan
+
+
+def _ema_batches(plan: List[FeatureSpec]) -> Dict[str, List[FeatureSpec]]:
+    """
+    Agrupa as EMAs do plano por coluna de entrada, para calculá-las em uma
+    única passada de ema_segmented (vários spans de uma vez).
+    """
+    batches: Dict[str, List[FeatureSpec]] = {}
+    for spec in plan:
+        if spec.type == "ema":
+            batches.setdefault(spec.inputs[0], []).append(spec)
+    return batches
+
+
+def compute_features(df: pd.DataFrame,
+                     seg: Segments,
+                     specs: Dict[str, FeatureSpec],
+                     requested: List[str],
+                     ema_init: Callable | None = None) -> Dict[str, np.ndarray]:
+    """
+    Executa o plano de features sobre df (ordenado e segmentado em seg) e
+    retorna {nome: array} apenas para as features em `requested`.
+    Intermediárias são calculadas uma vez e descartadas ao final.
+
+    ema_init (opcional): função (df, seg, valores, [FeatureSpec]) -> matriz de
+    EMAs, usada no modo incremental para continuar de um estado salvo.
+    """
+    plan = compile_feature_plan(specs, requested, list(df.columns))
+    ema_batches = _ema_batches(plan)
+
+    values: Dict[str, np.ndarray] = {}
+
+    def get(name: str) -> np.ndarray:
+        if name in values:
+            return values[name]
+        return df[name].to_numpy(dtype=np.float64)
+
+    for spec in plan:
+        if spec.name in values:
+            continue
+        if spec.type == "ema":
+            batch = ema_batches[spec.inputs[0]]
+            src = get(spec.inputs[0])
+            if ema_init is None:
+                emas = ema_segmented(src, seg, [int(s.params["span"]) for s in batch])
+            else:
+                emas = ema_init(df, seg, src, batch)
+            for i, s in enumerate(batch):
+                values[s.name] = emas[:, i]
+            continue
+        inputs = [get(name) for name in spec.inputs]
+        values[spec.name] = KERNELS[spec.type](inputs, seg, spec.params)
+
+    return {name: values[name] if name in values else get(name) for name in requested}
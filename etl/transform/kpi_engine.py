@@ -0,0 +1,341 @@
+# etl/transform/kpi_engine.py
+
+import numpy as np
+import pandas as pd
+
+from etl.transform.feature_engine import Segments, sort_and_segment
+
+KPI_COLUMNS = [
+    "mean_ret_1d",
+    "vol_daily",
+    "skew_ret",
+    "kurtosis_ret",
+    "vol_annual",
+    "sharpe_like",
+    "hit_ratio",
+    "max_drawdown",
+]
+
+# Períodos suportados: histórico completo, calendário e janelas móveis finais
+PERIOD_TYPES = ["all", "year", "month", "trailing_1y", "trailing_3y"]
+_TRAILING_YEARS = {"trailing_1y": 1, "trailing_3y": 3}
+
+
+def _zero_out_fperr(arr: np.ndarray) -> np.ndarray:
+    # Mesmo tratamento de ruído numérico do pandas (nanops) em skew/kurt
+    return np.where(np.abs(arr) < 1e-14, 0.0, arr)
+
+
+# Agregados parciais de um trecho de retornos, combináveis em sequência
+# (merge_partials): contagens, média e momentos centrais (m2, m3, m4) e o
+# crescimento acumulado com seu pico, vale e maior drawdown
+PARTIAL_COLUMNS = ["n_rows", "n_valid", "mean", "m2", "m3", "m4", "hits",
+                   "growth", "peak", "trough", "drawdown"]
+
+
+def segment_partials(ret: np.ndarray, seg: Segments) -> dict:
+    """
+    Agregados parciais (PARTIAL_COLUMNS) de cada segmento contíguo de `ret`,
+    com reduções segmentadas (np.add.reduceat etc.) em uma única passada
+    ordenada. NaN conta como linha (n_rows) mas não como observação.
+    """
+    ret = np.asarray(ret, dtype=np.float64)
+    starts = seg.starts
+    valid = ~np.isnan(ret)
+    x = np.where(valid, ret, 0.0)
+
+    count = np.add.reduceat(valid.astype(np.float64), starts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.add.reduceat(x, starts) / count
+        d = np.where(valid, ret - np.repeat(mean, seg.lengths), 0.0)
+        d2 = d * d
+        m2 = np.add.reduceat(d2, starts)
+        m3 = np.add.reduceat(d2 * d, starts)
+        m4 = np.add.reduceat(d2 * d2, starts)
+
+    # crescimento acumulado: cumprod/cummax segmentados (sem laço Python por grupo)
+    seg_id = np.repeat(np.arange(len(starts)), seg.lengths)
+    growth = pd.Series(1.0 + x)
+    cum = growth.groupby(seg_id).cumprod().to_numpy()
+    running_max = pd.Series(cum).groupby(seg_id).cummax().to_numpy()
+    drawdown = (cum - running_max) / running_max
+
+    return {
+        "n_rows": seg.lengths.astype(np.float64),
+        "n_valid": count,
+        "mean": mean,
+        "m2": m2,
+        "m3": m3,
+        "m4": m4,
+        "hits": np.add.reduceat((ret > 0).astype(np.float64), starts),
+        "growth": cum[starts + seg.lengths - 1],
+        "peak": np.maximum.reduceat(cum, starts),
+        "trough": np.minimum.reduceat(cum, starts),
+        "drawdown": np.minimum.reduceat(drawdown, starts),
+    }
+
+
+def merge_partials(a: dict, b: dict) -> dict:
+    """
+    Agregados do trecho a seguido do trecho b (elemento a elemento): momentos
+    centrais pelas fórmulas de combinação de Chan/Pébay e drawdown pelo pico
+    de a aplicado ao vale de b (crescimentos positivos).
+    """
+    na, nb = a["n_valid"], b["n_valid"]
+    n = na + nb
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = b["mean"] - a["mean"]
+        mean = a["mean"] + delta * nb / n
+        m2 = a["m2"] + b["m2"] + delta ** 2 * na * nb / n
+        m3 = (a["m3"] + b["m3"] + delta ** 3 * na * nb * (na - nb) / n ** 2
+              + 3 * delta * (na * b["m2"] - nb * a["m2"]) / n)
+        m4 = (a["m4"] + b["m4"] + delta ** 4 * na * nb * (na * na - na * nb + nb * nb) / n ** 3
+              + 6 * delta ** 2 * (na * na * b["m2"] + nb * nb * a["m2"]) / n ** 2
+              + 4 * delta * (na * b["m3"] - nb * a["m3"]) / n)
+        after_peak = np.minimum(a["growth"] * b["trough"] / a["peak"], 1.0 + b["drawdown"]) - 1.0
+
+    out = {"n_rows": a["n_rows"] + b["n_rows"], "n_valid": n, "hits": a["hits"] + b["hits"]}
+    for name, merged in (("mean", mean), ("m2", m2), ("m3", m3), ("m4", m4)):
+        out[name] = np.where(na == 0, b[name], np.where(nb == 0, a[name], merged))
+    out["growth"] = a["growth"] * b["growth"]
+    out["peak"] = np.maximum(a["peak"], a["growth"] * b["peak"])
+    out["trough"] = np.minimum(a["trough"], a["growth"] * b["trough"])
+    out["drawdown"] = np.minimum(a["drawdown"], after_peak)
+    return out
+
+
+def combine_segments(parts: dict, seg: Segments) -> dict:
+    """
+    Combina, em ordem, os agregados parciais de cada segmento de linhas
+    (ex.: os meses de um ano ou de um ticker) em um agregado por segmento.
+    Uma passada vetorizada por posição dentro do segmento.
+    """
+    acc = {c: np.asarray(v, dtype=np.float64)[seg.starts].copy() for c, v in parts.items()}
+    for k in range(1, int(seg.lengths.max()) if len(seg.starts) else 0):
+        live = seg.lengths > k
+        rows = seg.starts[live] + k
+        merged = merge_partials({c: v[live] for c, v in acc.items()},
+                                {c: np.asarray(v, dtype=np.float64)[rows] for c, v in parts.items()})
+        for c, v in merged.items():
+            acc[c][live] = v
+    return acc
+
+
+def kpis_from_partials(parts: dict) -> pd.DataFrame:
+    """
+    KPIs (KPI_COLUMNS) a partir dos agregados parciais: média, desvio,
+    skew/kurtosis (mesmas fórmulas de Series.skew/kurt), hit ratio e max drawdown.
+    """
+    count, mean = parts["n_valid"], parts["mean"]
+    m2, m3, m4 = parts["m2"], parts["m3"], parts["m4"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = np.sqrt(m2 / (count - 1))
+        std[count < 2] = np.nan
+
+        # skew (nanops.nanskew)
+        m2z, m3z = _zero_out_fperr(m2), _zero_out_fperr(m3)
+        skew = (count * (count - 1) ** 0.5 / (count - 2)) * (m3z / m2z ** 1.5)
+        skew = np.where(m2z == 0, 0.0, skew)
+        skew[count < 3] = np.nan
+
+        # kurtosis excessiva (nanops.nankurt)
+        adj = 3 * (count - 1) ** 2 / ((count - 2) * (count - 3))
+        num = _zero_out_fperr(count * (count + 1) * (count - 1) * m4)
+        den = _zero_out_fperr((count - 2) * (count - 3) * m2 ** 2)
+        kurt = np.where(den == 0, 0.0, num / den - adj)
+        kurt[count < 4] = np.nan
+
+    out = pd.DataFrame({
+        "mean_ret_1d": mean,
+        "vol_daily": std,
+        "skew_ret": skew,
+        "kurtosis_ret": kurt,
+    })
+    out["vol_annual"] = out["vol_daily"] * np.sqrt(252)
+    out["sharpe_like"] = out["mean_ret_1d"] / out["vol_daily"]
+    # hit ratio: fração de linhas com retorno > 0 (NaN conta como "não")
+    out["hit_ratio"] = parts["hits"] / parts["n_rows"]
+    out["max_drawdown"] = parts["drawdown"]
+    return out
+
+
+def segment_kpis(ret: np.ndarray, seg: Segments) -> pd.DataFrame:
+    """
+    KPIs de retorno diário para cada segmento contíguo de `ret`, em uma única
+    passada ordenada (segment_partials + kpis_from_partials).
+    """
+    if len(seg.starts) == 0:
+        return pd.DataFrame(columns=KPI_COLUMNS)
+    return kpis_from_partials(segment_partials(ret, seg))
+
+
+def _period_label(key: np.ndarray, period_type: str) -> np.ndarray:
+    """
+    Rótulo textual do período ('2024', '2024-03', 'all', '1y', '3y').
+    """
+    if period_type == "year":
+        return key.astype(str)
+    if period_type == "month":
+        year = (key // 100).astype(str)
+        month = np.char.zfill((key % 100).astype(str), 2)
+        return np.char.add(np.char.add(year, "-"), month).astype(object)
+    label = "all" if period_type == "all" else period_type.split("_")[1]
+    return np.full(len(key), label, dtype=object)
+
+
+def kpi_partials(df: pd.DataFrame, ret_col: str = "ret_1d") -> pd.DataFrame:
+    """
+    Agregados parciais por ticker e mês (estado dos KPIs):
+      ticker, month (AAAAMM), start_date, end_date, <PARTIAL_COLUMNS>
+
+    Os KPIs de ano e do histórico completo saem da combinação dos meses
+    (kpis_by_period_from_partials), então uma atualização incremental só
+    recalcula os meses com linhas novas.
+    """
+    df, seg = sort_and_segment(df[["ticker", "date", ret_col]], "ticker")
+    ticker_id = np.repeat(np.arange(len(seg.starts)), seg.lengths)
+    dates = df["date"].to_numpy()
+    ym = dates.astype("datetime64[M]").astype(np.int64)
+    month = (ym // 12 + 1970) * 100 + ym % 12 + 1
+
+    sub_seg = Segments(ticker_id.astype(np.int64) * 1_000_000 + month)
+    last = sub_seg.starts + sub_seg.lengths - 1
+    out = pd.DataFrame({
+        "ticker": df["ticker"].to_numpy()[sub_seg.starts],
+        "month": month[sub_seg.starts],
+        "start_date": dates[sub_seg.starts],
+        "end_date": dates[last],
+    })
+    if len(sub_seg.starts):
+        for name, values in segment_partials(df[ret_col].to_numpy(dtype=np.float64), sub_seg).items():
+            out[name] = values
+    else:
+        for name in PARTIAL_COLUMNS:
+            out[name] = np.empty(0)
+    return out
+
+
+def trailing_rows(df: pd.DataFrame, ret_col: str = "ret_1d") -> pd.DataFrame:
+    """
+    Linhas (ticker, date, ret_col) que as janelas trailing ainda podem usar:
+    as dos últimos max(_TRAILING_YEARS) anos até a última data de cada ticker.
+    Como o mês da última data fica dentro da janela, elas cobrem também todo
+    mês que uma atualização incremental possa tocar.
+    """
+    df, seg = sort_and_segment(df[["ticker", "date", ret_col]], "ticker")
+    ticker_id = np.repeat(np.arange(len(seg.starts)), seg.lengths)
+    dates = df["date"].to_numpy()
+    last = dates[seg.starts + seg.lengths - 1]
+    cutoff = (pd.DatetimeIndex(last) - pd.DateOffset(years=max(_TRAILING_YEARS.values()))).to_numpy()
+    return df[dates > cutoff[ticker_id]].reset_index(drop=True)
+
+
+def _period_frame(tickers: np.ndarray, period_type: str, key: np.ndarray,
+                  start: np.ndarray, end: np.ndarray, n_obs: np.ndarray, kpis: pd.DataFrame) -> pd.DataFrame:
+    meta = pd.DataFrame({
+        "ticker": tickers,
+        "period_type": period_type,
+        "period": _period_label(key, period_type),
+        "start_date": start,
+        "end_date": end,
+        "n_obs": n_obs.astype(np.int64),
+    })
+    return pd.concat([meta, kpis.reset_index(drop=True)], axis=1)
+
+
+def kpis_by_period_from_partials(partials: pd.DataFrame,
+                                 recent: pd.DataFrame,
+                                 period_types: list[str] | None = None,
+                                 ret_col: str = "ret_1d") -> pd.DataFrame:
+    """
+    KPIs por ticker e período (formato de compute_kpis_by_period) a partir do
+    estado: agregados mensais (kpi_partials) para mês, ano e histórico
+    completo, e as linhas recentes (trailing_rows) para as janelas trailing.
+    O custo não depende do tamanho do histórico em linhas.
+    """
+    period_types = period_types or PERIOD_TYPES
+    for period_type in period_types:
+        if period_type not in PERIOD_TYPES:
+            raise ValueError(f"Período desconhecido: {period_type} (use {PERIOD_TYPES})")
+
+    partials = partials.sort_values(["ticker", "month"], kind="stable").reset_index(drop=True)
+    codes, _ = pd.factorize(partials["ticker"], sort=True)
+    parts = {c: partials[c].to_numpy(dtype=np.float64) for c in PARTIAL_COLUMNS}
+    month = partials["month"].to_numpy(dtype=np.int64)
+    tickers = partials["ticker"].to_numpy()
+    start = partials["start_date"].to_numpy()
+    end = partials["end_date"].to_numpy()
+
+    frames = []
+    for period_type in period_types:
+        if period_type in _TRAILING_YEARS:
+            frames.append(_trailing_kpis(recent, period_type, ret_col))
+            continue
+        if len(partials) == 0:
+            continue
+        if period_type == "month":
+            seg, key, combined = Segments(np.arange(len(partials))), month, parts
+        else:
+            key = month // 100 if period_type == "year" else np.zeros(len(month), dtype=np.int64)
+            seg = Segments(codes.astype(np.int64) * 1_000_000 + key)
+            combined = combine_segments(parts, seg)
+            key = key[seg.starts]
+        last = seg.starts + seg.lengths - 1
+        frames.append(_period_frame(tickers[seg.starts], period_type, key, start[seg.starts], end[last],
+                                    combined["n_rows"], kpis_from_partials(combined)))
+
+    frames = [f for f in frames if f is not None]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _trailing_kpis(df: pd.DataFrame, period_type: str, ret_col: str) -> pd.DataFrame | None:
+    """
+    KPIs da janela trailing (últimos N anos até a última data de cada ticker)
+    direto das linhas.
+    """
+    df, seg = sort_and_segment(df[["ticker", "date", ret_col]], "ticker")
+    if len(df) == 0:
+        return None
+    ticker_id = np.repeat(np.arange(len(seg.starts)), seg.lengths)
+    dates = df["date"].to_numpy()
+    last = dates[seg.starts + seg.lengths - 1]
+    cutoff = (pd.DatetimeIndex(last) - pd.DateOffset(years=_TRAILING_YEARS[period_type])).to_numpy()
+    rows = np.flatnonzero(dates > cutoff[ticker_id])
+    if len(rows) == 0:
+        return None
+
+    sub_seg = Segments(ticker_id[rows])
+    first = rows[sub_seg.starts]
+    last_row = rows[sub_seg.starts + sub_seg.lengths - 1]
+    return _period_frame(df["ticker"].to_numpy()[first], period_type, np.zeros(len(first), dtype=np.int64),
+                         dates[first], dates[last_row], sub_seg.lengths,
+                         segment_kpis(df[ret_col].to_numpy(dtype=np.float64)[rows], sub_seg))
+
+
+def compute_kpis_by_period(df: pd.DataFrame,
+                           period_types: list[str] | None = None,
+                           ret_col: str = "ret_1d") -> pd.DataFrame:
+    """
+    KPIs por ticker e período em formato longo:
+      ticker, period_type, period, start_date, end_date, n_obs, <KPIs>
+
+    period_types (padrão: todos de PERIOD_TYPES):
+    - all: histórico completo
+    - year / month: anos e meses do calendário
+    - trailing_1y / trailing_3y: últimos 1 / 3 anos até a última data de cada ticker
+
+    Os dados são ordenados uma vez por (ticker, date) e reduzidos a agregados
+    por mês (kpi_partials), combinados em anos e no histórico completo; as
+    janelas trailing são segmentos das linhas recentes. É o mesmo cálculo da
+    atualização incremental do GOLD, que guarda esse estado.
+    """
+    return kpis_by_period_from_partials(kpi_partials(df, ret_col), trailing_rows(df, ret_col),
+                                        period_types, ret_col)
+
+
+def summary_from_periods(kpis_periods: pd.DataFrame) -> pd.DataFrame:
+    """
+    Visão resumida (um registro por ticker) a partir do período 'all'.
+    """
+    summary = kpis_periods[kpis_periods["period_type"] == "all"]
+    return summary[["ticker"] + KPI_COLUMNS].reset_index(drop=True)
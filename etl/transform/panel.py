@@ -0,0 +1,255 @@
+# etl/transform/panel.py
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from etl.utils.calendar import calendar_days, session_keys
+from etl.transform.feature_engine import Segments
+from etl.transform.feature_registry import FeatureSpec, compute_features
+
+
+# ===============================================================
+# 1. Painel denso datas x tickers
+# ===============================================================
+# Representação interna para features transversais (entre ativos na mesma
+# data): cada coluna vira um array 2-D contíguo (sessões x tickers) alinhado
+# ao calendário de pregão, com uma máscara de validade. Operações por data
+# são reduções no eixo 1 (poucas passadas sobre o array), sem groupby por data.
+
+@dataclass
+class Panel:
+    """
+    Painel denso alinhado ao calendário de pregão:
+    - dates: sessões (datetime64[ns], n_dates), em ordem
+    - tickers: tickers (n_tickers), em ordem
+    - mask: True onde o ticker tem linha na sessão (n_dates x n_tickers)
+    - rows: posição da linha no frame longo de origem (-1 sem linha)
+    - values: {coluna: array float64 n_dates x n_tickers; NaN fora da máscara}
+    """
+    dates: np.ndarray
+    tickers: np.ndarray
+    mask: np.ndarray
+    rows: np.ndarray
+    values: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.mask.shape
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.values[name]
+
+
+def panel_from_long(df: pd.DataFrame,
+                    columns: List[str] | None = None,
+                    calendar: pd.DataFrame | None = None) -> Panel:
+    """
+    Converte um frame longo (date, ticker, colunas; esquema de SILVER/GOLD,
+    em qualquer ordem) em Panel. columns: colunas numéricas levadas ao
+    painel (padrão: todas exceto date e ticker). calendar: trading_calendar
+    de SILVER (unido às datas do frame); sem ele, as sessões são as datas do
+    frame. Com (data, ticker) repetidos, vale a última linha.
+
+    Um scatter por coluna: datas viram chaves de sessão e tickers códigos
+    inteiros uma única vez.
+    """
+    if columns is None:
+        columns = [c for c in df.columns if c not in ("date", "ticker")]
+    days = calendar_days(calendar, df)
+    d = session_keys(df["date"], days)
+    t, tickers = pd.factorize(df["ticker"], sort=True)
+    ok = d >= 0
+    src = np.flatnonzero(ok)
+    d, t = d[ok], t[ok]
+
+    rows = np.full((len(days), len(tickers)), -1, dtype=np.int64)
+    rows[d, t] = src
+    values = {}
+    for c in columns:
+        arr = np.full(rows.shape, np.nan)
+        arr[d, t] = df[c].to_numpy(dtype=np.float64, na_value=np.nan)[src]
+        values[c] = arr
+    return Panel(
+        dates=days.astype("datetime64[D]").astype("datetime64[ns]"),
+        tickers=np.asarray(tickers.astype(str), dtype=object),
+        mask=rows >= 0,
+        rows=rows,
+        values=values,
+    )
+
+
+def panel_to_long(panel: Panel, columns: List[str] | None = None) -> pd.DataFrame:
+    """
+    Converte o painel de volta ao esquema longo (date, ticker, colunas), uma
+    linha por célula válida, ordenado por ticker e data (ordem do GOLD).
+    """
+    columns = list(panel.values) if columns is None else columns
+    t, d = np.nonzero(panel.mask.T)
+    out = {
+        "date": panel.dates[d],
+        "ticker": pd.Categorical.from_codes(t, categories=panel.tickers),
+    }
+    out.update({c: panel.values[c][d, t] for c in columns})
+    return pd.DataFrame(out)
+
+
+def panel_to_rows(panel: Panel, name: str, n_rows: int) -> np.ndarray:
+    """
+    Coluna do painel alinhada às linhas do frame longo de origem (o de
+    panel_from_long, com n_rows linhas); NaN nas linhas fora do painel.
+    """
+    out = np.full(n_rows, np.nan)
+    out[panel.rows[panel.mask]] = panel.values[name][panel.mask]
+    return out
+
+
+# ===============================================================
+# 2. Kernels transversais (por data, eixo 1)
+# ===============================================================
+# Cada kernel recebe (array n_dates x n_tickers, máscara de validade, grupos
+# por ticker) e devolve o array da feature; células inválidas (fora da
+# máscara ou NaN) não entram nas estatísticas da data e saem NaN.
+
+def cs_rank(x: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    Rank percentual de cada ticker na data (0 < rank <= 1; empates recebem a
+    média dos ranks, como rank(pct=True) do pandas). Uma ordenação por linha e
+    passadas acumuladas para os empates.
+    """
+    n_dates, n_tickers = x.shape
+    # Células inválidas ao final de cada linha (chave própria, e não um valor
+    # sentinela que empataria com um x válido, como inf)
+    order = np.lexsort((x, ~valid), axis=1)
+    sorted_x = np.take_along_axis(x, order, axis=1)
+    sorted_valid = np.take_along_axis(valid, order, axis=1)
+
+    # Início e fim de cada grupo de empate ao longo da linha ordenada
+    j = np.broadcast_to(np.arange(n_tickers), x.shape)
+    starts = np.ones(x.shape, dtype=bool)
+    starts[:, 1:] = (sorted_x[:, 1:] != sorted_x[:, :-1]) | (sorted_valid[:, 1:] != sorted_valid[:, :-1])
+    ends = np.ones(x.shape, dtype=bool)
+    ends[:, :-1] = starts[:, 1:]
+    first = np.maximum.accumulate(np.where(starts, j, 0), axis=1)
+    last = np.minimum.accumulate(np.where(ends, j, n_tickers - 1)[:, ::-1], axis=1)[:, ::-1]
+
+    n = valid.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ranked = ((first + last) / 2.0 + 1.0) / n
+    out = np.empty(x.shape)
+    np.put_along_axis(out, order, ranked, axis=1)
+    return np.where(valid, out, np.nan)
+
+
+def cs_zscore(x: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    (x - média da data) / desvio padrão da data (ddof=1); NaN com menos de
+    dois tickers válidos ou desvio nulo.
+    """
+    n = valid.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(valid, x, 0.0).sum(axis=1, keepdims=True) / n
+        dev = np.where(valid, x - mean, 0.0)
+        std = np.sqrt((dev * dev).sum(axis=1, keepdims=True) / (n - 1))
+        std[(n < 2) | (std == 0)] = np.nan
+        return np.where(valid, dev / std, np.nan)
+
+
+def cs_group_demean(x: np.ndarray, valid: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """
+    x menos a média do grupo do ticker (ex.: setor) na data. groups: código
+    inteiro do grupo de cada ticker (-1 sem grupo: NaN). As somas por grupo
+    saem de um produto pela matriz indicadora tickers x grupos.
+    """
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    member = np.zeros((len(groups), n_groups))
+    has_group = groups >= 0
+    member[np.flatnonzero(has_group), groups[has_group]] = 1.0
+
+    sums = np.where(valid, x, 0.0) @ member
+    counts = valid.astype(np.float64) @ member
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = sums / counts
+    out = np.full(x.shape, np.nan)
+    out[:, has_group] = x[:, has_group] - means[:, groups[has_group]]
+    return np.where(valid, out, np.nan)
+
+
+def _k_cs_rank(x, valid, groups, params):
+    return cs_rank(x, valid)
+
+
+def _k_cs_zscore(x, valid, groups, params):
+    return cs_zscore(x, valid)
+
+
+def _k_sector_relative(x, valid, groups, params):
+    return cs_group_demean(x, valid, groups)
+
+
+# Tipos da seção 'cross_sectional_features' de configs/features.yml
+CS_KERNELS: Dict[str, Callable] = {
+    "cs_rank": _k_cs_rank,
+    "cs_zscore": _k_cs_zscore,
+    "sector_relative": _k_sector_relative,
+}
+
+
+# ===============================================================
+# 3. Features sobre o painel
+# ===============================================================
+
+def panel_time_series(panel: Panel, specs: Dict[str, FeatureSpec], requested: List[str]) -> None:
+    """
+    Features de série temporal do registro (retornos, janelas, EMAs, ...)
+    calculadas no painel, em place: as células válidas são lidas na ordem
+    ticker x data (segmentos contíguos por ticker) e os kernels segmentados
+    de etl/transform/feature_engine.py rodam uma vez sobre todos os tickers,
+    com os mesmos resultados do GOLD longo (sessões sem linha do ticker não
+    contam como períodos).
+    """
+    t, d = np.nonzero(panel.mask.T)
+    frame = pd.DataFrame({c: v[d, t] for c, v in panel.values.items()})
+    for name, arr in compute_features(frame, Segments(t), specs, requested).items():
+        out = np.full(panel.shape, np.nan)
+        out[d, t] = arr
+        panel.values[name] = out
+
+
+def ticker_groups(panel: Panel, labels: Dict[str, str]) -> np.ndarray:
+    """
+    Código inteiro do grupo (ex.: setor de configs/assets.yml) de cada ticker
+    do painel; -1 para tickers sem grupo.
+    """
+    names = pd.Series([labels.get(str(t)) for t in panel.tickers], dtype=object)
+    codes, _ = pd.factorize(names, sort=True)
+    return codes.astype(np.int64)
+
+
+def compute_panel_features(panel: Panel,
+                           registry: Dict,
+                           requested: List[str],
+                           groups: np.ndarray | None = None) -> None:
+    """
+    Calcula no painel, em place, as features transversais pedidas (seção
+    'cross_sectional_features' do registro). Entradas ausentes do painel que
+    sejam features de ativo são calculadas antes por panel_time_series.
+    groups: código do setor de cada ticker (ticker_groups), usado por
+    sector_relative.
+    """
+    specs = registry["cross_sectional"]
+    if groups is None:
+        groups = np.full(len(panel.tickers), -1, dtype=np.int64)
+
+    inputs = list(dict.fromkeys(i for name in requested for i in specs[name].inputs))
+    missing = [i for i in inputs if i not in panel.values]
+    if missing:
+        panel_time_series(panel, registry["asset"], missing)
+
+    for name in requested:
+        spec = specs[name]
+        x = panel.values[spec.inputs[0]]
+        valid = panel.mask & ~np.isnan(x)
+        panel.values[name] = CS_KERNELS[spec.type](x, valid, groups, spec.params)
@@ -0,0 +1,389 @@
+# etl/transform/sql_engine.py
+
+import shutil
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from etl.utils.config import load_etl_settings
+from etl.utils.io import dataset_exists, ensure_dir, publish_dataset, staging_dir, ticker_bucket
+from etl.utils.schema import column_kind
+from etl.transform.feature_engine import Segments, ema_segmented
+from etl.transform.feature_registry import FeatureSpec, compile_feature_plan
+
+# Métodos de cálculo das EMAs no motor SQL (transform.duckdb.ema_method)
+EMA_METHODS = ("numpy", "recursive")
+
+
+# ===============================================================
+# 1. Conexão e leitura/escrita das camadas
+# ===============================================================
+
+def _literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def sql_list(values: list[str]) -> str:
+    """
+    Lista SQL de literais de texto (ex.: caminhos para read_parquet).
+    """
+    return "[" + ", ".join(_literal(v) for v in values) + "]"
+
+
+def text_values(rows: list[tuple], columns: list[str]) -> str:
+    """
+    Relação SQL com linhas de texto (VALUES), com as colunas dadas; sem
+    linhas, uma relação vazia com as mesmas colunas (VARCHAR).
+    """
+    if not rows:
+        cols = ", ".join(f"NULL::VARCHAR AS {quote_ident(c)}" for c in columns)
+        return f"(SELECT {cols} WHERE false)"
+    values = ", ".join("(" + ", ".join(_literal(v) for v in row) + ")" for row in rows)
+    return f"(SELECT * FROM (VALUES {values}) t({', '.join(quote_ident(c) for c in columns)}))"
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def connect(settings: dict | None = None) -> duckdb.DuckDBPyConnection:
+    """
+    Conexão DuckDB em memória para os estágios SILVER/GOLD, configurada pela
+    seção 'transform.duckdb' de configs/etl.yml: threads (0 = todos os
+    núcleos), memory_limit e temp_directory (onde o DuckDB faz spill em disco
+    quando os dados não cabem no limite de memória).
+    """
+    cfg = (settings or load_etl_settings())["transform"]["duckdb"]
+    con = duckdb.connect(":memory:")
+    if cfg.get("threads"):
+        con.execute(f"SET threads = {int(cfg['threads'])};")
+    if cfg.get("memory_limit"):
+        con.execute(f"SET memory_limit = {_literal(cfg['memory_limit'])};")
+    if cfg.get("temp_directory"):
+        con.execute(f"SET temp_directory = {_literal(cfg['temp_directory'])};")
+    return con
+
+
+def layer_source(root: Path) -> str:
+    """
+    Relação SQL de uma tabela de camada: o dataset particionado <root>/
+    (sem as colunas de partição) ou o arquivo único <root>.parquet.
+    """
+    if dataset_exists(root):
+        glob = (root / "**" / "*.parquet").as_posix()
+        return (f"(SELECT * EXCLUDE (ticker_bucket, year) "
+                f"FROM read_parquet({_literal(glob)}, hive_partitioning = true))")
+    return f"read_parquet({_literal(root.with_suffix('.parquet').as_posix())})"
+
+
+def relation_columns(con, relation: str) -> list[str]:
+    return [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()]
+
+
+# Tipos DuckDB -> dtype equivalente, para classificar colunas com column_kind
+_SQL_FLOATS = {"DOUBLE": np.float64, "FLOAT": np.float32}
+
+
+def compact_query(con, query: str, full_precision: bool = False) -> str:
+    """
+    Envolve query com os casts do esquema compacto de etl/utils/schema.py
+    (mesmo resultado de io.save_parquet no motor pandas): features DOUBLE ->
+    FLOAT (exceto com full_precision) e datas TIMESTAMP -> DATE.
+    """
+    casts = []
+    for name, sql_type, *_ in con.execute(f"DESCRIBE {query}").fetchall():
+        kind = column_kind(name, _SQL_FLOATS.get(sql_type, object))
+        if kind == "feature" and sql_type == "DOUBLE" and not full_precision:
+            casts.append(f"{quote_ident(name)}::FLOAT AS {quote_ident(name)}")
+        elif kind == "date" and sql_type.startswith("TIMESTAMP"):
+            casts.append(f"{quote_ident(name)}::DATE AS {quote_ident(name)}")
+        else:
+            casts.append(quote_ident(name))
+    return f"SELECT {', '.join(casts)} FROM ({query})"
+
+
+def copy_to_file(con, query: str, path: Path, full_precision: bool = False) -> None:
+    """
+    Grava o resultado de query, no esquema compacto, em um único arquivo Parquet.
+    """
+    ensure_dir(path.parent)
+    query = compact_query(con, query, full_precision)
+    con.execute(f"COPY ({query}) TO {_literal(path.as_posix())} (FORMAT parquet, COMPRESSION zstd);")
+
+
+def copy_to_layer(con, query: str, root: Path, tickers: list[str], storage: dict) -> None:
+    """
+    Grava o resultado de query, ordenado por (ticker, date), no layout de
+    'storage' (configs/etl.yml): dataset particionado por ticker_bucket/year,
+    com os mesmos buckets de etl/utils/io.save_dataset, ou arquivo único
+    <root>.parquet. O DuckDB escreve direto do plano, sem passar pelo pandas.
+    """
+    query = compact_query(con, query, bool(storage.get("full_precision")))
+    row_group_size = int(storage["row_group_size"])
+    file_path = root.with_suffix(".parquet")
+
+    if storage.get("layout", "dataset") != "dataset":
+        ensure_dir(root.parent)
+        con.execute(f"""
+            COPY (SELECT * FROM ({query}) ORDER BY ticker, date)
+            TO {_literal(file_path.as_posix())}
+            (FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE {row_group_size});
+        """)
+        if root.is_dir():
+            shutil.rmtree(root)
+        return
+
+    n_buckets = int(storage["n_buckets"])
+    buckets = pd.DataFrame({"ticker": list(tickers), "ticker_bucket": ticker_bucket(tickers, n_buckets)})
+    staging = staging_dir(root)
+    ensure_dir(root.parent)
+    con.register("ticker_buckets", buckets)
+    try:
+        con.execute(f"""
+            COPY (
+                SELECT q.*, b.ticker_bucket, year(q.date)::INTEGER AS year
+                FROM ({query}) q
+                JOIN ticker_buckets b ON b.ticker = q.ticker
+                ORDER BY q.ticker, q.date
+            ) TO {_literal(staging.as_posix())}
+            (FORMAT parquet, PARTITION_BY (ticker_bucket, year),
+             COMPRESSION zstd, ROW_GROUP_SIZE {row_group_size});
+        """)
+    finally:
+        con.unregister("ticker_buckets")
+    publish_dataset(staging, root, n_buckets)
+    if file_path.exists():
+        file_path.unlink()
+
+
+# ===============================================================
+# 2. Registro de features -> SQL (window functions e CTE recursiva)
+# ===============================================================
+
+def _clean(expr: str) -> str:
+    # NaN -> NULL (o pandas trata NaN como ausente em rolling/ewm)
+    return f"CASE WHEN isnan({expr}) THEN NULL ELSE {expr} END"
+
+
+def _shift(expr: str, periods: int, w: str) -> str:
+    if periods == 0:
+        return expr
+    if periods > 0:
+        return f"lag({expr}, {periods}) OVER {w}"
+    return f"lead({expr}, {-periods}) OVER {w}"
+
+
+def _rolling(func: str, expr: str, window: int, w: str) -> str:
+    frame = f"({w} ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW)"
+    x = _clean(expr)
+    # min_periods = window, como em groupby(...).rolling(window)
+    return f"CASE WHEN count({x}) OVER {frame} >= {window} THEN {func}({x}) OVER {frame} END"
+
+
+def feature_sql(spec: FeatureSpec, w: str = "w") -> str:
+    """
+    Expressão SQL de uma feature não recursiva do registro (mesma semântica
+    dos kernels de etl/transform/feature_registry.py). Usa a janela nomeada w
+    (PARTITION BY <segmento> ORDER BY date).
+    """
+    x = [quote_ident(name) for name in spec.inputs]
+    params = spec.params
+    if spec.type == "pct_change":
+        return f"{x[0]} / nullif({_shift(x[0], int(params.get('periods', 1)), w)}, 0) - 1"
+    if spec.type == "lag":
+        return _shift(x[0], int(params.get("periods", 1)), w)
+    if spec.type == "rolling_std":
+        expr = _rolling("stddev_samp", x[0], int(params["window"]), w)
+        if params.get("annualize"):
+            expr = f"({expr}) * {float(np.sqrt(float(params['annualize'])))!r}"
+        return expr
+    if spec.type == "rolling_mean":
+        return _rolling("avg", x[0], int(params["window"]), w)
+    if spec.type == "ratio":
+        return f"{x[0]} / nullif({x[1]}, 0)"
+    if spec.type == "difference":
+        return f"{x[0]} - {x[1]}"
+    raise ValueError(f"Tipo de feature sem tradução SQL: {spec.type}")
+
+
+def cross_sectional_sql(spec: FeatureSpec,
+                        group: str = "_sector",
+                        float32_input: bool = False) -> list[tuple[str, str]]:
+    """
+    Tradução SQL de uma feature transversal do registro (mesma semântica dos
+    kernels de etl/transform/panel.py): janelas por date sobre todas as
+    linhas da data. group: coluna com o setor do ticker (sector_relative).
+    float32_input: a entrada é uma feature materializada em float32 (como o
+    motor pandas a entrega ao painel), arredondada antes das contas.
+
+    Devolve os passos [(coluna, expressão)] em ordem: cada passo pode usar as
+    colunas dos anteriores (um SELECT por passo, pois janelas não se
+    aninham) e o último é a própria feature. As contas seguem em DOUBLE, na
+    ordem de operações dos kernels do painel (ex.: z-score = média, desvio
+    padrão amostral dos desvios e divisão); só a ordem das parcelas das
+    somas por data difere da do numpy (ver transform.engine em configs/etl.yml).
+    """
+    x = quote_ident(spec.inputs[0])
+    x = _clean(f"CAST(CAST({x} AS FLOAT) AS DOUBLE)" if float32_input else f"CAST({x} AS DOUBLE)")
+    by_date = "PARTITION BY date"
+    if spec.type == "cs_rank":
+        # Empates recebem a média dos ranks, como rank(pct=True) do pandas
+        return [(spec.name, f"CASE WHEN {x} IS NOT NULL THEN "
+                            f"(rank() OVER ({by_date} ORDER BY {x} NULLS LAST) "
+                            f"+ (count(*) OVER ({by_date}, {x}) - 1) / 2.0) / count({x}) OVER ({by_date}) END")]
+    if spec.type == "cs_zscore":
+        mean, std = (quote_ident(f"_{spec.name}_{step}") for step in ("mean", "std"))
+        n = f"count({x}) OVER ({by_date})"
+        return [
+            (f"_{spec.name}_mean", f"sum({x}) OVER ({by_date}) / {n}"),
+            (f"_{spec.name}_std", f"sqrt(sum(({x} - {mean}) * ({x} - {mean})) OVER ({by_date}) / nullif({n} - 1, 0))"),
+            (spec.name, f"({x} - {mean}) / nullif({std}, 0)"),
+        ]
+    if spec.type == "sector_relative":
+        by_group = f"{by_date}, {group}"
+        return [(spec.name, f"CASE WHEN {group} IS NOT NULL THEN "
+                            f"{x} - sum({x}) OVER ({by_group}) / count({x}) OVER ({by_group}) END")]
+    raise ValueError(f"Tipo de feature transversal sem tradução SQL: {spec.type}")
+
+
+def _ema_ctes(prev: str, batch: list[FeatureSpec], key: str, name: str) -> list[tuple[str, str]]:
+    """
+    EMAs (adjust=False) de uma mesma entrada, para vários spans, como CTE
+    recursiva: cada iteração avança uma posição em todos os segmentos ao mesmo
+    tempo (como etl/transform/feature_engine.ema_segmented), com a mesma
+    recorrência e a mesma ordem de operações do pandas ewm.
+
+    A série de cada segmento vira uma lista (xs) e a recursão só indexa
+    xs[pos], juntando com uma linha por segmento em vez da tabela inteira.
+    """
+    src = _clean(f"CAST({quote_ident(batch[0].inputs[0])} AS DOUBLE)")
+    alphas = [1.0 / (1.0 + (float(s.params["span"]) - 1) / 2.0) for s in batch]
+    series, rec = f"{name}_series", f"{name}_rec"
+
+    anchor = ", ".join(f"xs[1] AS w{i}, 1.0::DOUBLE AS ow{i}" for i in range(len(batch)))
+    decay = ", ".join(
+        f"CASE WHEN r.w{i} IS NOT NULL THEN r.ow{i} * {1.0 - a!r} ELSE r.ow{i} END AS d{i}"
+        for i, a in enumerate(alphas)
+    )
+    update = ", ".join(
+        f"CASE WHEN x IS NULL THEN w{i} WHEN w{i} IS NULL THEN x WHEN w{i} = x THEN w{i} "
+        f"ELSE (d{i} * w{i} + {a!r} * x) / (d{i} + {a!r}) END, "
+        f"CASE WHEN x IS NOT NULL AND w{i} IS NOT NULL THEN 1.0 ELSE d{i} END"
+        for i, a in enumerate(alphas)
+    )
+    outputs = ", ".join(f"e.w{i} AS {quote_ident(s.name)}" for i, s in enumerate(batch))
+
+    return [
+        (series, f"SELECT {key} AS seg, list({src} ORDER BY date) AS xs, count(*) AS n "
+                 f"FROM {prev} GROUP BY {key}"),
+        (rec, f"SELECT seg, 1::BIGINT AS pos, {anchor} FROM {series} "
+              f"UNION ALL "
+              f"SELECT seg, pos + 1, {update} FROM ("
+              f"SELECT r.*, s.xs[r.pos + 1] AS x, {decay} "
+              f"FROM {rec} r JOIN {series} s USING (seg) WHERE r.pos < s.n)"),
+        (name, f"SELECT p.*, {outputs} FROM {prev} p "
+               f"JOIN {rec} e ON e.seg = p.{key} AND e.pos = p._rn"),
+    ]
+
+
+def _ema_numpy_ctes(con, ctes: list[tuple[str, str]], prev: str,
+                    batch: list[FeatureSpec], key: str, name: str) -> list[tuple[str, str]]:
+    """
+    EMAs de uma mesma entrada pelo kernel NumPy (feature_engine.ema_segmented):
+    só (segmento, posição, entrada) saem do DuckDB, já ordenados; o resultado
+    volta como tabela registrada e é juntado por (segmento, posição).
+    """
+    src = _clean(f"CAST({quote_ident(batch[0].inputs[0])} AS DOUBLE)")
+    series = con.execute(with_ctes(ctes, f"""
+        SELECT {key} AS seg, _rn AS pos, {src} AS x FROM {prev} ORDER BY seg, pos
+    """)).df()
+    seg = Segments(pd.factorize(series["seg"], sort=False)[0])
+    emas = ema_segmented(series["x"].to_numpy(dtype=np.float64), seg,
+                         [int(s.params["span"]) for s in batch])
+
+    values = pd.DataFrame({"seg": series["seg"], "pos": series["pos"]})
+    for i in range(len(batch)):
+        values[f"w{i}"] = emas[:, i]
+    con.register(f"{name}_values", values)
+
+    outputs = ", ".join(f"e.w{i} AS {quote_ident(s.name)}" for i, s in enumerate(batch))
+    return [(name, f"SELECT p.*, {outputs} FROM {prev} p "
+                   f"JOIN {name}_values e ON e.seg = p.{key} AND e.pos = p._rn")]
+
+
+def feature_ctes(specs: dict[str, FeatureSpec],
+                 requested: list[str],
+                 base_columns: list[str],
+                 source: str,
+                 key: str,
+                 prefix: str,
+                 con=None,
+                 ema_method: str = "recursive") -> tuple[list[tuple[str, str]], str]:
+    """
+    Traduz o plano de features (DAG de configs/features.yml) em uma cadeia de
+    CTEs sobre source, segmentada por key e ordenada por date. Features
+    independentes entre si ficam na mesma CTE (uma única ordenação de janela).
+    Retorna (ctes, nome da última CTE), que contém as colunas de source, _rn
+    (posição no segmento) e todas as features do plano, inclusive
+    intermediárias.
+
+    EMAs: ema_method="recursive" gera CTEs recursivas (SQL puro; uma iteração
+    por posição, então o custo cresce com o tamanho do histórico, não com o
+    número de tickers); "numpy" calcula com o kernel vetorizado sobre as
+    colunas (segmento, posição, entrada) e exige con.
+    """
+    if ema_method not in EMA_METHODS:
+        raise ValueError(f"ema_method deve ser um de {EMA_METHODS}, não {ema_method!r}.")
+    plan = compile_feature_plan(specs, requested, base_columns)
+
+    def window(name):
+        # O DuckDB exige nomes de janela distintos entre CTEs da mesma consulta
+        return f"WINDOW w_{name} AS (PARTITION BY {key} ORDER BY date)"
+
+    ctes = [(f"{prefix}_0", f"SELECT *, row_number() OVER w_{prefix}_0 AS _rn FROM {source} {window(f'{prefix}_0')}")]
+    prev = ctes[0][0]
+    pending: list[FeatureSpec] = []
+    done = set()
+
+    def flush():
+        nonlocal prev
+        if not pending:
+            return
+        name = f"{prefix}_{len(ctes)}"
+        cols = ", ".join(f"{feature_sql(s, f'w_{name}')} AS {quote_ident(s.name)}" for s in pending)
+        ctes.append((name, f"SELECT *, {cols} FROM {prev} {window(name)}"))
+        done.update(s.name for s in pending)
+        pending.clear()
+        prev = name
+
+    for spec in plan:
+        if spec.name in done:
+            continue
+        if spec.type == "ema":
+            flush()
+            batch = [s for s in plan if s.type == "ema" and s.inputs == spec.inputs and s.name not in done]
+            name = f"{prefix}_{len(ctes)}"
+            if ema_method == "numpy":
+                ctes.extend(_ema_numpy_ctes(con, ctes, prev, batch, key, name))
+            else:
+                ctes.extend(_ema_ctes(prev, batch, key, name))
+            done.update(s.name for s in batch)
+            prev = name
+            continue
+        if any(dep in {s.name for s in pending} for dep in spec.inputs):
+            flush()
+        pending.append(spec)
+    flush()
+    return ctes, prev
+
+
+def with_ctes(ctes: list[tuple[str, str]], body: str) -> str:
+    """
+    Monta WITH RECURSIVE <ctes> <body>.
+    """
+    if not ctes:
+        return body
+    parts = ",\n".join(f"{name} AS ({sql})" for name, sql in ctes)
+    return f"WITH RECURSIVE {parts}\n{body}"
@@ -0,0 +1,171 @@
+# etl/utils/cache.py
+
+import hashlib
+import importlib
+import inspect
+import json
+import sys
+from pathlib import Path
+from typing import Callable
+
+from etl.utils.io import ensure_dir
+
+MANIFEST_NAME = "_raw_manifest.json"
+_HASH_CHUNK = 1 << 20
+
+
+def _raw_files(path: Path) -> list[Path]:
+    # Arquivo único ou partes de um histórico em diretório (append_raw_part)
+    return sorted(f for f in path.rglob("*") if f.is_file()) if path.is_dir() else [path]
+
+
+def file_sha256(path: Path) -> str:
+    """
+    Hash SHA-256 do conteúdo de um arquivo (lido em blocos de 1 MiB). Para um
+    diretório de partes, hash do nome e do conteúdo de cada parte, em ordem.
+    """
+    h = hashlib.sha256()
+    for part in _raw_files(path):
+        if part != path:
+            h.update(part.relative_to(path).as_posix().encode("utf-8"))
+        with open(part, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def file_stat(path: Path) -> tuple[int, int]:
+    """
+    (tamanho, mtime_ns) de um arquivo; para um diretório de partes, a soma dos
+    tamanhos e o mtime mais recente.
+    """
+    stats = [f.stat() for f in _raw_files(path)]
+    return sum(s.st_size for s in stats), max((s.st_mtime_ns for s in stats), default=0)
+
+
+def _module_key(module) -> str:
+    # Nome do módulo mesmo quando rodado como script (python -m: __main__)
+    spec = getattr(module, "__spec__", None)
+    return spec.name if spec is not None else module.__name__
+
+
+def _etl_modules(funcs: tuple) -> dict:
+    """
+    Módulos que definem funcs e, transitivamente, os módulos etl.* que eles
+    importam (funções, classes e módulos nos globais de cada um).
+    """
+    found: dict = {}
+    stack = [inspect.getmodule(func) for func in funcs]
+    while stack:
+        module = stack.pop()
+        key = _module_key(module)
+        if key in found:
+            continue
+        found[key] = module
+        for value in vars(module).values():
+            dep = value.__name__ if inspect.ismodule(value) else getattr(value, "__module__", None)
+            if isinstance(dep, str) and dep.startswith("etl.") and dep not in found:
+                stack.append(sys.modules.get(dep) or importlib.import_module(dep))
+    return found
+
+
+def code_fingerprint(*funcs: Callable) -> str:
+    """
+    Impressão digital do código que gera o BRONZE: o código-fonte inteiro dos
+    módulos que definem as funções informadas e dos módulos etl.* que eles
+    importam (ex.: compact_frame de etl/utils/schema.py, save_parquet de
+    etl/utils/io.py), como modules_fingerprint de etl/utils/lineage.py. Muda
+    sempre que a padronização ou um helper usado por ela é editado,
+    invalidando o cache.
+    """
+    h = hashlib.sha256()
+    for key, module in sorted(_etl_modules(funcs).items()):
+        h.update(key.encode("utf-8"))
+        h.update(Path(inspect.getfile(module)).read_bytes())
+    return h.hexdigest()[:16]
+
+
+def config_fingerprint(entry: dict) -> str:
+    """
+    Impressão digital da entrada do ativo em assets.yml.
+    """
+    payload = json.dumps(entry, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class RawChangeCache:
+    """
+    Cache de detecção de mudanças dos arquivos brutos (RAW -> BRONZE).
+
+    Guarda, por chave (ticker/benchmark), tamanho, mtime e hash SHA-256 do arquivo
+    bruto, além das impressões digitais do código e da configuração usados para
+    gerar o Parquet de BRONZE. O manifesto fica em data/bronze/_raw_manifest.json.
+
+    Se tamanho e mtime batem, o arquivo é considerado inalterado sem ler o conteúdo;
+    se só o mtime mudou (ex.: arquivo reescrito igual), o hash decide.
+    """
+
+    def __init__(self, bronze_dir: Path):
+        self.path = bronze_dir / MANIFEST_NAME
+        self.entries: dict = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.entries = {}
+        self._dirty = False
+
+    def is_fresh(self, key: str, raw_path: Path, out_path: Path,
+                 code_fp: str, config_fp: str) -> bool:
+        """
+        True se o BRONZE existente em out_path ainda corresponde a raw_path.
+        """
+        entry = self.entries.get(key)
+        if entry is None or not raw_path.exists() or not out_path.exists():
+            return False
+        if entry.get("code") != code_fp or entry.get("config") != config_fp:
+            return False
+        if entry.get("raw_path") != str(raw_path) or entry.get("out_path") != str(out_path):
+            return False
+
+        size, mtime_ns = file_stat(raw_path)
+        if size != entry.get("size"):
+            return False
+        if mtime_ns == entry.get("mtime_ns"):
+            return True
+
+        if file_sha256(raw_path) != entry.get("sha256"):
+            return False
+        entry["mtime_ns"] = mtime_ns
+        self._dirty = True
+        return True
+
+    def record(self, key: str, raw_path: Path, out_path: Path,
+               code_fp: str, config_fp: str) -> None:
+        """
+        Registra a assinatura atual de raw_path após uma extração bem-sucedida.
+        """
+        size, mtime_ns = file_stat(raw_path)
+        self.entries[key] = {
+            "raw_path": str(raw_path),
+            "out_path": str(out_path),
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": file_sha256(raw_path),
+            "code": code_fp,
+            "config": config_fp,
+        }
+        self._dirty = True
+
+    def invalidate(self, key: str) -> None:
+        if self.entries.pop(key, None) is not None:
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        ensure_dir(self.path.parent)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=2, sort_keys=True), encoding="utf-8")
+        tmp.replace(self.path)
+        self._dirty = False
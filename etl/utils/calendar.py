@@ -1,13 +1,83 @@
 # etl/utils/calendar.py
 
+import numpy as np
 import pandas as pd
 
+# ===============================================================
+# Calendário de pregão e chaves inteiras de sessão
+# ===============================================================
+# Cada pregão do calendário tem uma chave inteira (session = 0, 1, 2, ...).
+# Séries são alinhadas ao calendário convertendo suas datas em chaves uma
+# única vez (busca binária sobre os dias em int64, sem hashing de datetime);
+# joins entre séries viram gathers por chave.
 
-def build_trading_calendar(df_prices: pd.DataFrame) -> pd.DataFrame:
+
+def _days(dates) -> np.ndarray:
+    """
+    Datas como dias inteiros (int64 desde 1970-01-01); NaT vira o menor int64.
+    """
+    values = dates.to_numpy() if isinstance(dates, (pd.Series, pd.Index)) else np.asarray(dates)
+    if values.dtype.kind != "M":
+        values = pd.to_datetime(pd.Series(values)).to_numpy(dtype="datetime64[ns]")
+    return values.astype("datetime64[D]").astype(np.int64)
+
+
+def build_trading_calendar(*frames: pd.DataFrame) -> pd.DataFrame:
+    """
+    Constrói calendário de pregão a partir das datas existentes nos frames
+    (união das datas; cada frame com coluna 'date' datetime), com a chave
+    inteira de cada pregão:
+
+        date, session
+    """
+    days = np.unique(np.concatenate([_days(df["date"].dropna()) for df in frames]))
+    return pd.DataFrame({
+        "date": days.astype("datetime64[D]").astype("datetime64[ns]"),
+        "session": np.arange(len(days), dtype=np.int32),
+    })
+
+
+def calendar_days(calendar: pd.DataFrame | None, *frames: pd.DataFrame) -> np.ndarray:
     """
-    Constrói calendário de pregão a partir das datas existentes em df_prices.
-    Assume que df_prices possui coluna 'date' (datetime).
+    Dias (int64, ordenados) do calendário unido às datas dos frames: séries
+    com pregões fora do calendário (ex.: o benchmark) ganham suas sessões.
+    """
+    parts = [] if calendar is None else [_days(calendar["date"].dropna())]
+    parts += [_days(df["date"].dropna()) for df in frames]
+    return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+
+def session_keys(dates, days: np.ndarray) -> np.ndarray:
+    """
+    Chave de sessão de cada data: a do pregão na data ou, fora do
+    calendário, a do último pregão anterior (-1 antes do primeiro e para NaT).
+
+    Uma tabela dia -> sessão cobrindo o calendário (um inteiro por dia
+    corrido) é montada uma vez; cada data vira um acesso direto à tabela, sem
+    busca nem hashing por linha.
+    """
+    d = _days(dates)
+    if not len(days):
+        return np.full(len(d), -1, dtype=np.int64)
+    table = np.searchsorted(days, np.arange(days[0], days[-1] + 1), side="right") - 1
+    keys = table[np.clip(d - days[0], 0, len(table) - 1)]
+    keys[d < days[0]] = -1
+    return keys
+
+
+def asof_index(days: np.ndarray, series_dates, tolerance: int = 0) -> np.ndarray:
+    """
+    Reindexa uma série ao calendário (uma vez): para cada sessão, a posição
+    na série da última linha com sessão <= à da sessão, se estiver a até
+    `tolerance` sessões dela; -1 caso contrário. A série deve estar ordenada
+    por data (com datas repetidas, vale a última linha).
+
+    Com tolerance=0 só casam datas exatas; tolerance=1 cobre um pregão sem
+    observação da série (feriado local, suspensão, atraso da fonte).
     """
-    unique_dates = df_prices["date"].dropna().sort_values().unique()
-    calendar = pd.DataFrame({"date": unique_dates})
-    return calendar
\ No newline at end of file
+    keys = session_keys(series_dates, days)
+    sessions = np.arange(len(days))
+    pos = np.searchsorted(keys, sessions, side="right") - 1
+    ok = pos >= 0
+    ok[ok] &= (sessions[ok] - keys[pos[ok]]) <= tolerance
+    return np.where(ok, pos, -1)
@@ -8,6 +8,92 @@ BASE_DIR = Path(__file__).resolve().parents[2]  # raiz do projeto
 DATA_DIR = BASE_DIR / "data"
 CONFIG_DIR = BASE_DIR / "configs"
 
+# Valores padrão de configs/etl.yml (chaves ausentes no arquivo usam estes valores)
+DEFAULT_ETL_SETTINGS = {
+    "raw": {
+        "format": "parquet",
+        "export_xlsx": False,
+    },
+    "download": {
+        "batch_size": 20,
+        "max_workers": 4,
+        "rate_per_sec": 2.0,
+        "max_retries": 3,
+        "backoff": 1.0,
+    },
+    "extract": {
+        "max_workers": 0,
+        "stream": {
+            "threshold_mb": 256,
+            "block_mb": 4,
+        },
+    },
+    "intraday": {
+        "timezone": "America/Sao_Paulo",
+        "batch_rows": 1_000_000,
+        "max_partial_rows": 2_000_000,
+    },
+    "flow": {
+        "max_workers": 0,
+    },
+    "gold": {
+        "feature_set": "default",
+        "benchmark_tolerance": 1,
+    },
+    "transform": {
+        "engine": "pandas",
+        "duckdb": {
+            "threads": 0,
+            "memory_limit": "",
+            "temp_directory": "",
+            "ema_method": "numpy",
+        },
+    },
+    "storage": {
+        "layout": "dataset",
+        "n_buckets": 16,
+        "row_group_size": 128_000,
+        "full_precision": False,
+    },
+    "metrics": {
+        "enabled": True,
+    },
+    "quality": {
+        "rules": {
+            "null_dates": "warn",
+            "null_close": "warn",
+            "duplicate_keys": "warn",
+            "negative_close": "error",
+            "ohlc_inconsistent": "warn",
+            "non_positive_volume": "warn",
+            "calendar_gaps": "warn",
+            "return_jumps": "warn",
+            "stale_prices": "warn",
+        },
+        "max_abs_return": 0.5,
+        "stale_days": 5,
+        "sample_fraction": 1.0,
+    },
+    "warehouse": {
+        "tables": {
+            "asset_features_daily": "table",
+            "asset_kpis_summary": "table",
+            "asset_kpis_periods": "table",
+        },
+        "indexes": [],
+    },
+}
+
+
+def _deep_merge(base: dict, override: dict) -> dict:
+    merged = dict(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
 
 def load_assets_config() -> dict:
     """
@@ -24,6 +110,9 @@ def load_assets_config() -> dict:
     benchmark:
       - name: IBOV
         path: "IBOV.xlsx"
+      - name: CDI
+        path: "CDI.csv"
+        kind: rate
     """
     config_path = CONFIG_DIR / "assets.yml"
     with open(config_path, "r", encoding="utf-8") as f:
@@ -31,12 +120,26 @@ def load_assets_config() -> dict:
     return cfg
 
 
+def load_etl_settings() -> dict:
+    """
+    Lê configs/etl.yml (formatos, paralelismo, caches) e completa com os
+    valores de DEFAULT_ETL_SETTINGS. O arquivo é opcional.
+    """
+    config_path = CONFIG_DIR / "etl.yml"
+    cfg = {}
+    if config_path.exists():
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+    return _deep_merge(DEFAULT_ETL_SETTINGS, cfg)
+
+
 def get_paths() -> dict:
     """
-    Retorna os diretórios principais (raw, bronze, silver, gold).
+    Retorna os diretórios principais (raw, bronze, silver, gold, exports).
     """
     return {
         "raw": DATA_DIR / "raw",
+        "exports": DATA_DIR / "exports",
         "bronze": DATA_DIR / "bronze",
         "silver": DATA_DIR / "silver",
         "gold": DATA_DIR / "gold",
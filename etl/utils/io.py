@@ -1,8 +1,26 @@
 # etl/utils/io.py
 
+import json
+import shutil
+import uuid
+import zlib
 from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
+from etl.utils.config import load_etl_settings
+from etl.utils.schema import restore_frame, to_arrow_table
+
+# Formatos aceitos para os históricos brutos (data/raw) -> extensão do arquivo
+RAW_FORMATS = {
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+    "xlsx": ".xlsx",
+}
+# Partes de um histórico Parquet bruto (append_raw_part) antes de compactá-lo
+RAW_MAX_PARTS = 64
+
 
 def ensure_dir(path: Path) -> None:
     """
@@ -11,23 +29,299 @@ def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def read_excel_or_csv(path: Path) -> pd.DataFrame:
+def raw_suffix(raw_format: str) -> str:
+    """
+    Retorna a extensão de arquivo de um formato bruto ('parquet', 'arrow', 'xlsx').
+    """
+    try:
+        return RAW_FORMATS[raw_format.lower()]
+    except KeyError:
+        raise ValueError(f"Formato bruto não suportado: {raw_format} (use {list(RAW_FORMATS)})")
+
+
+def read_excel_or_csv(path: Path, csv_options: dict | None = None) -> pd.DataFrame:
     """
-    Lê planilha Excel ou CSV e retorna DataFrame.
+    Lê arquivo bruto (Parquet, Arrow IPC, Excel ou CSV) e retorna DataFrame.
+    Um histórico Parquet em partes (diretório, ver append_raw_part) é lido
+    como um único frame. csv_options vai para o pd.read_csv (ex.: sep=';' e
+    decimal=',' nos CSVs do SGS/BCB).
     """
     suffix = path.suffix.lower()
-    if suffix in [".xlsx", ".xls"]:
+    if suffix == ".parquet":
+        df = pd.read_parquet(path)
+    elif suffix in [".arrow", ".feather", ".ipc"]:
+        df = pd.read_feather(path)
+    elif suffix in [".xlsx", ".xls"]:
         df = pd.read_excel(path)
     elif suffix == ".csv":
-        df = pd.read_csv(path)
+        # round_trip: mesmos floats do leitor CSV do Arrow (extract_assets_stream)
+        df = pd.read_csv(path, **{"float_precision": "round_trip", **(csv_options or {})})
     else:
         raise ValueError(f"Formato de arquivo não suportado: {path}")
     return df
 
 
-def save_parquet(df: pd.DataFrame, path: Path) -> None:
+def write_raw(df: pd.DataFrame, path: Path) -> None:
+    """
+    Salva histórico bruto no formato indicado pela extensão de path
+    (.parquet, .arrow/.feather, .xlsx ou .csv).
+    """
+    ensure_dir(path.parent)
+    suffix = path.suffix.lower()
+    if suffix == ".parquet":
+        if path.is_dir():
+            shutil.rmtree(path)
+        df.to_parquet(path, index=False)
+    elif suffix in [".arrow", ".feather", ".ipc"]:
+        df.reset_index(drop=True).to_feather(path)
+    elif suffix in [".xlsx", ".xls"]:
+        df.to_excel(path, index=False)
+    elif suffix == ".csv":
+        df.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Formato de arquivo não suportado: {path}")
+
+
+def append_raw_part(df: pd.DataFrame, path: Path, max_parts: int = RAW_MAX_PARTS) -> None:
+    """
+    Anexa df ao histórico Parquet bruto em path como uma nova parte, sem
+    reescrever o que já existe: path vira um diretório de partes
+    (part-00000.parquet, part-00001.parquet, ...), lido por read_excel_or_csv
+    como um único frame. Um arquivo único em path vira a primeira parte; acima
+    de max_parts partes, o histórico é compactado em uma só (escrita ao lado
+    e troca, como em publish_dataset).
+    """
+    if path.is_file():
+        moved = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}")
+        path.rename(moved)
+        ensure_dir(path)
+        moved.rename(path / "part-00000.parquet")
+    ensure_dir(path)
+
+    parts = sorted(path.glob("part-*.parquet"))
+    n = int(parts[-1].stem.split("-")[1]) + 1 if parts else 0
+    df.to_parquet(path / f"part-{n:05d}.parquet", index=False)
+    if len(parts) + 1 <= max_parts:
+        return
+
+    staging = staging_dir(path)
+    ensure_dir(staging)
+    pd.read_parquet(path).to_parquet(staging / "part-00000.parquet", index=False)
+    old = path.with_name(f".{path.name}.old")
+    path.rename(old)
+    staging.rename(path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _full_precision(full_precision: bool | None) -> bool:
+    """
+    None = padrão de configs/etl.yml (storage.full_precision).
+    """
+    if full_precision is None:
+        return bool(load_etl_settings()["storage"]["full_precision"])
+    return bool(full_precision)
+
+
+def save_parquet(df: pd.DataFrame, path: Path, full_precision: bool | None = None) -> None:
     """
-    Salva DataFrame em formato Parquet (sem índice).
+    Salva DataFrame em formato Parquet (sem índice) no esquema compacto de
+    etl/utils/schema.py: ticker dictionary-encoded, datas em date32, volume
+    inteiro e features em float32 (preços seguem em float64).
+    full_precision=True mantém as features em float64.
     """
+    import pyarrow.parquet as pq
+
     ensure_dir(path.parent)
-    df.to_parquet(path, index=False)
\ No newline at end of file
+    pq.write_table(to_arrow_table(df, full_precision=_full_precision(full_precision)), path)
+
+
+def read_parquet(path: Path, columns: list[str] | None = None, filters=None) -> pd.DataFrame:
+    """
+    Lê um Parquet salvo por save_parquet, devolvendo datas em datetime64 e
+    ticker categórico.
+    """
+    return restore_frame(pd.read_parquet(path, columns=columns, filters=filters))
+
+
+# ===============================================================
+# Datasets Parquet particionados (Hive: ticker_bucket=<n>/year=<aaaa>)
+# ===============================================================
+
+PARTITION_COLS = ["ticker_bucket", "year"]
+# Marcador de dataset completo; guarda o número de buckets usado na escrita
+DATASET_MARKER = "_SUCCESS"
+
+
+def ticker_bucket(tickers, n_buckets: int) -> np.ndarray:
+    """
+    Bucket estável (CRC32 % n_buckets) de cada ticker, igual entre execuções.
+    """
+    uniques, codes = np.unique(np.asarray(tickers, dtype=str), return_inverse=True)
+    buckets = np.array([zlib.crc32(t.encode("utf-8")) % n_buckets for t in uniques], dtype=np.int32)
+    return buckets[codes]
+
+
+def dataset_exists(root: Path) -> bool:
+    return (root / DATASET_MARKER).exists()
+
+
+def dataset_buckets(root: Path) -> int | None:
+    """
+    Número de buckets de um dataset existente (None se não houver dataset).
+    """
+    if not dataset_exists(root):
+        return None
+    return int(json.loads((root / DATASET_MARKER).read_text(encoding="utf-8"))["n_buckets"])
+
+
+def save_dataset(df: pd.DataFrame,
+                 root: Path,
+                 n_buckets: int = 16,
+                 row_group_size: int = 128_000,
+                 replace_partitions: bool = False,
+                 full_precision: bool | None = None) -> None:
+    """
+    Salva df (colunas ticker e date obrigatórias) como dataset Parquet
+    particionado por ticker_bucket e year, ordenado por (ticker, date), com
+    row groups de até row_group_size linhas e estatísticas por coluna, para
+    que leitores pulem partições e row groups ao filtrar por ticker/data.
+
+    - replace_partitions=False: reescreve o dataset inteiro (em diretório
+      temporário + troca, para leitores nunca verem escrita pela metade).
+    - replace_partitions=True: substitui apenas as partições presentes em df,
+      que devem vir completas (usado nas atualizações incrementais).
+
+    As colunas seguem o esquema compacto de save_parquet.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if replace_partitions and dataset_exists(root):
+        n_buckets = dataset_buckets(root)
+    else:
+        replace_partitions = False
+
+    df = df.sort_values(["ticker", "date"]).reset_index(drop=True)
+    table = to_arrow_table(df, full_precision=_full_precision(full_precision))
+    table = table.append_column("ticker_bucket", pa.array(ticker_bucket(df["ticker"], n_buckets), pa.int32()))
+    table = table.append_column("year", pa.array(df["date"].dt.year.to_numpy(dtype=np.int32), pa.int32()))
+
+    partitioning = ds.partitioning(
+        pa.schema([("ticker_bucket", pa.int32()), ("year", pa.int32())]), flavor="hive"
+    )
+    file_options = ds.ParquetFileFormat().make_write_options(compression="zstd", write_statistics=True)
+
+    target = root if replace_partitions else staging_dir(root)
+    ensure_dir(target)
+    ds.write_dataset(
+        table,
+        target,
+        format="parquet",
+        partitioning=partitioning,
+        file_options=file_options,
+        basename_template=f"part-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+        max_rows_per_group=row_group_size,
+        min_rows_per_group=min(row_group_size, 16_384),
+        existing_data_behavior="delete_matching",
+    )
+    if replace_partitions:
+        (root / DATASET_MARKER).write_text(json.dumps({"n_buckets": n_buckets}), encoding="utf-8")
+    else:
+        publish_dataset(target, root, n_buckets)
+
+
+def staging_dir(root: Path) -> Path:
+    """
+    Diretório temporário, ao lado de root, para escrever um dataset novo.
+    """
+    return root.with_name(f".{root.name}.{uuid.uuid4().hex[:8]}")
+
+
+def publish_dataset(staging: Path, root: Path, n_buckets: int) -> None:
+    """
+    Marca o dataset escrito em staging como completo e o troca de lugar com
+    root (leitores nunca veem um dataset pela metade).
+    """
+    (staging / DATASET_MARKER).write_text(json.dumps({"n_buckets": n_buckets}), encoding="utf-8")
+    old = root.with_name(f".{root.name}.old")
+    if root.exists():
+        root.rename(old)
+    staging.rename(root)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def read_dataset(root: Path,
+                 tickers: list[str] | None = None,
+                 start=None,
+                 end=None,
+                 columns: list[str] | None = None,
+                 buckets: list[int] | None = None) -> pd.DataFrame:
+    """
+    Lê um dataset salvo por save_dataset aplicando os filtros de ticker e data
+    no próprio scan (poda de partições ticker_bucket/year e de row groups pelas
+    estatísticas). buckets restringe a leitura a partições inteiras.
+
+    Se o dataset não existir, lê o arquivo único <root>.parquet com os mesmos
+    filtros de ticker e data.
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    if not dataset_exists(root):
+        filters = []
+        if tickers is not None:
+            filters.append(("ticker", "in", list(tickers)))
+        if start is not None:
+            filters.append(("date", ">=", start))
+        if end is not None:
+            filters.append(("date", "<=", end))
+        return read_parquet(root.with_suffix(".parquet"), columns=columns, filters=filters or None)
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    conditions = []
+    if tickers is not None:
+        tickers = list(tickers)
+        wanted = set(ticker_bucket(tickers, dataset_buckets(root)).tolist()) if tickers else set()
+        if buckets is not None:
+            wanted &= set(buckets)
+        conditions += [ds.field("ticker_bucket").isin(sorted(wanted)), ds.field("ticker").isin(tickers)]
+    elif buckets is not None:
+        conditions.append(ds.field("ticker_bucket").isin(sorted(set(buckets))))
+    if start is not None:
+        conditions += [ds.field("year") >= start.year, ds.field("date") >= start]
+    if end is not None:
+        conditions += [ds.field("year") <= end.year, ds.field("date") <= end]
+
+    expr = None
+    for cond in conditions:
+        expr = cond if expr is None else expr & cond
+
+    read_cols = None if columns is None else [c for c in columns if c not in PARTITION_COLS]
+    df = dataset.to_table(columns=read_cols, filter=expr).to_pandas()
+    df = restore_frame(df.drop(columns=[c for c in PARTITION_COLS if c in df.columns]))
+    if "ticker" in df.columns and "date" in df.columns:
+        df = df.sort_values(["ticker", "date"]).reset_index(drop=True)
+    return df
+
+
+def save_layer(df: pd.DataFrame, root: Path, storage: dict) -> None:
+    """
+    Persiste uma tabela de camada (SILVER/GOLD) conforme configs/etl.yml
+    (seção 'storage'): dataset particionado em <root>/ ou arquivo único
+    <root>.parquet. Remove a versão no outro layout, para que read_dataset
+    nunca leia dados antigos.
+    """
+    file_path = root.with_suffix(".parquet")
+    if storage.get("layout", "dataset") == "dataset":
+        save_dataset(df, root,
+                     n_buckets=int(storage["n_buckets"]),
+                     row_group_size=int(storage["row_group_size"]),
+                     full_precision=storage.get("full_precision"))
+        if file_path.exists():
+            file_path.unlink()
+    else:
+        save_parquet(df, file_path, full_precision=storage.get("full_precision"))
+        if root.is_dir():
+            shutil.rmtree(root)
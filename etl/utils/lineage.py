@@ -0,0 +1,239 @@
+# etl/utils/lineage.py
+
+import hashlib
+import importlib.util
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from etl.utils.cache import config_fingerprint, file_sha256
+from etl.utils.config import CONFIG_DIR, get_paths, load_assets_config, load_etl_settings
+from etl.utils.io import ensure_dir
+from etl.extract.extract_benchmark import benchmark_bronze_path
+
+# Manifestos por etapa: data/_lineage/<etapa>.json
+LINEAGE_DIR_NAME = "_lineage"
+
+
+@dataclass
+class Stage:
+    """
+    Etapa do pipeline para o cache de etapas / linhagem: entradas e saídas
+    (arquivos ou diretórios de dataset), módulos cujo código define a etapa e
+    a configuração que afeta o resultado.
+    """
+    name: str
+    inputs: List[Path]
+    outputs: List[Path]
+    modules: List[str]
+    config: Dict = field(default_factory=dict)
+
+
+# ===============================================================
+# 1. Impressões digitais (conteúdo, código e configuração)
+# ===============================================================
+
+def _file_hash(path: Path, known: Dict) -> Dict:
+    """
+    Hash SHA-256 de um arquivo, reaproveitando o hash já registrado em known
+    se tamanho e mtime não mudaram (mesma regra do RawChangeCache).
+    """
+    stat = path.stat()
+    entry = known.get(str(path))
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_sha256(path)}
+
+
+def path_fingerprint(path: Path, known: Dict, seen: Dict) -> str | None:
+    """
+    Impressão digital do conteúdo de path (None se não existir). Para
+    diretórios (datasets particionados), combina os hashes dos arquivos por
+    partição, ignorando o nome dos arquivos (que muda a cada escrita).
+    seen acumula {arquivo: {size, mtime_ns, sha256}} para o próximo manifesto.
+    """
+    if path.is_file():
+        entry = seen[str(path)] = _file_hash(path, known)
+        return entry["sha256"]
+    if not path.is_dir():
+        return None
+    parts = []
+    for f in path.rglob("*"):
+        if f.is_file():
+            entry = seen[str(f)] = _file_hash(f, known)
+            parts.append(f"{f.parent.relative_to(path).as_posix()}:{entry['sha256']}")
+    return hashlib.sha256("\n".join(sorted(parts)).encode("utf-8")).hexdigest()
+
+
+def modules_fingerprint(modules: List[str]) -> str:
+    """
+    Impressão digital do código-fonte dos módulos (sem importá-los).
+    """
+    h = hashlib.sha256()
+    for name in modules:
+        spec = importlib.util.find_spec(name)
+        h.update(name.encode("utf-8"))
+        h.update(Path(spec.origin).read_bytes())
+    return h.hexdigest()[:16]
+
+
+# ===============================================================
+# 2. Manifestos e verificação de etapas
+# ===============================================================
+
+def lineage_dir() -> Path:
+    return get_paths()["raw"].parent / LINEAGE_DIR_NAME
+
+
+def load_manifest(name: str) -> Dict | None:
+    path = lineage_dir() / f"{name}.json"
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _fingerprints(paths: List[Path], known: Dict, seen: Dict) -> Dict[str, str | None]:
+    return {str(p): path_fingerprint(p, known, seen) for p in paths}
+
+
+def stage_is_fresh(stage: Stage) -> bool:
+    """
+    True se a etapa já rodou com as mesmas entradas, código e configuração e
+    as saídas registradas continuam intactas.
+    """
+    manifest = load_manifest(stage.name)
+    if manifest is None:
+        return False
+    if manifest.get("code") != modules_fingerprint(stage.modules):
+        return False
+    if manifest.get("config") != config_fingerprint(stage.config):
+        return False
+    known, seen = manifest.get("files", {}), {}
+    if manifest.get("inputs") != _fingerprints(stage.inputs, known, seen):
+        return False
+    outputs = _fingerprints(stage.outputs, known, seen)
+    return manifest.get("outputs") == outputs and any(v is not None for v in outputs.values())
+
+
+def record_stage(stage: Stage, duration: float | None = None) -> Dict:
+    """
+    Grava o manifesto da etapa (data/_lineage/<etapa>.json): hashes das
+    entradas e saídas, versão do código e da configuração. As saídas de uma
+    etapa são as entradas da seguinte, então o conjunto de manifestos é a
+    linhagem de cada tabela.
+    """
+    previous = load_manifest(stage.name) or {}
+    known, seen = previous.get("files", {}), {}
+    manifest = {
+        "stage": stage.name,
+        "code": modules_fingerprint(stage.modules),
+        "config": config_fingerprint(stage.config),
+        "inputs": _fingerprints(stage.inputs, known, seen),
+        "outputs": _fingerprints(stage.outputs, known, seen),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duration_s": None if duration is None else round(duration, 3),
+        "files": seen,
+    }
+    path = lineage_dir() / f"{stage.name}.json"
+    ensure_dir(path.parent)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(path)
+    return manifest
+
+
+def run_stage(name: str, func: Callable, *args, force: bool = False, gold_mode: str = "full", **kwargs):
+    """
+    Roda func(*args, **kwargs) como a etapa `name` de pipeline_stages():
+    pula se a etapa estiver inalterada (a menos que force=True) e registra o
+    manifesto após rodar. Retorna o resultado de func (None se pulou).
+    gold_mode: modo do GOLD, parte da configuração da etapa gold.
+    """
+    if not force and stage_is_fresh(pipeline_stages(gold_mode)[name]):
+        print(f"[LINEAGE] Etapa {name} inalterada; pulando.")
+        return None
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    record_stage(pipeline_stages(gold_mode)[name], time.perf_counter() - start)
+    return result
+
+
+# ===============================================================
+# 3. Etapas do pipeline
+# ===============================================================
+
+def _layer_paths(root: Path) -> List[Path]:
+    # Tabela de camada: dataset <root>/ ou arquivo <root>.parquet
+    return [root, root.with_suffix(".parquet")]
+
+
+def pipeline_stages(gold_mode: str = "full") -> Dict[str, Stage]:
+    """
+    Etapas do flow (etl/run_etl.py) com entradas e saídas atuais, conforme
+    configs/assets.yml e configs/etl.yml. gold_mode ('full' ou 'append')
+    entra na configuração da etapa gold: um full depois de um append não é
+    pulado como inalterado.
+    """
+    paths = get_paths()
+    raw, bronze, silver, gold = paths["raw"], paths["bronze"], paths["silver"], paths["gold"]
+    cfg = load_assets_config()
+    settings = load_etl_settings()
+    assets = cfg.get("assets", [])
+    benchmarks = cfg.get("benchmark") or []
+    bench_bronze = [benchmark_bronze_path(bronze, b) for b in benchmarks]
+    tickers = [a["ticker"] for a in assets]
+    io_modules = ["etl.utils.io", "etl.utils.schema"]
+
+    return {
+        "extract_prices": Stage(
+            name="extract_prices",
+            inputs=[raw / a["path"] for a in assets],
+            outputs=[bronze / f"prices_{t}.parquet" for t in tickers] + [bronze / "prices"],
+            modules=["etl.extract.extract_prices", "etl.extract.extract_intraday"] + io_modules,
+            config={"assets": assets, "storage": settings["storage"], "intraday": settings["intraday"]},
+        ),
+        "extract_benchmark": Stage(
+            name="extract_benchmark",
+            inputs=[raw / b["path"] for b in benchmarks if b.get("path")],
+            outputs=bench_bronze,
+            modules=["etl.extract.extract_benchmark"] + io_modules,
+            config={"benchmark": benchmarks, "storage": settings["storage"]},
+        ),
+        "silver_prices": Stage(
+            name="silver_prices",
+            inputs=[bronze / f"prices_{t}.parquet" for t in tickers] + [bronze / "prices"],
+            outputs=_layer_paths(silver / "asset_prices_daily") + [silver / "trading_calendar.parquet"],
+            modules=["etl.transform.build_silver_prices", "etl.transform.sql_engine",
+                     "etl.quality.engine", "etl.utils.calendar"] + io_modules,
+            config={"tickers": tickers, "storage": settings["storage"],
+                    "engine": settings["transform"]["engine"], "quality": settings["quality"]},
+        ),
+        "silver_benchmark": Stage(
+            name="silver_benchmark",
+            inputs=bench_bronze,
+            outputs=[silver / "benchmarks_daily.parquet"],
+            modules=["etl.transform.build_silver_benchmark", "etl.utils.calendar"] + io_modules,
+            config={"benchmark": benchmarks, "storage": settings["storage"]},
+        ),
+        "gold": Stage(
+            name="gold",
+            inputs=_layer_paths(silver / "asset_prices_daily")
+                   + [silver / "benchmarks_daily.parquet", silver / "trading_calendar.parquet",
+                      CONFIG_DIR / "features.yml"],
+            outputs=_layer_paths(gold / "asset_features_daily")
+                    + [gold / f for f in ("asset_features_state.parquet", "asset_features_tail.parquet",
+                                          "asset_kpis_periods.parquet", "asset_kpis_summary.parquet",
+                                          "asset_kpis_partials.parquet", "asset_kpis_recent.parquet")],
+            modules=["etl.transform.build_gold_features_labels", "etl.transform.feature_engine",
+                     "etl.transform.feature_registry", "etl.transform.kpi_engine",
+                     "etl.transform.sql_engine", "etl.transform.panel", "etl.utils.calendar"] + io_modules,
+            config={"tickers": tickers, "sectors": {a["ticker"]: a.get("sector") for a in assets},
+                    "storage": settings["storage"], "gold": settings["gold"],
+                    "transform": settings["transform"], "mode": gold_mode},
+        ),
+    }
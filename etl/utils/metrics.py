@@ -0,0 +1,231 @@
+# etl/utils/metrics.py
+
+import cProfile
+import itertools
+import json
+import os
+import resource
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict
+
+from etl.utils.config import get_paths, load_etl_settings
+from etl.utils.io import ensure_dir
+
+# Métricas por etapa: data/_metrics/metrics.jsonl (uma linha JSON por etapa/ticker)
+METRICS_DIR_NAME = "_metrics"
+METRICS_FILE = "metrics.jsonl"
+PROFILES_DIR = "profiles"
+
+# Variáveis de ambiente (herdadas pelos processos filhos da extração)
+RUN_ID_ENV = "ETL_RUN_ID"
+PROFILE_ENV = "ETL_PROFILE"
+
+_write_lock = threading.Lock()
+_profile_seq = itertools.count(1)
+# Etapas abertas no processo: só a mais externa zera o pico de RSS
+_open_stages = 0
+
+
+@dataclass
+class StageMetrics:
+    """
+    Medidas de uma etapa (ou de um ticker dentro dela). rows_* e bytes_*
+    são preenchidos pelo código da etapa; tempos e memória, pelo
+    stage_metrics.
+    """
+    stage: str
+    tags: Dict = field(default_factory=dict)
+    rows_in: int | None = None
+    rows_out: int | None = None
+    bytes_read: int = 0
+    bytes_written: int = 0
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_mb: float | None = None
+    io_read_bytes: int | None = None
+    io_write_bytes: int | None = None
+    status: str = "ok"
+
+    def read(self, *paths: Path) -> None:
+        """
+        Soma ao bytes_read o tamanho dos arquivos/diretórios lidos.
+        """
+        self.bytes_read += sum(_path_size(Path(p)) for p in paths)
+
+    def wrote(self, *paths: Path) -> None:
+        """
+        Soma ao bytes_written o tamanho dos arquivos/diretórios gravados.
+        """
+        self.bytes_written += sum(_path_size(Path(p)) for p in paths)
+
+
+def _path_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return 0
+
+
+# ===============================================================
+# 1. Medidas do processo (CPU, RSS, E/S)
+# ===============================================================
+
+def reset_peak_rss() -> None:
+    """
+    Zera o pico de RSS do processo (Linux: /proc/self/clear_refs = 5), para
+    medir o pico de cada etapa. Nos demais sistemas o pico é o do processo.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> float:
+    """
+    Pico de RSS do processo em MB (VmHWM no Linux; ru_maxrss nos demais).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if os.uname().sysname == "Darwin" else maxrss / 1024
+
+
+def _io_counters() -> Dict[str, int] | None:
+    """
+    Bytes lidos/escritos pelo processo (Linux: rchar/wchar de /proc/self/io,
+    inclui page cache). None se não disponível.
+    """
+    try:
+        with open("/proc/self/io") as f:
+            values = dict(line.split(":") for line in f.read().splitlines() if ":" in line)
+        return {"read": int(values["rchar"]), "write": int(values["wchar"])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+# ===============================================================
+# 2. Emissão e profiling
+# ===============================================================
+
+def metrics_dir() -> Path:
+    return get_paths()["raw"].parent / METRICS_DIR_NAME
+
+
+def run_id() -> str:
+    """
+    Identificador da execução atual (compartilhado com os processos filhos).
+    """
+    if RUN_ID_ENV not in os.environ:
+        os.environ[RUN_ID_ENV] = time.strftime("%Y%m%dT%H%M%S-") + uuid.uuid4().hex[:6]
+    return os.environ[RUN_ID_ENV]
+
+
+def enable_profiling(enabled: bool = True) -> None:
+    """
+    Liga o cProfile das etapas (opção --profile): cada etapa grava um .prof
+    em data/_metrics/profiles/ (abrir com pstats ou snakeviz).
+    """
+    if enabled:
+        os.environ[PROFILE_ENV] = "1"
+    else:
+        os.environ.pop(PROFILE_ENV, None)
+
+
+def emit_metrics(record: StageMetrics) -> None:
+    """
+    Acrescenta o registro em data/_metrics/metrics.jsonl.
+    """
+    if not load_etl_settings()["metrics"]["enabled"]:
+        return
+    row = {"run_id": run_id(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "pid": os.getpid()}
+    row.update(asdict(record))
+    path = metrics_dir() / METRICS_FILE
+    ensure_dir(path.parent)
+    with _write_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(row, default=str) + "\n")
+
+
+@contextmanager
+def _maybe_profile(name: str):
+    if os.environ.get(PROFILE_ENV) != "1":
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Outro profiler ativo (ex.: etapas concorrentes no flow)
+        print(f"[AVISO] Profiling de {name} ignorado: outro profiler já está ativo.")
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        out = metrics_dir() / PROFILES_DIR / f"{run_id()}-{next(_profile_seq):02d}-{name}.prof"
+        ensure_dir(out.parent)
+        profiler.dump_stats(out)
+        print(f"[METRICS] Perfil de {name} salvo em {out}")
+
+
+@contextmanager
+def stage_metrics(stage: str, profile: bool = True, report: bool = True, **tags):
+    """
+    Mede uma etapa: tempo de parede, CPU do processo, pico de RSS, E/S do
+    processo e, preenchidos pela etapa via o StageMetrics devolvido, linhas
+    e bytes de entrada/saída. Grava o registro em data/_metrics/metrics.jsonl
+    ao final (também em caso de erro, com status=error).
+
+    tags identificam o registro (ex.: ticker=...). profile=True grava um
+    cProfile da etapa quando o profiling está ligado (--profile). Etapas
+    aninhadas (ex.: por ticker) reportam o pico desde o início da externa.
+
+    CPU, RSS e E/S são do processo inteiro: com etapas concorrentes em
+    threads (flow do Prefect), os valores incluem as vizinhas.
+    """
+    global _open_stages
+    run_id()  # antes de criar pools de processos, que herdam o ambiente
+    record = StageMetrics(stage=stage, tags=tags)
+    with _write_lock:
+        if _open_stages == 0:
+            reset_peak_rss()
+        _open_stages += 1
+    io_start = _io_counters()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        if profile:
+            with _maybe_profile(stage):
+                yield record
+        else:
+            yield record
+    except BaseException as e:
+        record.status = f"error: {type(e).__name__}"
+        raise
+    finally:
+        record.wall_s = round(time.perf_counter() - wall_start, 4)
+        record.cpu_s = round(time.process_time() - cpu_start, 4)
+        record.peak_rss_mb = round(peak_rss_mb(), 1)
+        with _write_lock:
+            _open_stages -= 1
+        io_end = _io_counters()
+        if io_start and io_end:
+            record.io_read_bytes = io_end["read"] - io_start["read"]
+            record.io_write_bytes = io_end["write"] - io_start["write"]
+        emit_metrics(record)
+        if report:
+            rows = f", {record.rows_out} linhas" if record.rows_out is not None else ""
+            print(f"[METRICS] {stage}: {record.wall_s:.2f}s parede, {record.cpu_s:.2f}s CPU, "
+                  f"pico RSS {record.peak_rss_mb} MB{rows}")
@@ -0,0 +1,122 @@
+# etl/utils/schema.py
+
+import numpy as np
+import pandas as pd
+
+# ===============================================================
+# Esquema compacto das camadas (BRONZE/SILVER/GOLD)
+# ===============================================================
+# - datas diárias: datetime64 na memória, date32 no Parquet
+# - ticker (e outras colunas de rótulo): categórica / dictionary-encoded
+# - preços (open/high/low/close, vwap e *_close): float64 (retornos precisam de
+#   todos os dígitos)
+# - volume: inteiro
+# - demais floats (features, labels, KPIs): float32
+# - demais inteiros (ex.: target_direction, n_obs): menor inteiro que cabe
+
+DATE_COLUMNS = {"date", "start_date", "end_date"}
+CATEGORICAL_COLUMNS = {"ticker", "period_type", "period"}
+PRICE_COLUMNS = {"open", "high", "low", "close", "vwap"}
+VOLUME_COLUMNS = {"volume"}
+
+
+def column_kind(name: str, dtype) -> str:
+    """
+    Classe da coluna no esquema compacto:
+    date | category | price | volume | integer | feature | other.
+    """
+    if name in DATE_COLUMNS:
+        return "date"
+    if name in CATEGORICAL_COLUMNS:
+        return "category"
+    if name in PRICE_COLUMNS or name.endswith("_close"):
+        return "price"
+    if name in VOLUME_COLUMNS:
+        return "volume"
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "integer"
+    if pd.api.types.is_float_dtype(dtype):
+        return "feature"
+    return "other"
+
+
+def _compact_volume(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_integer_dtype(s.dtype):
+        return s.astype("int64")
+    values = s.to_numpy(dtype=np.float64, na_value=np.nan)
+    finite = values[~np.isnan(values)]
+    if not np.array_equal(finite, np.round(finite)):
+        return s  # volume fracionário: mantém float
+    return s.astype("Int64") if len(finite) < len(values) else s.astype("int64")
+
+
+def compact_frame(df: pd.DataFrame,
+                  full_precision: bool = False,
+                  keep: tuple[str, ...] | list[str] = ()) -> pd.DataFrame:
+    """
+    Aplica o esquema compacto em memória (sem copiar colunas que já estão no
+    tipo certo). full_precision=True mantém floats em float64; keep lista
+    colunas que não devem ser alteradas (ex.: EMAs do estado incremental).
+    """
+    out = df.copy(deep=False)
+    for col in out.columns:
+        if col in keep:
+            continue
+        s = out[col]
+        kind = column_kind(col, s.dtype)
+        if kind == "category":
+            if not isinstance(s.dtype, pd.CategoricalDtype):
+                out[col] = s.astype("category")
+        elif kind == "price":
+            if s.dtype != np.float64:
+                out[col] = s.astype(np.float64)
+        elif kind == "volume":
+            out[col] = _compact_volume(s)
+        elif kind == "integer":
+            if not pd.api.types.is_extension_array_dtype(s.dtype):
+                out[col] = pd.to_numeric(s, downcast="integer")
+        elif kind == "feature" and not full_precision:
+            if s.dtype != np.float32:
+                out[col] = s.astype(np.float32)
+    return out
+
+
+def feature_dtype(full_precision: bool = False):
+    """
+    dtype usado ao materializar features calculadas (float64 nos kernels).
+    """
+    return np.float64 if full_precision else np.float32
+
+
+def to_arrow_table(df: pd.DataFrame, full_precision: bool = False):
+    """
+    Tabela Arrow no esquema compacto, para gravação em Parquet: além de
+    compact_frame, datas diárias (sem hora) viram date32.
+    """
+    import pyarrow as pa
+
+    df = compact_frame(df, full_precision=full_precision)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for col in DATE_COLUMNS & set(df.columns):
+        s = df[col]
+        if not pd.api.types.is_datetime64_any_dtype(s.dtype):
+            continue
+        if s.dt.tz is None and (s.dropna() == s.dropna().dt.normalize()).all():
+            i = table.schema.get_field_index(col)
+            table = table.set_column(i, col, table.column(col).cast(pa.date32()))
+    return table
+
+
+def restore_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Desfaz o que o Parquet não traz de volta no tipo de trabalho: colunas
+    date32 (lidas como datetime.date) voltam a datetime64[ns] e colunas de
+    rótulo voltam a categóricas (leituras via DuckDB trazem texto simples).
+    """
+    for col in DATE_COLUMNS & set(df.columns):
+        if df[col].dtype == object:
+            df[col] = pd.to_datetime(df[col]).astype("datetime64[ns]")
+    for col in CATEGORICAL_COLUMNS & set(df.columns):
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
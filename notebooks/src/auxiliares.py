@@ -1,7 +1,12 @@
+import sys
 import numpy as np
 import pandas as pd
 from pathlib import Path
 
+# Raiz do repositório no path, para reaproveitar os leitores do ETL
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from etl.utils.io import DATASET_MARKER, read_dataset
+
 def dataframe_coeficientes(coeficientes, colunas):
     return pd.DataFrame(
         data = coeficientes, 
@@ -23,4 +28,20 @@ def read_parquet_robust(path: Path) -> pd.DataFrame:
             return pd.read_parquet(path, engine="fastparquet")
         except Exception as e2:
             print(f"[ERRO] Falha também com fastparquet: {e2}")
-            raise
\ No newline at end of file
+            raise
+
+def read_gold_features(gold_dir: Path,
+                       tickers: list[str] | None = None,
+                       start=None,
+                       end=None,
+                       columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Lê asset_features_daily do GOLD lendo só o necessário, com o mesmo leitor
+    do ETL (etl.utils.io.read_dataset): no dataset particionado, os filtros de
+    ticker e data são aplicados no scan; sem o dataset, lê o arquivo
+    asset_features_daily.parquet com os mesmos filtros.
+    """
+    dataset_dir = gold_dir / "asset_features_daily"
+    if (dataset_dir / DATASET_MARKER).exists():
+        print(f"[INFO] Lendo dataset particionado: {dataset_dir.name}")
+    return read_dataset(dataset_dir, tickers=tickers, start=start, end=end, columns=columns)
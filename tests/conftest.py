@@ -0,0 +1,66 @@
+# tests/conftest.py
+
+import shutil
+from pathlib import Path
+
+import pytest
+import yaml
+
+from etl.benchmarks.synthetic import synthetic_benchmark, synthetic_prices, synthetic_sectors
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """
+    Projeto isolado em tmp_path: cópia de configs/ e data/ vazio, com os
+    módulos que guardam CONFIG_DIR / DATA_DIR apontando para ele.
+    """
+    import etl.transform.feature_registry as feature_registry
+    import etl.utils.config as config
+    import etl.utils.lineage as lineage
+
+    shutil.copytree(REPO_ROOT / "configs", tmp_path / "configs")
+    (tmp_path / "data").mkdir()
+    for module in (config, feature_registry, lineage):
+        monkeypatch.setattr(module, "CONFIG_DIR", tmp_path / "configs")
+    monkeypatch.setattr(config, "DATA_DIR", tmp_path / "data")
+    return tmp_path
+
+
+@pytest.fixture
+def synthetic_silver(project):
+    """
+    SILVER sintético (20 tickers x 2 anos, com setores em configs/assets.yml)
+    e a matriz de benchmarks. Retorna o painel de preços completo; os testes
+    gravam em SILVER o recorte que precisarem (save_silver_prices).
+    """
+    from etl.transform.build_silver_benchmark import BENCHMARKS_FILE
+    from etl.utils.io import save_parquet
+
+    df_prices = synthetic_prices(20, 2)
+    sectors = synthetic_sectors(df_prices["ticker"].unique().tolist(), n_sectors=4)
+    assets_path = project / "configs" / "assets.yml"
+    cfg = yaml.safe_load(assets_path.read_text(encoding="utf-8"))
+    cfg["assets"] = [{"ticker": t, "path": f"{t}.xlsx", "sector": s} for t, s in sectors.items()]
+    assets_path.write_text(yaml.safe_dump(cfg, allow_unicode=True), encoding="utf-8")
+
+    save_parquet(synthetic_benchmark(2), project / "data" / "silver" / BENCHMARKS_FILE)
+    return df_prices
+
+
+@pytest.fixture
+def feature_set(project):
+    """
+    Acrescenta features de ativo ao configs/features.yml do projeto e
+    registra o conjunto 'test' (seções asset/benchmark/cross_sectional).
+    """
+    def register(asset: dict, sections: dict) -> str:
+        path = project / "configs" / "features.yml"
+        registry = yaml.safe_load(path.read_text(encoding="utf-8"))
+        registry["asset_features"].update(asset)
+        registry["feature_sets"]["test"] = sections
+        path.write_text(yaml.safe_dump(registry, allow_unicode=True), encoding="utf-8")
+        return "test"
+    return register
@@ -0,0 +1,72 @@
+# tests/test_extract_layouts.py
+
+import pandas as pd
+import pytest
+
+from etl.benchmarks.synthetic import synthetic_prices, synthetic_raw_frame, synthetic_wide_frame
+from etl.extract.extract_prices import extract_asset, extract_assets_stream, extract_assets_wide
+from etl.utils.config import load_etl_settings
+from etl.utils.io import read_parquet
+
+
+@pytest.fixture
+def raw_files(tmp_path):
+    """
+    O mesmo painel sintético em três arquivos brutos: largo (um lote do
+    yf.download), longo (coluna de ticker, tickers intercalados) e um CSV
+    por ativo. Retorna (tickers, {layout: arquivo(s)}).
+    """
+    prices = synthetic_prices(6, 2)
+    tickers = prices["ticker"].unique().tolist()
+    raw = tmp_path / "raw"
+    raw.mkdir()
+
+    wide = synthetic_wide_frame(prices)
+    wide.columns = [f"{field}_{symbol}" for field, symbol in wide.columns]
+    wide.reset_index().to_csv(raw / "wide.csv", index=False, float_format="%.17g")
+
+    # Dump de fornecedor: tickers intercalados, em ordem de data
+    long = prices.rename(columns=str.capitalize).sort_values(["Date", "Ticker"], kind="stable")
+    long.to_csv(raw / "long.csv", index=False, float_format="%.17g")
+
+    singles = {}
+    for ticker, group in prices.groupby("ticker", sort=False):
+        singles[ticker] = raw / f"{ticker}.csv"
+        synthetic_raw_frame(group).to_csv(singles[ticker], index=False, float_format="%.17g")
+    return tickers, {"wide": raw / "wide.csv", "long": raw / "long.csv", "single": singles}
+
+
+def _read_all(out_dir, tickers) -> dict:
+    return {t: read_parquet(out_dir / f"prices_{t}.parquet") for t in tickers}
+
+
+def test_wide_long_and_streamed_csv_match(tmp_path, raw_files):
+    tickers, files = raw_files
+    settings = load_etl_settings()
+    settings["extract"]["stream"].update(threshold_mb=0, block_mb=0.05)
+
+    def out(name):
+        return [tmp_path / name / f"prices_{t}.parquet" for t in tickers]
+
+    for t in tickers:
+        extract_asset(t, files["single"][t], tmp_path / "single" / f"prices_{t}.parquet")
+    assert extract_assets_wide(tickers, files["wide"], out("wide")) == {}
+    assert extract_assets_wide(tickers, files["long"], out("long")) == {}
+    assert extract_assets_stream(tickers, files["wide"], out("wide_stream"), wide=True, settings=settings) == {}
+    assert extract_assets_stream(tickers, files["long"], out("long_stream"), settings=settings) == {}
+
+    expected = _read_all(tmp_path / "single", tickers)
+    for layout in ("wide", "long", "wide_stream", "long_stream"):
+        got = _read_all(tmp_path / layout, tickers)
+        for t in tickers:
+            pd.testing.assert_frame_equal(got[t], expected[t], check_exact=True, obj=f"{layout}/{t}")
+
+
+def test_missing_ticker_is_reported(tmp_path, raw_files):
+    tickers, files = raw_files
+    settings = load_etl_settings()
+    settings["extract"]["stream"].update(threshold_mb=0)
+
+    errors = extract_assets_stream(["MISSING"], files["long"], [tmp_path / "x.parquet"], settings=settings)
+    assert list(errors) == ["MISSING"]
+    assert list(extract_assets_wide(["MISSING"], files["wide"], [tmp_path / "y.parquet"])) == ["MISSING"]
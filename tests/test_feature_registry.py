@@ -0,0 +1,38 @@
+# tests/test_feature_registry.py
+
+import pytest
+
+from etl.transform.build_gold_features_labels import FEATURES_TABLE, run_build_gold_features_labels
+from etl.transform.build_silver_prices import save_silver_prices
+from etl.transform.feature_registry import load_feature_registry, resolve_feature_set
+from etl.utils.io import read_dataset
+
+MIXED = ["ret_1d", "vol_21d", "ibov_ret_lag1", "{bench}_ret_lag2", "ret_1d_cs_rank"]
+
+
+def test_explicit_list_is_split_by_scope(project):
+    registry = load_feature_registry()
+
+    assert resolve_feature_set(registry, MIXED, "asset") == ["ret_1d", "vol_21d"]
+    assert resolve_feature_set(registry, MIXED, "cross_sectional") == ["ret_1d_cs_rank"]
+    assert resolve_feature_set(registry, MIXED, "benchmark", ["ibov", "cdi"]) == [
+        "ibov_ret_lag1", "ibov_ret_lag2", "cdi_ret_lag2"]
+    assert resolve_feature_set(registry, ["ret_1d", "vol_21d"], "benchmark", ["ibov"]) == []
+
+
+def test_unknown_names_raise(project):
+    registry = load_feature_registry()
+
+    with pytest.raises(ValueError, match="ret_2d"):
+        resolve_feature_set(registry, ["ret_1d", "ret_2d"], "asset")
+
+
+@pytest.mark.parametrize("engine", ["pandas", "duckdb"])
+def test_gold_with_mixed_list(project, synthetic_silver, engine):
+    save_silver_prices(synthetic_silver)
+    run_build_gold_features_labels("full", features=MIXED, engine=engine)
+
+    gold = read_dataset(project / "data" / "gold" / FEATURES_TABLE)
+    features = ["ret_1d", "vol_21d", "ret_1d_cs_rank", "ibov_ret_lag1", "ibov_ret_lag2"]
+    assert set(features) <= set(gold.columns)
+    assert gold[features].notna().any().all()
@@ -0,0 +1,64 @@
+# tests/test_gold_append.py
+
+import pandas as pd
+import pytest
+
+from etl.transform.build_gold_features_labels import (
+    FEATURES_TABLE,
+    FEATURES_TAIL_FILE,
+    run_build_gold_features_labels,
+)
+from etl.transform.build_silver_prices import save_silver_prices
+from etl.utils.io import read_dataset, read_parquet
+
+# Lags e janelas sobre EMAs: leem, no append, EMAs de linhas anteriores ao estado
+EMA_CONSUMERS = {
+    "ema_9_lag2": {"type": "lag", "input": "ema_9", "periods": 2},
+    "ema_ratio_ma5": {"type": "rolling_mean", "input": "ema_9_72_ratio", "window": 5},
+}
+FEATURES = {
+    "asset": ["ret_1d", "vol_21d", "ema_9", "ema_9_72_ratio", "ema_9_lag2", "ema_ratio_ma5"],
+    "benchmark": ["ibov_ret_lag1"],
+    "cross_sectional": ["ret_1d_cs_zscore", "ret_21d_sector_rel"],
+}
+CUTS = ["2025-06-02", "2025-06-16", "2025-07-01", None]
+
+
+def _gold(project):
+    gold = project / "data" / "gold"
+    return (read_dataset(gold / FEATURES_TABLE),
+            read_parquet(gold / "asset_kpis_periods.parquet"),
+            read_parquet(gold / "asset_kpis_summary.parquet"))
+
+
+@pytest.mark.parametrize("engine", ["pandas", "duckdb"])
+def test_append_matches_full(project, synthetic_silver, feature_set, capsys, engine):
+    features = feature_set(EMA_CONSUMERS, FEATURES)
+    prices = synthetic_silver
+
+    for i, cut in enumerate(CUTS):
+        save_silver_prices(prices if cut is None else prices[prices["date"] < pd.Timestamp(cut)])
+        # O append continua do estado gravado pelo motor da carga completa
+        run_build_gold_features_labels("full" if i == 0 else "append", features=features, engine=engine)
+    out = capsys.readouterr().out
+    assert "Modo incremental" in out
+    assert "reconstruindo GOLD completo" not in out
+    appended = _gold(project)
+
+    run_build_gold_features_labels("full", features=features)
+    full = _gold(project)
+
+    assert appended[0][["ema_9_lag2", "ema_ratio_ma5"]].notna().sum().gt(0).all()
+    for got, expected in zip(appended, full):
+        pd.testing.assert_frame_equal(got, expected, check_exact=False, rtol=1e-6, atol=1e-9)
+
+
+def test_tail_keeps_ema_history(project, synthetic_silver, feature_set):
+    features = feature_set(EMA_CONSUMERS, FEATURES)
+    save_silver_prices(synthetic_silver)
+    run_build_gold_features_labels("full", features=features)
+
+    tail = read_parquet(project / "data" / "gold" / FEATURES_TAIL_FILE)
+    assert {"ema_9", "ema_72"} <= set(tail.columns)
+    assert tail[["ema_9", "ema_72"]].dtypes.eq("float64").all()
+    assert tail[["ema_9", "ema_72"]].notna().all().all()
@@ -0,0 +1,65 @@
+# tests/test_gold_engines.py
+
+import pandas as pd
+import pytest
+
+from etl.benchmarks.synthetic import synthetic_benchmark
+from etl.transform.build_gold_features_labels import (
+    FEATURES_STATE_FILE,
+    FEATURES_TABLE,
+    FEATURES_TAIL_FILE,
+    run_build_gold_features_labels,
+)
+from etl.transform.build_silver_benchmark import BENCHMARKS_FILE
+from etl.transform.build_silver_prices import save_silver_prices
+from etl.utils.io import read_dataset, read_parquet, save_parquet
+
+
+def _build(project, engine: str, features: str) -> dict:
+    run_build_gold_features_labels("full", features=features, engine=engine)
+    gold = project / "data" / "gold"
+    return {name: pd.read_parquet(gold / name) for name in (FEATURES_STATE_FILE, FEATURES_TAIL_FILE)}
+
+
+@pytest.mark.parametrize("features", ["default", "research"])
+def test_engines_write_same_incremental_state(project, synthetic_silver, features):
+    save_silver_prices(synthetic_silver)
+    expected = _build(project, "pandas", features)
+    got = _build(project, "duckdb", features)
+
+    for name, df in expected.items():
+        assert isinstance(got[name]["ticker"].dtype, pd.CategoricalDtype)
+        pd.testing.assert_frame_equal(got[name], df)
+
+
+@pytest.mark.parametrize("features", ["default", "production", "research"])
+def test_engines_write_same_gold(project, synthetic_silver, features):
+    save_silver_prices(synthetic_silver)
+    gold = project / "data" / "gold"
+
+    def build(engine):
+        run_build_gold_features_labels("full", features=features, engine=engine)
+        return (read_dataset(gold / FEATURES_TABLE),
+                read_parquet(gold / "asset_kpis_periods.parquet"),
+                read_parquet(gold / "asset_kpis_summary.parquet"))
+
+    for got, expected in zip(build("duckdb"), build("pandas")):
+        pd.testing.assert_frame_equal(got, expected, check_exact=True)
+
+
+def test_engines_match_in_full_precision(project, synthetic_silver):
+    settings_path = project / "configs" / "etl.yml"
+    settings_path.write_text(settings_path.read_text(encoding="utf-8").replace(
+        "full_precision: false", "full_precision: true"), encoding="utf-8")
+    # SILVER regravado em float64, como um pipeline rodado com full_precision
+    save_parquet(synthetic_benchmark(2), project / "data" / "silver" / BENCHMARKS_FILE)
+    save_silver_prices(synthetic_silver)
+    gold = project / "data" / "gold"
+
+    run_build_gold_features_labels("full", features="research", engine="duckdb")
+    got = read_dataset(gold / FEATURES_TABLE)
+    run_build_gold_features_labels("full", features="research", engine="pandas")
+    expected = read_dataset(gold / FEATURES_TABLE)
+
+    # Somas por data em ordens diferentes: poucos ulps de float64 (ver configs/etl.yml)
+    pd.testing.assert_frame_equal(got, expected, check_exact=False, rtol=1e-12, atol=1e-15)